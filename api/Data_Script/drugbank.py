@@ -9,29 +9,28 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.wait import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import (
-    NoSuchElementException,
-    TimeoutException,
-    WebDriverException,
-)
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from .webdriver_pool import WebDriverPool
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 logger = logging.getLogger(__name__)
 
+# Warm browser sessions shared by all DrugBank scrapes
+DRUGBANK_POOL_SIZE = int(os.getenv("DRUGBANK_POOL_SIZE", "2"))
+DRUGBANK_MAX_USES = int(os.getenv("DRUGBANK_MAX_USES", "50"))
+DRUGBANK_LEASE_TIMEOUT = float(os.getenv("DRUGBANK_LEASE_TIMEOUT", "120"))
 
-def get_drugbank_info(medication_name):
+
+def create_driver():
     """
-    Scrape DrugBank for metabolism and route of elimination information.
-    Returns a dictionary with the scraped data.
+    Launch a headless Chrome session for DrugBank scraping.
+    Raises if ChromeDriver is missing or the browser fails to start.
     """
-    logger.info(f"\nScraping DrugBank for {medication_name}...")
-    driver = None  # Initialize driver at the start of the function
-
-    # Print environment information
-    logger.info("Environment information:")
-    logger.info(f"Python version: {sys.version}")
-    logger.info(f"Current working directory: {os.getcwd()}")
+    # Environment details, only useful when debugging driver startup
+    logger.debug("Environment information:")
+    logger.debug(f"Python version: {sys.version}")
+    logger.debug(f"Current working directory: {os.getcwd()}")
 
     # Check Chrome and ChromeDriver paths
     chromedriver_path = os.getenv(
@@ -42,127 +41,151 @@ def get_drugbank_info(medication_name):
         "CHROME_BIN", "/usr/bin/google-chrome"  # Updated default path for Docker
     )
 
-    logger.info(f"ChromeDriver path: {chromedriver_path}")
-    logger.info(f"ChromeDriver exists: {os.path.exists(chromedriver_path)}")
-    logger.info(f"Chrome binary path: {chrome_bin}")
-    logger.info(f"Chrome binary exists: {os.path.exists(chrome_bin)}")
-    logger.info(f"DISPLAY environment variable: {os.environ.get('DISPLAY')}")
-    logger.info(f"PATH environment variable: {os.environ.get('PATH')}")
+    logger.debug(f"ChromeDriver path: {chromedriver_path}")
+    logger.debug(f"ChromeDriver exists: {os.path.exists(chromedriver_path)}")
+    logger.debug(f"Chrome binary path: {chrome_bin}")
+    logger.debug(f"Chrome binary exists: {os.path.exists(chrome_bin)}")
+    logger.debug(f"DISPLAY environment variable: {os.environ.get('DISPLAY')}")
+    logger.debug(f"PATH environment variable: {os.environ.get('PATH')}")
 
     # List contents of ChromeDriver directory
     chromedriver_dir = os.path.dirname(chromedriver_path)
     if os.path.exists(chromedriver_dir):
-        logger.info(f"Contents of {chromedriver_dir}:")
+        logger.debug(f"Contents of {chromedriver_dir}:")
         for item in os.listdir(chromedriver_dir):
-            logger.info(f"  - {item}")
+            logger.debug(f"  - {item}")
     else:
         logger.error(f"ChromeDriver directory {chromedriver_dir} does not exist")
 
+    # Configure Chrome options for headless mode
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--disable-software-rasterizer")
+    chrome_options.add_argument("--disable-features=VizDisplayCompositor")
+    chrome_options.add_argument("--disable-features=IsolateOrigins,site-per-process")
+
+    # Set binary location
+    if os.path.exists(chrome_bin):
+        chrome_options.binary_location = chrome_bin
+        logger.info(f"Using Chrome binary at: {chrome_bin}")
+    else:
+        logger.warning(f"Chrome binary not found at {chrome_bin}")
+
+    # Initialize the driver with ChromeDriver
+    if not os.path.exists(chromedriver_path):
+        raise Exception(f"ChromeDriver not found at {chromedriver_path}")
+
+    logger.info(f"Using ChromeDriver at: {chromedriver_path}")
+    service = Service(chromedriver_path)
+    logger.info("Initializing Chrome driver...")
+    driver = webdriver.Chrome(service=service, options=chrome_options)
+    driver.maximize_window()
+    logger.info("Chrome driver initialized successfully")
+    return driver
+
+
+driver_pool = WebDriverPool(
+    create_driver, size=DRUGBANK_POOL_SIZE, max_uses=DRUGBANK_MAX_USES
+)
+
+
+def start_driver_pool():
+    """Warm up the browser pool; scraping still works (lazily) if this fails"""
     try:
-        # Configure Chrome options for headless mode
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--window-size=1920,1080")
-        chrome_options.add_argument("--disable-extensions")
-        chrome_options.add_argument("--disable-software-rasterizer")
-        chrome_options.add_argument("--disable-features=VizDisplayCompositor")
-        chrome_options.add_argument(
-            "--disable-features=IsolateOrigins,site-per-process"
-        )
+        driver_pool.start()
+    except Exception as e:
+        logger.error(f"Failed to warm up the WebDriver pool: {e}")
+
+
+def shutdown_driver_pool():
+    """Quit every pooled browser session"""
+    driver_pool.close()
 
-        # Set binary location
-        if os.path.exists(chrome_bin):
-            chrome_options.binary_location = chrome_bin
-            logger.info(f"Using Chrome binary at: {chrome_bin}")
-        else:
-            logger.warning(f"Chrome binary not found at {chrome_bin}")
-
-        # Initialize the driver with ChromeDriver
-        if not os.path.exists(chromedriver_path):
-            raise Exception(f"ChromeDriver not found at {chromedriver_path}")
-
-        logger.info(f"Using ChromeDriver at: {chromedriver_path}")
-        service = Service(chromedriver_path)
-        logger.info("Initializing Chrome driver...")
-
-        try:
-            driver = webdriver.Chrome(service=service, options=chrome_options)
-            logger.info("Chrome driver initialized successfully")
-        except Exception as e:
-            logger.error(f"Failed to initialize Chrome driver: {e}")
-            return {"metabolism": "N/A", "route_of_elimination": "N/A"}
-
-        wait_time = 15  # Max time to wait for elements in seconds
-        result = {"metabolism": "N/A", "route_of_elimination": "N/A"}
-
-        logger.info(f"Navigating to DrugBank...")
-        driver.get("https://go.drugbank.com/")
-        driver.maximize_window()
-
-        # Initialize WebDriverWait
-        wait = WebDriverWait(driver, wait_time)
-
-        # Search for the medication
-        logger.info(f"Searching for '{medication_name}'...")
-        search_box_locator = (By.ID, "query")
-        search_box = wait.until(EC.presence_of_element_located(search_box_locator))
-        search_box.send_keys(medication_name)
-        search_box.send_keys(Keys.RETURN)
-
-        # Wait for the results page and find the Metabolism text
-        logger.info("Waiting for drug information page...")
-        metabolism_heading_locator = (By.ID, "metabolism")
-        wait.until(EC.presence_of_element_located(metabolism_heading_locator))
-        logger.info("Drug page loaded. Finding Metabolism info...")
-
-        # Get Metabolism information
-        metabolism_text_locator = (
-            By.XPATH,
-            "//dt[@id='metabolism']/following-sibling::dd[1]/p[1]",
+
+def scrape_drugbank_page(driver, medication_name):
+    """
+    Search DrugBank with an existing browser session and read the metabolism
+    and route of elimination paragraphs.
+    """
+    wait_time = 15  # Max time to wait for elements in seconds
+    result = {"metabolism": "N/A", "route_of_elimination": "N/A"}
+
+    logger.info(f"Navigating to DrugBank...")
+    driver.get("https://go.drugbank.com/")
+
+    # Initialize WebDriverWait
+    wait = WebDriverWait(driver, wait_time)
+
+    # Search for the medication
+    logger.info(f"Searching for '{medication_name}'...")
+    search_box_locator = (By.ID, "query")
+    search_box = wait.until(EC.presence_of_element_located(search_box_locator))
+    search_box.send_keys(medication_name)
+    search_box.send_keys(Keys.RETURN)
+
+    # Wait for the results page and find the Metabolism text
+    logger.info("Waiting for drug information page...")
+    metabolism_heading_locator = (By.ID, "metabolism")
+    wait.until(EC.presence_of_element_located(metabolism_heading_locator))
+    logger.info("Drug page loaded. Finding Metabolism info...")
+
+    # Get Metabolism information
+    metabolism_text_locator = (
+        By.XPATH,
+        "//dt[@id='metabolism']/following-sibling::dd[1]/p[1]",
+    )
+    try:
+        metabolism_element = wait.until(
+            EC.visibility_of_element_located(metabolism_text_locator)
         )
-        try:
-            metabolism_element = wait.until(
-                EC.visibility_of_element_located(metabolism_text_locator)
-            )
-            result["metabolism"] = metabolism_element.text
-            logger.info("Successfully retrieved metabolism information")
-        except (NoSuchElementException, TimeoutException):
-            logger.info("Could not find the Metabolism paragraph")
-
-        # Get Route of Elimination information
-        logger.info("Finding Route of Elimination info...")
-        route_elimination_text_locator = (
-            By.XPATH,
-            "//dt[@id='route-of-elimination']/following-sibling::dd[1]/p[1]",
+        result["metabolism"] = metabolism_element.text
+        logger.info("Successfully retrieved metabolism information")
+    except (NoSuchElementException, TimeoutException):
+        logger.info("Could not find the Metabolism paragraph")
+
+    # Get Route of Elimination information
+    logger.info("Finding Route of Elimination info...")
+    route_elimination_text_locator = (
+        By.XPATH,
+        "//dt[@id='route-of-elimination']/following-sibling::dd[1]/p[1]",
+    )
+    try:
+        route_heading_element = driver.find_element(By.ID, "route-of-elimination")
+        driver.execute_script(
+            "arguments[0].scrollIntoView(true);", route_heading_element
         )
-        try:
-            route_heading_element = driver.find_element(By.ID, "route-of-elimination")
-            driver.execute_script(
-                "arguments[0].scrollIntoView(true);", route_heading_element
-            )
-            time.sleep(0.5)
-
-            route_element = wait.until(
-                EC.visibility_of_element_located(route_elimination_text_locator)
-            )
-            result["route_of_elimination"] = route_element.text
-            logger.info("Successfully retrieved route of elimination information")
-        except (NoSuchElementException, TimeoutException):
-            logger.info("Could not find the Route of Elimination paragraph")
+        time.sleep(0.5)
 
+        route_element = wait.until(
+            EC.visibility_of_element_located(route_elimination_text_locator)
+        )
+        result["route_of_elimination"] = route_element.text
+        logger.info("Successfully retrieved route of elimination information")
+    except (NoSuchElementException, TimeoutException):
+        logger.info("Could not find the Route of Elimination paragraph")
+
+    return result
+
+
+def get_drugbank_info(medication_name):
+    """
+    Scrape DrugBank for metabolism and route of elimination information.
+    Returns a dictionary with the scraped data.
+
+    A browser session is leased from the shared pool; sessions that crash
+    during the scrape are recycled by the pool.
+    """
+    logger.info(f"\nScraping DrugBank for {medication_name}...")
+
+    try:
+        with driver_pool.lease(timeout=DRUGBANK_LEASE_TIMEOUT) as driver:
+            return scrape_drugbank_page(driver, medication_name)
     except Exception as e:
         logger.error(f"An error occurred while scraping DrugBank: {e}")
-        return {"metabolism": "N/A", "route_of_elimination": "N/A"}
 
-    finally:
-        logger.info("Closing the browser...")
-        if driver is not None:
-            try:
-                driver.quit()
-            except Exception as e:
-                logger.error(f"Error closing browser: {e}")
-
-    return result
+    return {"metabolism": "N/A", "route_of_elimination": "N/A"}
@@ -0,0 +1,96 @@
+"""
+Browserless DrugBank extractor.
+
+Resolves the drug page through DrugBank's search endpoint with a plain HTTP
+request and reads the metabolism and route of elimination paragraphs with
+an HTML parser. Returns None whenever the page can't be resolved so callers
+can fall back to the Selenium scraper in drugbank.py.
+"""
+
+import os
+from typing import Dict, Optional
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+from .resilience import guarded_get
+
+DRUGBANK_BASE_URL = os.getenv("DRUGBANK_BASE_URL", "https://go.drugbank.com/")
+DRUGBANK_SEARCH_PATH = "unearth/q"
+HTML_PARSER = os.getenv("DRUGBANK_HTML_PARSER", "lxml")
+
+# DrugBank serves a bot challenge to clients that don't look like a browser
+BROWSER_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/119.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+def _section_text(soup: BeautifulSoup, section_id: str) -> str:
+    """Text of the first paragraph following <dt id=section_id>, like the XPath in drugbank.py"""
+    heading = soup.find("dt", id=section_id)
+    if heading is None:
+        return "N/A"
+    body = heading.find_next_sibling("dd")
+    paragraph = body.find("p") if body is not None else None
+    if paragraph is None:
+        return "N/A"
+    return " ".join(paragraph.get_text().split()) or "N/A"
+
+
+def parse_drug_page(html: str) -> Optional[Dict]:
+    """
+    Extract metabolism and route of elimination from a DrugBank drug page.
+    Returns None if the HTML isn't a drug page.
+    """
+    soup = BeautifulSoup(html, HTML_PARSER)
+    if soup.find("dt", id="metabolism") is None:
+        return None
+    return {
+        "metabolism": _section_text(soup, "metabolism"),
+        "route_of_elimination": _section_text(soup, "route-of-elimination"),
+    }
+
+
+def find_drug_url(html: str, base_url: str = DRUGBANK_BASE_URL) -> Optional[str]:
+    """First drug page linked from a DrugBank search results page"""
+    soup = BeautifulSoup(html, HTML_PARSER)
+    for link in soup.select("a[href^='/drugs/DB']"):
+        return urljoin(base_url, link["href"])
+    return None
+
+
+async def _get_html(url: str, params: Optional[Dict] = None):
+    response = await guarded_get(url, params=params, headers=BROWSER_HEADERS)
+    response.raise_for_status()
+    return response
+
+
+async def fetch_drugbank_info(medication_name: str) -> Optional[Dict]:
+    """
+    Fetch metabolism and route of elimination over plain HTTP.
+    Returns None when the fast path fails and Selenium should be used instead.
+    """
+    search_url = urljoin(DRUGBANK_BASE_URL, DRUGBANK_SEARCH_PATH)
+    try:
+        # An exact match redirects straight to the drug page
+        response = await _get_html(
+            search_url,
+            params={"searcher": "drugs", "query": medication_name},
+        )
+        result = parse_drug_page(response.text)
+        if result is not None:
+            return result
+
+        drug_url = find_drug_url(response.text)
+        if drug_url is None:
+            print(f"DrugBank search found no drug page for {medication_name}")
+            return None
+        return parse_drug_page((await _get_html(drug_url)).text)
+    except Exception as e:
+        print(f"DrugBank HTTP fetch failed for {medication_name}: {e}")
+        return None
@@ -0,0 +1,178 @@
+"""
+In-memory stand-in for the Firestore client.
+
+Implements the subset of google.cloud.firestore the scraper uses
+(collections, documents, batched writes, get_all, Increment and
+DELETE_FIELD) so Firestore writes can be exercised without credentials or
+the emulator. Batches enforce Firestore's 500-write limit, commits can be
+made to fail on demand to test retry handling, and `commits`/`writes`
+count what reached the store.
+"""
+
+import copy
+import threading
+import uuid
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from google.api_core.exceptions import InvalidArgument, ServiceUnavailable
+from google.cloud.firestore_v1.transforms import DELETE_FIELD, Increment
+
+MAX_BATCH_WRITES = 500
+
+
+def _apply_field(target: Dict, path: str, value) -> None:
+    """Set a dotted field path, applying Increment and DELETE_FIELD"""
+    *parents, leaf = path.split(".")
+    for part in parents:
+        target = target.setdefault(part, {})
+    if value is DELETE_FIELD:
+        target.pop(leaf, None)
+        return
+    if isinstance(value, Increment):
+        value = target.get(leaf, 0) + value.value
+    target[leaf] = copy.deepcopy(value)
+
+
+def _merge(target: Dict, data: Dict) -> None:
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            _apply_field(target, key, value)
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, reference: "FakeDocumentReference", data: Optional[Dict]):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict]:
+        return copy.deepcopy(self._data)
+
+
+class FakeDocumentReference:
+    def __init__(self, client: "InMemoryFirestore", collection: str, doc_id: str):
+        self._client = client
+        self.id = doc_id
+        self.path = f"{collection}/{doc_id}"
+
+    def get(self) -> FakeDocumentSnapshot:
+        with self._client._lock:
+            return FakeDocumentSnapshot(self, self._client._documents.get(self.path))
+
+    def set(self, document_data: Dict, merge: bool = False) -> None:
+        with self._client._lock:
+            self._client._write("set", self, document_data, merge)
+
+    def update(self, field_updates: Dict) -> None:
+        with self._client._lock:
+            self._client._write("update", self, field_updates)
+
+    def delete(self) -> None:
+        with self._client._lock:
+            self._client._write("delete", self)
+
+
+class FakeCollectionReference:
+    def __init__(self, client: "InMemoryFirestore", name: str):
+        self._client = client
+        self.id = name
+
+    def document(self, document_id: Optional[str] = None) -> FakeDocumentReference:
+        return FakeDocumentReference(
+            self._client, self.id, document_id or uuid.uuid4().hex[:20]
+        )
+
+    def stream(self) -> Iterator[FakeDocumentSnapshot]:
+        prefix = f"{self.id}/"
+        with self._client._lock:
+            paths = [p for p in self._client._documents if p.startswith(prefix)]
+        for path in paths:
+            yield self.document(path[len(prefix) :]).get()
+
+
+class FakeWriteBatch:
+    def __init__(self, client: "InMemoryFirestore"):
+        self._client = client
+        self._writes: List[Tuple] = []
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    def set(
+        self, reference: FakeDocumentReference, document_data: Dict, merge=False
+    ) -> None:
+        self._writes.append(("set", reference, document_data, merge))
+
+    def update(self, reference: FakeDocumentReference, field_updates: Dict) -> None:
+        self._writes.append(("update", reference, field_updates))
+
+    def delete(self, reference: FakeDocumentReference) -> None:
+        self._writes.append(("delete", reference))
+
+    def commit(self) -> List:
+        if len(self._writes) > MAX_BATCH_WRITES:
+            raise InvalidArgument(
+                f"maximum {MAX_BATCH_WRITES} writes allowed per request"
+            )
+        with self._client._lock:
+            self._client.commits += 1
+            if self._client._failures:
+                self._client._failures -= 1
+                raise self._client._failure_error("Injected commit failure")
+            self._client.writes += len(self._writes)
+            # All-or-nothing, like a real batch
+            snapshot = copy.deepcopy(self._client._documents)
+            try:
+                for write in self._writes:
+                    self._client._write(*write)
+            except Exception:
+                self._client._documents = snapshot
+                raise
+        return [None] * len(self._writes)
+
+
+class InMemoryFirestore:
+    """Thread-safe dict-backed Firestore client"""
+
+    def __init__(self):
+        self._documents: Dict[str, Dict] = {}
+        self._lock = threading.RLock()
+        self._failures = 0
+        self._failure_error = ServiceUnavailable
+        self.commits = 0
+        self.writes = 0
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, name)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def get_all(
+        self, references: Iterable[FakeDocumentReference]
+    ) -> Iterator[FakeDocumentSnapshot]:
+        for reference in references:
+            yield reference.get()
+
+    def fail_next_commits(self, count: int, error=ServiceUnavailable) -> None:
+        """Make the next `count` batch commits raise `error`"""
+        with self._lock:
+            self._failures = count
+            self._failure_error = error
+
+    def _write(self, op: str, reference: FakeDocumentReference, data=None, merge=False):
+        current = self._documents.get(reference.path)
+        if op == "delete":
+            self._documents.pop(reference.path, None)
+        elif op == "update":
+            if current is None:
+                raise KeyError(f"No document to update: {reference.path}")
+            for path, value in data.items():
+                _apply_field(current, path, value)
+        else:
+            document = current if merge and current is not None else {}
+            _merge(document, data)
+            self._documents[reference.path] = document
@@ -0,0 +1,305 @@
+"""
+Incremental Firestore writer for scrape runs.
+
+Records are buffered as they stream out of the scraper and flushed to
+draft_medications in small chunks (well under Firestore's 500-write batch
+limit), or once the oldest buffered record has waited
+FIRESTORE_FLUSH_INTERVAL seconds, so even short or slow runs are written as
+they go. Chunks commit concurrently with retries, and every chunk also
+bumps the counters on scraping_runs/{run_id}, so a crash late in a run
+keeps everything written before it and the run document shows how far it
+got.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from firebase_admin import firestore
+from google.api_core.exceptions import (
+    Aborted,
+    DeadlineExceeded,
+    InternalServerError,
+    ResourceExhausted,
+    ServiceUnavailable,
+    TooManyRequests,
+)
+
+from .metrics import RunTimings, record_retry, stage
+from .names import medication_slug
+
+# Firestore rejects batches with more than 500 writes
+FIRESTORE_MAX_BATCH_WRITES = 500
+FIRESTORE_BATCH_SIZE = int(os.getenv("FIRESTORE_BATCH_SIZE", "50"))
+# Seconds a buffered record may wait before its chunk is flushed anyway
+FIRESTORE_FLUSH_INTERVAL = float(os.getenv("FIRESTORE_FLUSH_INTERVAL", "10"))
+FIRESTORE_MAX_CONCURRENT_COMMITS = int(
+    os.getenv("FIRESTORE_MAX_CONCURRENT_COMMITS", "4")
+)
+FIRESTORE_COMMIT_RETRIES = int(os.getenv("FIRESTORE_COMMIT_RETRIES", "3"))
+FIRESTORE_RETRY_BACKOFF = float(os.getenv("FIRESTORE_RETRY_BACKOFF", "0.5"))
+
+RETRYABLE_ERRORS = (
+    Aborted,
+    DeadlineExceeded,
+    InternalServerError,
+    ResourceExhausted,
+    ServiceUnavailable,
+    TooManyRequests,
+)
+
+# Per-run bookkeeping that is not part of a medication's content
+METADATA_FIELDS = ("scraped_at", "run_id", "source", "content_hash")
+
+
+def medication_doc_id(record: Dict) -> str:
+    """Deterministic draft_medications ID: normalized name plus application number"""
+    doc_id = medication_slug(record.get("name", "")) or "unknown-medication"
+    application_number = record.get("application_number")
+    if application_number and application_number != "N/A":
+        doc_id = f"{doc_id}__{medication_slug(application_number)}"
+    return doc_id
+
+
+def content_hash(record: Dict) -> str:
+    """SHA-256 of a record's content, ignoring per-run metadata"""
+    content = {k: v for k, v in record.items() if k not in METADATA_FIELDS}
+    encoded = json.dumps(content, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def record_diff(current: Dict, record: Dict) -> Dict[str, Any]:
+    """
+    Field updates turning the stored document into `record`: changed and
+    new fields, deletions for dropped ones, and the refreshed metadata.
+    """
+    updates = {
+        key: value
+        for key, value in record.items()
+        if key in METADATA_FIELDS or current.get(key) != value
+    }
+    for key in current:
+        if key not in record and key not in METADATA_FIELDS:
+            updates[key] = firestore.DELETE_FIELD
+    return updates
+
+
+class ScrapeRunWriter:
+    """
+    Streams one run's records into Firestore. Call start(), add() each
+    record as it arrives, then finish(); add() never blocks on Firestore.
+
+    Records are upserted under medication_doc_id(): documents whose
+    content_hash matches are skipped and changed ones get a field-level
+    update, so a run only writes what actually changed.
+    """
+
+    def __init__(
+        self,
+        db,
+        run_id: str,
+        timestamp: datetime,
+        medications: List[str],
+        batch_size: int = FIRESTORE_BATCH_SIZE,
+        max_concurrent_commits: int = FIRESTORE_MAX_CONCURRENT_COMMITS,
+        max_retries: int = FIRESTORE_COMMIT_RETRIES,
+        retry_backoff: float = FIRESTORE_RETRY_BACKOFF,
+        flush_interval: float = FIRESTORE_FLUSH_INTERVAL,
+        timings: Optional[RunTimings] = None,
+    ):
+        self.db = db
+        self.run_id = run_id
+        self.timestamp = timestamp
+        self.medications = medications
+        # One write per chunk is reserved for the run document
+        self.batch_size = max(1, min(batch_size, FIRESTORE_MAX_BATCH_WRITES - 1))
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.flush_interval = flush_interval
+        self.run_ref = db.collection("scraping_runs").document(run_id)
+        # Stage timings of the run, written to the run document by finish()
+        self.timings = timings
+
+        self.written: List[Dict] = []
+        self.counts = {"created": 0, "updated": 0, "unchanged": 0}
+        self.failed_results: List[Dict] = []
+        self.write_errors: List[str] = []
+        self._pending: List[Dict] = []
+        self._pending_failed = 0
+        self._commits = set()
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._semaphore = asyncio.Semaphore(max_concurrent_commits)
+
+    async def _with_retries(self, write: Callable[[], Any]) -> Any:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await asyncio.to_thread(write)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                record_retry("firestore")
+                delay = random.uniform(0, self.retry_backoff * 2**attempt)
+                print(f"Firestore write failed ({e}); retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def start(self) -> None:
+        """Create the run document before any records arrive"""
+        await self._with_retries(
+            lambda: self.run_ref.set(
+                {
+                    "run_id": self.run_id,
+                    "timestamp": self.timestamp,
+                    "medications_requested": self.medications,
+                    "medications_scraped": 0,
+                    "medications_failed": 0,
+                    "medications_created": 0,
+                    "medications_updated": 0,
+                    "medications_unchanged": 0,
+                    "chunks_committed": 0,
+                    "status": "running",
+                }
+            )
+        )
+
+    def add(self, record: Dict) -> None:
+        """
+        Buffer one scraped record, flushing a chunk once it is full or its
+        oldest record is flush_interval seconds old.
+        """
+        if "error" in record:
+            self.failed_results.append(record)
+            self._pending_failed += 1
+            self._schedule_flush()
+            return
+
+        # Add metadata to each medication record
+        record.update(
+            {
+                "scraped_at": self.timestamp,
+                "run_id": self.run_id,
+                "source": "admin_portal",
+            }
+        )
+        # Ensure name field exists for querying and identification
+        record["name"] = record.get("name", "Unknown Medication")
+        record["content_hash"] = content_hash(record)
+        self._pending.append(record)
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        else:
+            self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_timer is None and self.flush_interval > 0:
+            self._flush_timer = asyncio.get_running_loop().call_later(
+                self.flush_interval, self._flush
+            )
+
+    def _flush(self) -> None:
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        records, failed = self._pending, self._pending_failed
+        if not records and not failed:
+            return
+        self._pending, self._pending_failed = [], 0
+        task = asyncio.create_task(self._commit_chunk(records, failed))
+        self._commits.add(task)
+        task.add_done_callback(self._commits.discard)
+
+    async def _commit_chunk(self, records: List[Dict], failed: int) -> None:
+        collection = self.db.collection("draft_medications")
+        # Later duplicates of the same drug within a chunk win
+        by_id = {medication_doc_id(record): record for record in records}
+        refs = {doc_id: collection.document(doc_id) for doc_id in by_id}
+
+        def commit() -> Dict[str, int]:
+            # Re-read on every attempt so a retry diffs against what is stored now
+            existing = {
+                snapshot.id: snapshot.to_dict()
+                for snapshot in self.db.get_all(list(refs.values()))
+                if snapshot.exists
+            }
+            counts = {"created": 0, "updated": 0, "unchanged": 0}
+            batch = self.db.batch()
+            for doc_id, record in by_id.items():
+                current = existing.get(doc_id)
+                if current is None:
+                    batch.set(refs[doc_id], record)
+                    counts["created"] += 1
+                elif current.get("content_hash") == record["content_hash"]:
+                    counts["unchanged"] += 1
+                else:
+                    batch.update(refs[doc_id], record_diff(current, record))
+                    counts["updated"] += 1
+            batch.set(
+                self.run_ref,
+                {
+                    "medications_scraped": firestore.Increment(len(by_id)),
+                    "medications_failed": firestore.Increment(failed),
+                    "medications_created": firestore.Increment(counts["created"]),
+                    "medications_updated": firestore.Increment(counts["updated"]),
+                    "medications_unchanged": firestore.Increment(counts["unchanged"]),
+                    "chunks_committed": firestore.Increment(1),
+                    "updated_at": datetime.utcnow(),
+                },
+                merge=True,
+            )
+            batch.commit()
+            return counts
+
+        async with self._semaphore:
+            try:
+                with stage("firestore_commit", self.timings):
+                    counts = await self._with_retries(commit)
+            except Exception as e:
+                print(f"Could not write {len(records)} medications to Firestore: {e}")
+                self.write_errors.append(str(e))
+                return
+        self.written.extend(by_id.values())
+        for key, value in counts.items():
+            self.counts[key] += value
+        print(
+            f"Committed {len(by_id)} medications for run {self.run_id} "
+            f"({counts['created']} new, {counts['updated']} changed, "
+            f"{counts['unchanged']} unchanged)"
+        )
+
+    async def finish(
+        self, summary_usage: Optional[Dict] = None, error: Optional[str] = None
+    ) -> Dict:
+        """
+        Flush what is left, wait for in-flight chunks and record the final
+        status. The run fails if it raised, a chunk could not be written or
+        no medication was stored.
+        """
+        self._flush()
+        while self._commits:
+            await asyncio.gather(*list(self._commits))
+
+        if error is None and self.write_errors:
+            error = f"{len(self.write_errors)} Firestore chunk(s) failed to commit"
+        status = "failed" if error or not self.written else "completed"
+        final = {"status": status, "finished_at": datetime.utcnow()}
+        if summary_usage is not None:
+            final["summary_usage"] = summary_usage
+        if self.timings is not None:
+            final["timings"] = self.timings.as_dict()
+        if error:
+            final["error"] = error
+        await self._with_retries(lambda: self.run_ref.set(final, merge=True))
+
+        return {
+            "run_id": self.run_id,
+            "status": status,
+            "medications_scraped": len(self.written),
+            "medications_failed": len(self.failed_results),
+            "medications_created": self.counts["created"],
+            "medications_updated": self.counts["updated"],
+            "medications_unchanged": self.counts["unchanged"],
+            "error": error,
+        }
@@ -0,0 +1,54 @@
+"""
+Pooled asyncio HTTP clients for the upstream APIs.
+
+One keep-alive client (HTTP/2 where the server supports it) is kept per
+upstream origin, so repeated calls to api.fda.gov and rxnav.nlm.nih.gov reuse
+connections instead of paying a TLS handshake each time.
+"""
+
+import asyncio
+import os
+import weakref
+from urllib.parse import urlparse
+
+import httpx
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "10"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1"
+
+# Clients are bound to the event loop that created them: loop -> origin -> client
+_clients = weakref.WeakKeyDictionary()
+
+
+def _origin(url: str) -> str:
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def get_client(url: str) -> httpx.AsyncClient:
+    """Return the shared client for url's origin on the running event loop"""
+    loop = asyncio.get_running_loop()
+    clients = _clients.setdefault(loop, {})
+    origin = _origin(url)
+    client = clients.get(origin)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=HTTP2_ENABLED,
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+            ),
+            follow_redirects=True,
+        )
+        clients[origin] = client
+    return client
+
+
+async def close_clients() -> None:
+    """Close every client created on the running event loop"""
+    clients = _clients.pop(asyncio.get_running_loop(), {})
+    await asyncio.gather(
+        *(client.aclose() for client in clients.values()), return_exceptions=True
+    )
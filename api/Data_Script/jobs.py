@@ -0,0 +1,147 @@
+"""
+In-process job queue for scrape runs.
+
+Submitting a run returns immediately; the run executes in the background
+with a bounded number of runs active at once, and its per-medication
+progress can be polled by run_id.
+"""
+
+import asyncio
+import os
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+SCRAPE_MAX_CONCURRENT_RUNS = int(os.getenv("SCRAPE_MAX_CONCURRENT_RUNS", "2"))
+# Finished runs kept in memory for status polling
+SCRAPE_RETAINED_RUNS = int(os.getenv("SCRAPE_RETAINED_RUNS", "100"))
+
+
+class ScrapeRunError(Exception):
+    """A run failed as a whole; details are reported on the status endpoint"""
+
+    def __init__(self, details: Dict):
+        super().__init__(details.get("error", "Scrape run failed"))
+        self.details = details
+
+
+class ScrapeJob:
+    """State of one scrape run, as reported by the status endpoint"""
+
+    def __init__(self, run_id: str, medications: List[str]):
+        self.run_id = run_id
+        self.medications = medications
+        self.status = "queued"
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.progress: Dict[str, Dict] = {
+            medication: {"name": medication, "status": "pending"}
+            for medication in medications
+        }
+        self.result: Optional[Dict] = None
+        self.error: Optional[Dict] = None
+        self.done = asyncio.Event()
+
+    def update_medication(
+        self, medication: str, status: str, record: Optional[Dict] = None
+    ) -> None:
+        """Progress callback passed to scrape_medications"""
+        entry = self.progress.setdefault(medication, {"name": medication})
+        entry["status"] = status
+        if record is not None and "error" in record:
+            entry["error"] = record["error"]
+            if record.get("suggestions"):
+                entry["suggestions"] = record["suggestions"]
+
+    def to_dict(self) -> Dict:
+        counts: Dict[str, int] = {}
+        for entry in self.progress.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return {
+            "run_id": self.run_id,
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "total": len(self.progress),
+            "counts": counts,
+            "medications": list(self.progress.values()),
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """
+    Runs `handler(job)` for each submitted job in the background, with at
+    most `max_concurrent_runs` handlers active at a time.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[ScrapeJob], Awaitable[Dict]],
+        max_concurrent_runs: int = SCRAPE_MAX_CONCURRENT_RUNS,
+        retained_runs: int = SCRAPE_RETAINED_RUNS,
+    ):
+        self.handler = handler
+        self.retained_runs = retained_runs
+        self._semaphore = asyncio.Semaphore(max_concurrent_runs)
+        self._jobs: Dict[str, ScrapeJob] = {}
+        self._tasks = set()
+
+    def submit(self, run_id: str, medications: List[str]) -> ScrapeJob:
+        existing = self._jobs.get(run_id)
+        if existing is not None and not existing.done.is_set():
+            raise ValueError(f"Run {run_id} is already in progress")
+        job = ScrapeJob(run_id, medications)
+        self._jobs[run_id] = job
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def run_slot(self) -> asyncio.Semaphore:
+        """
+        The run bound shared with queued jobs; hold it (`async with`) for runs
+        started outside the queue, such as streamed ones.
+        """
+        return self._semaphore
+
+    def get(self, run_id: str) -> Optional[ScrapeJob]:
+        return self._jobs.get(run_id)
+
+    async def _run(self, job: ScrapeJob) -> None:
+        try:
+            async with self._semaphore:
+                job.status = "running"
+                job.started_at = datetime.utcnow()
+                try:
+                    job.result = await self.handler(job)
+                    job.status = "completed"
+                except Exception as e:
+                    print(f"Scrape run {job.run_id} failed: {e}")
+                    job.status = "failed"
+                    if isinstance(e, ScrapeRunError):
+                        job.error = e.details
+                    else:
+                        job.error = {"error": str(e)}
+        except asyncio.CancelledError:
+            # Cancelled while queued or running (shutdown); report it as over
+            job.status = "cancelled"
+            job.error = {"error": "Run was cancelled before it finished"}
+            raise
+        finally:
+            job.finished_at = datetime.utcnow()
+            job.done.set()
+            self._prune()
+
+    def _prune(self) -> None:
+        finished = [job for job in self._jobs.values() if job.done.is_set()]
+        for job in finished[: max(0, len(finished) - self.retained_runs)]:
+            del self._jobs[job.run_id]
+
+    async def shutdown(self) -> None:
+        """Cancel runs that are still queued or in progress"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,184 @@
+"""
+Per-stage timing spans and Prometheus metrics for the scrape pipeline.
+
+Wrap each pipeline stage in `stage(name)`: its duration goes into the
+`scrape_stage_duration_seconds` histogram and, inside `track_run_timings()`,
+into the run's timing breakdown (stored on its scraping_runs document).
+Like summary usage, the run is carried in a context variable, so stages in
+tasks and worker threads started from the run are attributed to it.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from urllib.parse import urlparse
+
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# DrugBank browser sessions and LLM calls can take tens of seconds
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_SECONDS = Histogram(
+    "scrape_stage_duration_seconds",
+    "Duration of one scrape pipeline stage",
+    ["stage", "outcome"],
+    buckets=STAGE_BUCKETS,
+)
+RETRIES = Counter(
+    "scrape_upstream_retries_total",
+    "Retried upstream requests and Firestore commits",
+    ["source"],
+)
+CIRCUIT_OPEN = Gauge(
+    "scrape_upstream_circuit_open",
+    "1 while requests to the upstream are refused by its circuit breaker",
+    ["source"],
+)
+CIRCUIT_REJECTED = Counter(
+    "scrape_upstream_circuit_rejections_total",
+    "Upstream requests refused because the circuit was open",
+    ["source"],
+)
+MEDICATIONS_PROCESSED = Counter(
+    "scrape_medications_total",
+    "Medications processed, by final status",
+    ["status"],
+)
+
+
+class Span:
+    """Outcome of a stage; set outcome to label a non-error result (e.g. a miss)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.outcome = "ok"
+
+
+class RunTimings:
+    """Thread-safe per-stage totals for one run"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._stages: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float, outcome: str) -> None:
+        with self._lock:
+            totals = self._stages.setdefault(
+                stage,
+                {"count": 0, "outcomes": {}, "total_seconds": 0.0, "max_seconds": 0.0},
+            )
+            totals["count"] += 1
+            totals["outcomes"][outcome] = totals["outcomes"].get(outcome, 0) + 1
+            totals["total_seconds"] += seconds
+            totals["max_seconds"] = max(totals["max_seconds"], seconds)
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            stages = {
+                stage: {
+                    **totals,
+                    "outcomes": dict(totals["outcomes"]),
+                    "total_seconds": round(totals["total_seconds"], 3),
+                    "max_seconds": round(totals["max_seconds"], 3),
+                }
+                for stage, totals in self._stages.items()
+            }
+        return {
+            "wall_seconds": round(time.perf_counter() - self.started, 3),
+            "stages": stages,
+        }
+
+
+_current_timings: contextvars.ContextVar = contextvars.ContextVar(
+    "run_timings", default=None
+)
+
+
+@contextmanager
+def track_run_timings(timings: Optional[RunTimings] = None) -> Iterator[RunTimings]:
+    """Attribute every stage run inside the block to one run"""
+    timings = timings or RunTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+@contextmanager
+def stage(name: str, timings: Optional[RunTimings] = None) -> Iterator[Span]:
+    """
+    Time a pipeline stage. Exceptions are recorded as outcome "error" (or
+    "cancelled") unless the block already set a more specific outcome.
+    """
+    span = Span(name)
+    timings = timings or _current_timings.get()
+    started = time.perf_counter()
+    try:
+        yield span
+    except BaseException as e:
+        if span.outcome == "ok":
+            cancelled = isinstance(e, asyncio.CancelledError)
+            span.outcome = "cancelled" if cancelled else "error"
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        STAGE_SECONDS.labels(name, span.outcome).observe(seconds)
+        if timings is not None:
+            timings.record(name, seconds, span.outcome)
+
+
+def record_retry(source: str) -> None:
+    """Count a retry; source is a service name or a URL (counted by host)"""
+    if "://" in source:
+        source = urlparse(source).hostname or source
+    RETRIES.labels(source).inc()
+
+
+class CacheStatsCollector:
+    """Exports the response, summary and negative cache counters at scrape time"""
+
+    def __init__(self, response_cache, summary_cache, negative_cache=None):
+        self.response_cache = response_cache
+        self.summary_cache = summary_cache
+        self.negative_cache = negative_cache
+
+    def collect(self):
+        lookups = CounterMetricFamily(
+            "scrape_cache_lookups",
+            "Cache lookups by cache, endpoint and outcome",
+            labels=["cache", "endpoint", "outcome"],
+        )
+        hit_ratio = GaugeMetricFamily(
+            "scrape_cache_hit_ratio",
+            "Share of lookups served from the cache",
+            labels=["cache", "endpoint"],
+        )
+        if self.response_cache is not None:
+            for endpoint, stats in self.response_cache.stats().items():
+                for outcome in ("memory_hit", "disk_hit", "revalidated", "miss"):
+                    lookups.add_metric(["responses", endpoint, outcome], stats[outcome])
+                hit_ratio.add_metric(["responses", endpoint], stats["hit_rate"])
+        if self.summary_cache is not None:
+            stats = self.summary_cache.stats()
+            total = stats["hits"] + stats["misses"]
+            lookups.add_metric(["summaries", "openrouter", "hit"], stats["hits"])
+            lookups.add_metric(["summaries", "openrouter", "miss"], stats["misses"])
+            hit_ratio.add_metric(
+                ["summaries", "openrouter"], stats["hits"] / total if total else 0.0
+            )
+        if self.negative_cache is not None:
+            for source, stats in self.negative_cache.stats().items():
+                total = stats["hit"] + stats["miss"]
+                lookups.add_metric(["not_found", source, "hit"], stats["hit"])
+                lookups.add_metric(["not_found", source, "miss"], stats["miss"])
+                hit_ratio.add_metric(
+                    ["not_found", source], stats["hit"] / total if total else 0.0
+                )
+        yield lookups
+        yield hit_ratio
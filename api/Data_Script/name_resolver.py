@@ -0,0 +1,245 @@
+"""
+Medication name resolution in front of the scraper.
+
+Known brand and generic names are collected from the local data the
+scraper already has (Orange Book products file, the openFDA mirror, openFDA
+responses in the response cache and the RxNorm index, whichever exist) into
+an in-memory trigram index. Inputs are canonicalized before any network
+call: exact (case/punctuation-insensitive) matches pass through.
+
+The vocabulary is never complete (biologics, for one, are not in the Orange
+Book), so a name it doesn't know is still scraped as typed, with the closest
+known names attached as suggestions. Only an unambiguous close match is
+offered as a correction, and the scraper only tries it once the typed name
+has missed in drugsfda.
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .names import normalize_medication_name
+from .openfda_mirror import OPENFDA_MIRROR_PATH, get_openfda_mirror
+from .orange_book import ORANGE_BOOK_DIR, PRODUCTS_FILE, read_columns
+from .response_cache import response_cache
+from .rxnorm_index import RXNORM_INDEX_PATH, get_rxnorm_index, lookup_key
+
+# "auto" resolves names when any name source exists, "off" disables it
+NAME_RESOLVER = os.getenv("NAME_RESOLVER", "auto")
+# Edits a correction may be away (also capped at a quarter of the name length)
+NAME_RESOLVER_MAX_EDITS = int(os.getenv("NAME_RESOLVER_MAX_EDITS", "2"))
+# ...and how many edits closer it must be than the next known name
+NAME_RESOLVER_MIN_GAP = int(os.getenv("NAME_RESOLVER_MIN_GAP", "2"))
+NAME_RESOLVER_MIN_SIMILARITY = float(os.getenv("NAME_RESOLVER_MIN_SIMILARITY", "0.3"))
+NAME_RESOLVER_MAX_SUGGESTIONS = int(os.getenv("NAME_RESOLVER_MAX_SUGGESTIONS", "5"))
+# Candidates re-ranked by edit distance after the trigram pass
+NAME_RESOLVER_SHORTLIST = 20
+# Seconds between checks of the name sources for changes
+NAME_RESOLVER_CHECK_INTERVAL = 60.0
+
+PRODUCT_NAME_COLUMNS = ("Trade_Name", "Ingredient")
+
+
+class NameResolution(NamedTuple):
+    query: str
+    # Name to scrape, None when there is nothing to scrape (blank input)
+    name: Optional[str]
+    # "exact", "partial", "unknown" (not in the index), "unresolved" (blank)
+    # or "unchecked" (no index)
+    match: str
+    # Closest known names, as hints
+    suggestions: List[str]
+    # Known name to try instead if drugsfda has no record of name
+    correction: Optional[str] = None
+
+
+def trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or limit + 1 once it is known to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(
+                min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            )
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def display_name(name: str) -> str:
+    """Sources store names upper- or lower-cased; present them title-cased"""
+    return name.title() if name.isupper() or name.islower() else name
+
+
+class NameIndex:
+    """Trigram index over normalized names; built once, read-only afterwards"""
+
+    def __init__(self, names: List[str]):
+        self._keys: List[str] = []
+        self._names: List[str] = []
+        self._sizes: List[int] = []
+        self._by_key: Dict[str, int] = {}
+        self._postings: Dict[str, List[int]] = {}
+        self._words: Dict[str, set] = {}
+        for name in names:
+            key = lookup_key(name)
+            if not key or key in self._by_key:
+                continue
+            entry = len(self._keys)
+            self._by_key[key] = entry
+            self._keys.append(key)
+            self._names.append(display_name(" ".join(name.split())))
+            grams = trigrams(key)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(entry)
+            for word in key.split():
+                self._words.setdefault(word, set()).add(entry)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _contained(self, key: str) -> bool:
+        """Whether key's words appear as a phrase in some name (e.g. a salt form)"""
+        entries = [self._words.get(word, set()) for word in key.split()]
+        padded = f" {key} "
+        return any(
+            padded in f" {self._keys[entry]} " for entry in set.intersection(*entries)
+        )
+
+    def _candidates(self, key: str) -> List[Tuple[float, int]]:
+        """(Dice similarity, entry) of the closest names by shared trigrams"""
+        grams = trigrams(key)
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        scored = [
+            (2 * count / (len(grams) + self._sizes[entry]), entry)
+            for entry, count in shared.items()
+        ]
+        scored = [item for item in scored if item[0] >= NAME_RESOLVER_MIN_SIMILARITY]
+        scored.sort(reverse=True)
+        return scored[:NAME_RESOLVER_SHORTLIST]
+
+    def resolve(self, query: str) -> NameResolution:
+        key = lookup_key(query)
+        if not key:
+            return NameResolution(query, None, "unresolved", [])
+
+        typed = " ".join(query.split())
+        entry = self._by_key.get(key)
+        if entry is not None:
+            name = self._names[entry]
+            # Keep the caller's spelling when it only differs in case/spacing
+            if normalize_medication_name(typed) == normalize_medication_name(name):
+                name = typed
+            return NameResolution(query, name, "exact", [])
+        if self._contained(key):
+            # Upstream searches match on words too ("atorvastatin" finds the salt)
+            return NameResolution(query, typed, "partial", [])
+
+        max_edits = min(NAME_RESOLVER_MAX_EDITS, max(1, len(key) // 4))
+        limit = max(max_edits, len(key))
+        ranked = sorted(
+            (edit_distance(key, self._keys[entry], limit), -similarity, entry)
+            for similarity, entry in self._candidates(key)
+        )
+        suggestions = [
+            self._names[entry] for _, _, entry in ranked[:NAME_RESOLVER_MAX_SUGGESTIONS]
+        ]
+        correction = None
+        if ranked and ranked[0][0] <= max_edits:
+            # Only offer a correction clearly closer than any other name
+            if len(ranked) == 1 or ranked[1][0] - ranked[0][0] >= NAME_RESOLVER_MIN_GAP:
+                correction = suggestions[0]
+        return NameResolution(query, typed, "unknown", suggestions, correction)
+
+
+def _source_paths() -> Tuple[str, ...]:
+    # The response cache changes on every miss, so it is read whenever the
+    # index is rebuilt but doesn't trigger a rebuild itself
+    return (
+        os.path.join(ORANGE_BOOK_DIR, PRODUCTS_FILE),
+        OPENFDA_MIRROR_PATH,
+        RXNORM_INDEX_PATH,
+    )
+
+
+def _source_mtimes() -> Tuple[Optional[int], ...]:
+    mtimes = []
+    for path in _source_paths():
+        try:
+            mtimes.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
+def load_known_names() -> List[str]:
+    """Brand and generic names from every local source that exists"""
+    products_path, mirror_path, _ = _source_paths()
+    names: List[str] = []
+    if os.path.exists(products_path):
+        for trade_name, ingredient in read_columns(products_path, PRODUCT_NAME_COLUMNS):
+            names.append(trade_name)
+            # Combination products list ingredients as "A; B"
+            names.extend(ingredient.split(";"))
+    if os.path.exists(mirror_path):
+        names.extend(get_openfda_mirror().known_names())
+    if response_cache is not None:
+        names.extend(response_cache.openfda_names())
+    rxnorm = get_rxnorm_index()
+    if rxnorm is not None:
+        names.extend(rxnorm.known_names())
+    return names
+
+
+_index: Optional[NameIndex] = None
+_index_mtimes: Optional[Tuple[Optional[int], ...]] = None
+_index_checked = 0.0
+_index_lock = threading.Lock()
+
+
+def get_name_index() -> Optional[NameIndex]:
+    """
+    The shared name index, rebuilt when a source file changes. None when
+    resolution is off or there are no names to resolve against.
+    """
+    global _index, _index_mtimes, _index_checked
+    if NAME_RESOLVER == "off":
+        return None
+    with _index_lock:
+        now = time.monotonic()
+        if _index_mtimes is None or now - _index_checked >= (
+            NAME_RESOLVER_CHECK_INTERVAL
+        ):
+            _index_checked = now
+            mtimes = _source_mtimes()
+            if mtimes != _index_mtimes:
+                start = time.perf_counter()
+                _index = NameIndex(load_known_names())
+                _index_mtimes = mtimes
+                print(
+                    f"Name index built with {len(_index)} names "
+                    f"in {time.perf_counter() - start:.2f}s"
+                )
+        return _index if _index else None
+
+
+def resolve_medication_names(medications: List[str]) -> List[NameResolution]:
+    """Resolve a run's names (blocking: may build the index on first use)"""
+    index = get_name_index()
+    if index is None:
+        return [NameResolution(m, m, "unchecked", []) for m in medications]
+    return [index.resolve(medication) for medication in medications]
@@ -0,0 +1,15 @@
+"""
+Medication name normalization shared by lookups, caches and document IDs.
+"""
+
+import re
+
+
+def normalize_medication_name(name: str) -> str:
+    """Case- and whitespace-insensitive form of a medication name"""
+    return " ".join(name.casefold().split())
+
+
+def medication_slug(name: str) -> str:
+    """Normalized name reduced to [a-z0-9-], safe for Firestore document IDs"""
+    return re.sub(r"[^a-z0-9]+", "-", normalize_medication_name(name)).strip("-")
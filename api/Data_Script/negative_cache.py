@@ -0,0 +1,141 @@
+"""
+Negative-result cache: medications an upstream has no record of.
+
+A drugsfda 404 or an RxNav lookup without an RxCUI is remembered per source
+and normalized name, so later runs fail fast (or skip the lookup) instead
+of repeating the request and everything scheduled after it. Misses expire
+much sooner than cached responses, so newly approved drugs and new RxNorm
+names are picked up within a day by default.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from .names import normalize_medication_name
+
+NEGATIVE_CACHE_ENABLED = os.getenv("NEGATIVE_CACHE_ENABLED", "1") == "1"
+NEGATIVE_CACHE_PATH = os.getenv(
+    "NEGATIVE_CACHE_PATH",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ".cache",
+        "negative.sqlite3",
+    ),
+)
+NEGATIVE_CACHE_TTL = float(os.getenv("NEGATIVE_CACHE_TTL", str(24 * 3600)))
+
+
+class NegativeCache:
+    """Known misses in memory, backed by an optional SQLite store"""
+
+    def __init__(
+        self, path: Optional[str] = NEGATIVE_CACHE_PATH, ttl: float = NEGATIVE_CACHE_TTL
+    ):
+        self.ttl = ttl
+        # (source, normalized name) -> expires_at
+        self._memory: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._conn = None
+        if path:
+            try:
+                self._conn = self._open(path)
+            except sqlite3.Error as e:
+                print(f"Could not open negative cache at {path}: {e}")
+
+    def _open(self, path: str) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS misses (
+                    source TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (source, name)
+                )""")
+        return conn
+
+    def _count(self, source: str, outcome: str) -> None:
+        with self._lock:
+            counts = self._stats.setdefault(source, {"hit": 0, "miss": 0, "stored": 0})
+            counts[outcome] += 1
+
+    def is_missing(self, source: str, name: str) -> bool:
+        """Whether source recently had no record of name (may read SQLite)"""
+        key = (source, normalize_medication_name(name))
+        with self._lock:
+            expires_at = self._memory.get(key)
+        if expires_at is None and self._conn is not None:
+            with self._disk_lock:
+                row = self._conn.execute(
+                    "SELECT expires_at FROM misses WHERE source = ? AND name = ?", key
+                ).fetchone()
+            if row is not None:
+                expires_at = row[0]
+                with self._lock:
+                    self._memory[key] = expires_at
+        missing = expires_at is not None and expires_at > time.time()
+        if expires_at is not None and not missing:
+            with self._lock:
+                self._memory.pop(key, None)
+        self._count(source, "hit" if missing else "miss")
+        return missing
+
+    def record(self, source: str, name: str) -> None:
+        """Remember that source has no record of name (blocking)"""
+        key = (source, normalize_medication_name(name))
+        now = time.time()
+        with self._lock:
+            self._memory[key] = now + self.ttl
+        self._count(source, "stored")
+        if self._conn is None:
+            return
+        with self._disk_lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO misses VALUES (?, ?, ?)", (*key, now + self.ttl)
+            )
+            self._conn.execute("DELETE FROM misses WHERE expires_at < ?", (now,))
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-source lookups answered from the cache (hit), not (miss), and stores"""
+        with self._lock:
+            return {source: dict(counts) for source, counts in self._stats.items()}
+
+
+def create_negative_cache() -> Optional[NegativeCache]:
+    """Build the configured cache, or None when it is disabled"""
+    if not NEGATIVE_CACHE_ENABLED:
+        return None
+    return NegativeCache()
+
+
+negative_cache = create_negative_cache()
+
+
+async def is_known_missing(source: str, name: str) -> bool:
+    """Whether name is cached as not found in source"""
+    if negative_cache is None:
+        return False
+    return await asyncio.to_thread(negative_cache.is_missing, source, name)
+
+
+async def known_missing(source: str, names: Iterable[str]) -> Set[str]:
+    """The names cached as not found in source, checked in one worker thread"""
+    if negative_cache is None:
+        return set()
+    cache, names = negative_cache, list(names)
+    return await asyncio.to_thread(
+        lambda: {name for name in names if cache.is_missing(source, name)}
+    )
+
+
+async def record_missing(source: str, name: str) -> None:
+    """Cache name as not found in source"""
+    if negative_cache is not None:
+        await asyncio.to_thread(negative_cache.record, source, name)
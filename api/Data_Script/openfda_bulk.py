@@ -0,0 +1,200 @@
+"""
+Bulk openFDA lookups: resolve a whole run's drugs in a few OR-combined queries.
+
+openFDA treats space-separated search terms as OR, so one drugsfda request
+can cover many brand names and one label request many generic names.
+Names are split into chunks that respect a term and query-length limit,
+each chunk is paged with `limit`/`skip` until every name in it has a match,
+and results are demultiplexed back to the requested names. A name is only
+reported as missing when every page of its query was read.
+"""
+
+import asyncio
+import os
+from typing import Dict, Iterable, List, Optional
+
+from .names import normalize_medication_name
+from .response_cache import cached_get
+
+OPENFDA_BULK_ENABLED = os.getenv("OPENFDA_BULK_ENABLED", "1") == "1"
+# Terms per OR query and max length of the search expression
+OPENFDA_BULK_MAX_TERMS = int(os.getenv("OPENFDA_BULK_MAX_TERMS", "25"))
+OPENFDA_MAX_QUERY_LENGTH = int(os.getenv("OPENFDA_MAX_QUERY_LENGTH", "1000"))
+# Page sizes (openFDA allows up to 1000; label documents are large)
+OPENFDA_DRUGSFDA_PAGE_SIZE = int(os.getenv("OPENFDA_DRUGSFDA_PAGE_SIZE", "1000"))
+OPENFDA_LABEL_PAGE_SIZE = int(os.getenv("OPENFDA_LABEL_PAGE_SIZE", "100"))
+OPENFDA_BULK_MAX_PAGES = int(os.getenv("OPENFDA_BULK_MAX_PAGES", "5"))
+# openFDA rejects skip values above 25000
+OPENFDA_MAX_SKIP = 25000
+
+
+def _term(field: str, name: str) -> str:
+    return f'{field}:"{name.replace(chr(34), "")}"'
+
+
+def build_or_queries(
+    field: str,
+    names: Iterable[str],
+    max_terms: int = OPENFDA_BULK_MAX_TERMS,
+    max_length: int = OPENFDA_MAX_QUERY_LENGTH,
+) -> List[List[str]]:
+    """Split names into chunks whose OR-combined search stays within the limits"""
+    chunks: List[List[str]] = []
+    chunk: List[str] = []
+    length = 0
+    for name in names:
+        term_length = len(_term(field, name)) + 1
+        if chunk and (len(chunk) >= max_terms or length + term_length > max_length):
+            chunks.append(chunk)
+            chunk, length = [], 0
+        chunk.append(name)
+        length += term_length
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def match_rank(wanted: str, candidates: List[str]) -> Optional[int]:
+    """0 for an exact (normalized) match, 1 if wanted's words appear in a candidate"""
+    padded = f" {wanted} "
+    rank = None
+    for candidate in candidates:
+        candidate = normalize_medication_name(candidate)
+        if candidate == wanted:
+            return 0
+        if padded in f" {candidate} ":
+            rank = 1
+    return rank
+
+
+def demux(
+    results: List[Dict], field: str, names: Iterable[str]
+) -> Dict[str, Optional[Dict]]:
+    """
+    Pick the result for each requested name (normalized): the first with an
+    exact match on openfda.<field>, else the first containing the name.
+    """
+    matches: Dict[str, Optional[Dict]] = {}
+    ranks: Dict[str, int] = {}
+    wanted = {normalize_medication_name(name) for name in names}
+    for result in results:
+        candidates = result.get("openfda", {}).get(field, [])
+        for name in wanted:
+            if ranks.get(name) == 0:
+                continue
+            rank = match_rank(name, candidates)
+            if rank is not None and rank < ranks.get(name, 2):
+                matches[name], ranks[name] = result, rank
+    for name in wanted:
+        matches.setdefault(name, None)
+    return matches
+
+
+async def _query_chunk(
+    url: str, field: str, names: List[str], page_size: int
+) -> Dict[str, Optional[Dict]]:
+    """
+    Page through one OR query until every name has an exact match. If pages
+    were left unread, names without an exact match are left out: their
+    result may be on a later page, so they need a single lookup.
+    """
+    search = " ".join(_term(f"openfda.{field}", name) for name in names)
+    results: List[Dict] = []
+    skip = 0
+    complete = False
+    for _ in range(OPENFDA_BULK_MAX_PAGES):
+        response = await cached_get(
+            url, {"search": search, "limit": page_size, "skip": skip}
+        )
+        if response.status_code == 404:
+            # openFDA answers 404 when nothing matches
+            complete = True
+            break
+        response.raise_for_status()
+        data = response.json()
+        results.extend(data.get("results", []))
+        matches = demux(results, field, names)
+        total = data.get("meta", {}).get("results", {}).get("total", 0)
+        skip += page_size
+        exact = all(
+            match is not None and match_rank(name, match["openfda"].get(field, [])) == 0
+            for name, match in matches.items()
+        )
+        if exact or skip >= total:
+            complete = True
+            break
+        if skip > OPENFDA_MAX_SKIP:
+            break
+    matches = demux(results, field, names)
+    if complete:
+        return matches
+    return {
+        name: match
+        for name, match in matches.items()
+        if match is not None and match_rank(name, match["openfda"].get(field, [])) == 0
+    }
+
+
+async def bulk_lookup(
+    url: str, field: str, names: Iterable[str], page_size: int
+) -> Dict[str, Optional[Dict]]:
+    """
+    Resolve names against openfda.<field>, keyed by normalized name. Names
+    whose chunk failed or was cut off before they matched are left out so
+    callers can fall back to single lookups; names without a match map to
+    None.
+    """
+    unique = list(dict.fromkeys(n for n in names if n and n != "N/A"))
+    chunks = build_or_queries(f"openfda.{field}", unique)
+    responses = await asyncio.gather(
+        *(_query_chunk(url, field, chunk, page_size) for chunk in chunks),
+        return_exceptions=True,
+    )
+    found: Dict[str, Optional[Dict]] = {}
+    for chunk, response in zip(chunks, responses):
+        if isinstance(response, Exception):
+            print(f"Bulk openFDA {field} query failed for {chunk}: {response}")
+            continue
+        found.update(response)
+    return found
+
+
+class OpenFDABatch:
+    """drugsfda and label results prefetched for one run"""
+
+    def __init__(self, drugsfda: Dict[str, Optional[Dict]], labels: Dict):
+        self._drugsfda = drugsfda
+        self._labels = labels
+
+    @classmethod
+    async def prefetch(
+        cls, medications: List[str], drugsfda_url: str, label_url: str
+    ) -> "OpenFDABatch":
+        drugsfda = await bulk_lookup(
+            drugsfda_url, "brand_name", medications, OPENFDA_DRUGSFDA_PAGE_SIZE
+        )
+        generic_names = [
+            result["openfda"]["generic_name"][0]
+            for result in drugsfda.values()
+            if result and result.get("openfda", {}).get("generic_name")
+        ]
+        labels = await bulk_lookup(
+            label_url, "generic_name", generic_names, OPENFDA_LABEL_PAGE_SIZE
+        )
+        print(
+            f"Bulk openFDA prefetch: {sum(r is not None for r in drugsfda.values())}"
+            f"/{len(medications)} drugs, {len(labels)} labels"
+        )
+        return cls(drugsfda, labels)
+
+    def has_drugsfda(self, medication: str) -> bool:
+        return normalize_medication_name(medication) in self._drugsfda
+
+    def drugsfda(self, medication: str) -> Optional[Dict]:
+        return self._drugsfda.get(normalize_medication_name(medication))
+
+    def has_label(self, generic_name: str) -> bool:
+        return normalize_medication_name(generic_name) in self._labels
+
+    def label(self, generic_name: str) -> Optional[Dict]:
+        return self._labels.get(normalize_medication_name(generic_name))
@@ -0,0 +1,33 @@
+"""
+openFDA record fields the scraper keeps, shared by live, bulk and mirrored lookups.
+"""
+
+from typing import Dict
+
+# Label sections copied into each record
+LABEL_FIELDS = (
+    "indications_and_usage",
+    "dosage_and_administration",
+    "mechanism_of_action",
+    "boxed_warning",
+    "warnings_and_cautions",
+    "adverse_reactions",
+    "abuse",
+    "dependence",
+    "spl_medguide",
+    "information_for_patients",
+    "drug_interactions",
+    "contraindications",
+    "pregnancy",
+    "pediatric_use",
+    "geriatric_use",
+    "controlled_substance",
+)
+
+
+def extract_label_fields(result: Dict) -> Dict:
+    """First entry of every label section we keep, "N/A" when missing"""
+    return {
+        field: result[field][0] if result.get(field) else "N/A"
+        for field in LABEL_FIELDS
+    }
@@ -0,0 +1,407 @@
+"""
+Local mirror of the openFDA drugsfda and drug label bulk downloads.
+
+The dumps (https://open.fda.gov/apis/downloads/) are streamed record by
+record into a SQLite index keyed by brand name, generic name and
+application number, so full-formulary runs can read openFDA data without
+calling the API. Each dump file is a partition: re-running the ingest only
+re-reads partitions that are new or whose file changed.
+
+    cd api
+    python -m Data_Script.openfda_mirror download   # fetch new partitions
+    python -m Data_Script.openfda_mirror ingest     # index them
+
+Set OPENFDA_SOURCE=mirror to make the scraper use the index.
+"""
+
+import io
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zipfile
+import zlib
+from typing import Dict, Iterator, List, Optional, TextIO
+
+import httpx
+
+from .names import normalize_medication_name
+from .openfda_bulk import OpenFDABatch, match_rank
+from .openfda_fields import LABEL_FIELDS
+
+CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache"
+)
+# "live" queries the API, "mirror" reads the local index
+OPENFDA_SOURCE = os.getenv("OPENFDA_SOURCE", "live")
+OPENFDA_DUMP_DIR = os.getenv("OPENFDA_DUMP_DIR", os.path.join(CACHE_DIR, "openfda"))
+OPENFDA_MIRROR_PATH = os.getenv(
+    "OPENFDA_MIRROR_PATH", os.path.join(CACHE_DIR, "openfda_mirror.sqlite3")
+)
+OPENFDA_DOWNLOAD_INDEX = "https://api.fda.gov/download.json"
+
+# Dump file name prefix -> dataset
+DATASETS = {"drug-drugsfda-": "drugsfda", "drug-label-": "label"}
+# openfda keys kept on mirrored label records
+LABEL_OPENFDA_FIELDS = (
+    "brand_name",
+    "generic_name",
+    "application_number",
+    "manufacturer_name",
+)
+RESULTS_START = re.compile(r'"results"\s*:\s*\[')
+
+
+def iter_results(stream: TextIO, chunk_size: int = 1 << 20) -> Iterator[Dict]:
+    """
+    Yield the elements of the top-level "results" array of an openFDA dump
+    one at a time, holding roughly one record in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    while True:
+        match = RESULTS_START.search(buffer)
+        # "results" inside "meta" is an object, so only an array start counts
+        if match:
+            buffer = buffer[match.end() :]
+            break
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        buffer += chunk
+
+    pos = 0
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos == len(buffer):
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return
+            buffer, pos = chunk, 0
+            continue
+        if buffer[pos] == "]":
+            return
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Record continues past the buffer
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                raise
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield record
+        pos = end
+
+
+def open_dump(path: str) -> TextIO:
+    """Open a .json or zipped .json dump as a text stream"""
+    if path.endswith(".zip"):
+        archive = zipfile.ZipFile(path)
+        member = next(n for n in archive.namelist() if n.endswith(".json"))
+        return io.TextIOWrapper(archive.open(member), encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def dataset_for(file_name: str) -> Optional[str]:
+    for prefix, dataset in DATASETS.items():
+        if file_name.startswith(prefix) and file_name.endswith((".json", ".zip")):
+            return dataset
+    return None
+
+
+def _pack(record: Dict) -> bytes:
+    return zlib.compress(json.dumps(record, separators=(",", ":")).encode("utf-8"))
+
+
+def _unpack(blob: bytes) -> Dict:
+    return json.loads(zlib.decompress(blob))
+
+
+def _trim_label(record: Dict) -> Dict:
+    """Keep the label sections and openfda keys the scraper reads"""
+    openfda = record.get("openfda", {})
+    trimmed = {field: record[field] for field in LABEL_FIELDS if field in record}
+    trimmed["openfda"] = {k: openfda[k] for k in LABEL_OPENFDA_FIELDS if k in openfda}
+    trimmed["effective_time"] = record.get("effective_time", "")
+    return trimmed
+
+
+class OpenFDAMirror:
+    """SQLite index over ingested openFDA dumps"""
+
+    def __init__(self, path: str = OPENFDA_MIRROR_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS partitions (
+                    file_name TEXT PRIMARY KEY,
+                    dataset TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    records INTEGER NOT NULL,
+                    ingested_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS records (
+                    id TEXT PRIMARY KEY,
+                    dataset TEXT NOT NULL,
+                    partition TEXT NOT NULL,
+                    sort_key TEXT NOT NULL,
+                    data BLOB NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS records_partition
+                    ON records (partition);
+                CREATE TABLE IF NOT EXISTS names (
+                    dataset TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    record_id TEXT NOT NULL,
+                    partition TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS names_lookup
+                    ON names (dataset, kind, name);
+                CREATE INDEX IF NOT EXISTS names_partition ON names (partition);
+                CREATE INDEX IF NOT EXISTS names_record ON names (record_id);
+                """)
+
+    def _partition_current(self, file_name: str, stat: os.stat_result) -> bool:
+        row = self._conn.execute(
+            "SELECT size, mtime FROM partitions WHERE file_name = ?", (file_name,)
+        ).fetchone()
+        return row is not None and row == (stat.st_size, stat.st_mtime)
+
+    def ingest_partition(self, path: str) -> int:
+        """(Re)index one dump file, replacing whatever it contributed before"""
+        file_name = os.path.basename(path)
+        dataset = dataset_for(file_name)
+        stat = os.stat(path)
+        count = 0
+        with self._lock, self._conn, open_dump(path) as stream:
+            self._conn.execute("DELETE FROM records WHERE partition = ?", (file_name,))
+            self._conn.execute("DELETE FROM names WHERE partition = ?", (file_name,))
+            for record in iter_results(stream):
+                if dataset == "label":
+                    record_id = record.get("id") or record.get("set_id")
+                    record = _trim_label(record)
+                    sort_key = record["effective_time"]
+                else:
+                    record_id = record.get("application_number")
+                    # Prefer NDA/BLA applications over generics (ANDA)
+                    sort_key = "1" if (record_id or "").startswith("ANDA") else "0"
+                if not record_id:
+                    continue
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)",
+                    (record_id, dataset, file_name, sort_key, _pack(record)),
+                )
+                # The record may have moved here from another partition
+                self._conn.execute(
+                    "DELETE FROM names WHERE record_id = ?", (record_id,)
+                )
+                openfda = record.get("openfda", {})
+                names = [("brand", name) for name in openfda.get("brand_name", [])] + [
+                    ("generic", name) for name in openfda.get("generic_name", [])
+                ]
+                numbers = openfda.get("application_number", [])
+                if dataset == "drugsfda":
+                    numbers = [record_id]
+                names += [("application", number) for number in numbers]
+                self._conn.executemany(
+                    "INSERT INTO names VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (
+                            dataset,
+                            kind,
+                            normalize_medication_name(name),
+                            record_id,
+                            file_name,
+                        )
+                        for kind, name in names
+                    ],
+                )
+                count += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO partitions VALUES (?, ?, ?, ?, ?, ?)",
+                (file_name, dataset, stat.st_size, stat.st_mtime, count, time.time()),
+            )
+        return count
+
+    def remove_partition(self, file_name: str) -> None:
+        """Drop everything a dump file contributed to the index"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM records WHERE partition = ?", (file_name,))
+            self._conn.execute("DELETE FROM names WHERE partition = ?", (file_name,))
+            self._conn.execute(
+                "DELETE FROM partitions WHERE file_name = ?", (file_name,)
+            )
+
+    def refresh(self, dump_dir: str = OPENFDA_DUMP_DIR) -> Dict[str, int]:
+        """
+        Ingest partitions in dump_dir that are new or changed since last time,
+        and drop the ones whose dump file is gone
+        """
+        ingested = {}
+        file_names = sorted(os.listdir(dump_dir))
+        with self._lock:
+            indexed = [
+                file_name
+                for (file_name,) in self._conn.execute(
+                    "SELECT file_name FROM partitions"
+                )
+            ]
+        for file_name in indexed:
+            if file_name not in file_names:
+                self.remove_partition(file_name)
+                print(f"Removed partition {file_name} (dump file no longer present)")
+        for file_name in file_names:
+            if dataset_for(file_name) is None:
+                continue
+            path = os.path.join(dump_dir, file_name)
+            if self._partition_current(file_name, os.stat(path)):
+                continue
+            started = time.perf_counter()
+            ingested[file_name] = self.ingest_partition(path)
+            print(
+                f"Indexed {ingested[file_name]} records from {file_name} "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+        return ingested
+
+    def lookup(self, dataset: str, kind: str, name: str) -> Optional[Dict]:
+        """
+        Best record whose <kind> name matches: exact normalized matches first,
+        then names containing all of its words, as the live search would.
+        """
+        wanted = normalize_medication_name(name)
+        # Names are matched literally, so LIKE wildcards in them are escaped
+        pattern = re.sub(r"([\\%_])", r"\\\1", wanted)
+        # Newest label, or the innovator application for drugsfda
+        order = "DESC" if dataset == "label" else "ASC"
+        query = f"""SELECT names.name, records.data FROM names
+            JOIN records ON records.id = names.record_id
+            WHERE names.dataset = ? AND names.kind = ? AND names.name {{}}
+            ORDER BY records.sort_key {order} LIMIT {{}}"""
+        with self._lock:
+            rows = self._conn.execute(
+                query.format("= ?", 1), (dataset, kind, wanted)
+            ).fetchall()
+            if not rows:
+                rows = self._conn.execute(
+                    query.format("LIKE ? ESCAPE '\\'", 50),
+                    (dataset, kind, f"%{pattern}%"),
+                ).fetchall()
+                rows = [row for row in rows if match_rank(wanted, [row[0]]) == 1]
+        return _unpack(rows[0][1]) if rows else None
+
+    def drugsfda_by_brand(self, brand_name: str) -> Optional[Dict]:
+        return self.lookup("drugsfda", "brand", brand_name)
+
+    def drugsfda_by_application(self, application_number: str) -> Optional[Dict]:
+        return self.lookup("drugsfda", "application", application_number)
+
+    def label_by_generic(self, generic_name: str) -> Optional[Dict]:
+        return self.lookup("label", "generic", generic_name)
+
+    def known_names(self) -> List[str]:
+        """Distinct (normalized) brand and generic names in the index"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT name FROM names WHERE kind IN ('brand', 'generic')"
+            ).fetchall()
+        return [name for (name,) in rows]
+
+    def build_batch(self, medications: List[str]) -> OpenFDABatch:
+        """Answer a run's openFDA lookups from the index (misses are final)"""
+        drugsfda = {
+            normalize_medication_name(m): self.drugsfda_by_brand(m) for m in medications
+        }
+        labels = {}
+        for result in drugsfda.values():
+            generic_names = (result or {}).get("openfda", {}).get("generic_name")
+            if generic_names:
+                generic = normalize_medication_name(generic_names[0])
+                labels[generic] = self.label_by_generic(generic)
+        return OpenFDABatch(drugsfda, labels)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT dataset, count(*), sum(records) FROM partitions GROUP BY dataset"
+            ).fetchall()
+        return {
+            dataset: {"partitions": partitions, "records": records}
+            for dataset, partitions, records in rows
+        }
+
+
+_mirror: Optional[OpenFDAMirror] = None
+_mirror_lock = threading.Lock()
+
+
+def get_openfda_mirror() -> OpenFDAMirror:
+    """Shared mirror for the process, opened on first use"""
+    global _mirror
+    with _mirror_lock:
+        if _mirror is None:
+            _mirror = OpenFDAMirror()
+        return _mirror
+
+
+def download_partitions(dump_dir: str = OPENFDA_DUMP_DIR) -> List[str]:
+    """
+    Download drugsfda and label partitions listed in openFDA's download
+    index that are missing locally or belong to a newer export.
+    """
+    os.makedirs(dump_dir, exist_ok=True)
+    manifest_path = os.path.join(dump_dir, "manifest.json")
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    index = httpx.get(OPENFDA_DOWNLOAD_INDEX, timeout=60).json()
+    downloaded = []
+    for dataset in ("drugsfda", "label"):
+        entry = index["results"]["drug"][dataset]
+        for partition in entry["partitions"]:
+            url = partition["file"]
+            file_name = url.rsplit("/", 1)[-1]
+            path = os.path.join(dump_dir, file_name)
+            if manifest.get(file_name) == entry["export_date"] and os.path.exists(path):
+                continue
+            print(f"Downloading {url}...")
+            with httpx.stream("GET", url, timeout=None) as response:
+                response.raise_for_status()
+                with open(path + ".part", "wb") as f:
+                    for chunk in response.iter_bytes():
+                        f.write(chunk)
+            os.replace(path + ".part", path)
+            manifest[file_name] = entry["export_date"]
+            with open(manifest_path, "w") as f:
+                json.dump(manifest, f, indent=2)
+            downloaded.append(file_name)
+    return downloaded
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "ingest"
+    dump_dir = sys.argv[2] if len(sys.argv) > 2 else OPENFDA_DUMP_DIR
+    if command == "download":
+        print(f"Downloaded {len(download_partitions(dump_dir))} partitions")
+    elif command == "ingest":
+        mirror = OpenFDAMirror()
+        print(f"Ingested: {mirror.refresh(dump_dir)}")
+        print(f"Mirror contents: {mirror.stats()}")
+    else:
+        print(
+            "Usage: python -m Data_Script.openfda_mirror [download|ingest] [dump_dir]"
+        )
+        sys.exit(1)
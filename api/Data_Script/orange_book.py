@@ -0,0 +1,294 @@
+"""
+Process-wide Orange Book index.
+
+The patent, exclusivity and products files are parsed once, shared across
+requests and threads, and reloaded in a background thread when any of the
+files change on disk.
+"""
+
+import csv
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+ORANGE_BOOK_DIR = os.getenv(
+    "ORANGE_BOOK_DIR",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Orange_Data"
+    ),
+)
+
+PATENT_FILE = "patent.txt"
+EXCLUSIVITY_FILE = "exclusivity.txt"
+PRODUCTS_FILE = "products.txt"
+
+# Only the columns the scraper actually reads are kept
+PATENT_COLUMNS = ("Appl_No", "Patent_No", "Patent_Expire_Date_Text")
+EXCLUSIVITY_COLUMNS = ("Appl_No", "Exclusivity_Code", "Exclusivity_Date")
+PRODUCTS_COLUMNS = ("Appl_No", "Applicant_Full_Name")
+
+
+def read_columns(path: str, columns: Tuple[str, ...]):
+    """Yield tuples of the requested columns from a ~-delimited Orange Book file"""
+    with open(path, "r", newline="") as f:
+        reader = csv.reader(f, delimiter="~")
+        header = next(reader, None)
+        if header is None:
+            return
+        indexes = [header.index(column) for column in columns]
+        width = max(indexes)
+        for row in reader:
+            if len(row) <= width:
+                continue
+            yield tuple(row[i] for i in indexes)
+
+
+@lru_cache(maxsize=None)
+def parse_orange_book_date(text: str) -> int:
+    """
+    Convert an Orange Book date such as "Aug 24, 2026" into a date ordinal.
+    Unparseable dates map to 0 so they never win a "latest" comparison.
+    """
+    try:
+        return datetime.strptime(text.strip(), "%b %d, %Y").toordinal()
+    except ValueError:
+        return 0
+
+
+def aggregate_indexes(patents, exclusivities) -> Tuple[Optional[int], ...]:
+    """
+    Positions of the latest patent, earliest patent and latest exclusivity
+    within an application's rows (None when there are no rows), plus the
+    number of distinct patents. Dates are compared chronologically.
+    """
+
+    def pick(rows, choose):
+        if not rows:
+            return None
+        return choose(
+            range(len(rows)), key=lambda i: parse_orange_book_date(rows[i][1])
+        )
+
+    return (
+        pick(patents, max),
+        pick(patents, min),
+        pick(exclusivities, max),
+        len({patent_no for patent_no, _ in patents}),
+    )
+
+
+def application_summary(
+    latest_patent, earliest_patent, latest_exclusivity, patent_count, applicant
+) -> Dict:
+    """Build the per-application aggregate returned by summary()"""
+    return {
+        "latest_patent": (
+            {
+                "patent_number": latest_patent[0],
+                "expiration_date": latest_patent[1],
+            }
+            if latest_patent
+            else {}
+        ),
+        "latest_exclusivity": (
+            {
+                "exclusivity_code": latest_exclusivity[0],
+                "expiration_date": latest_exclusivity[1],
+            }
+            if latest_exclusivity
+            else {}
+        ),
+        "patent_count": patent_count,
+        "earliest_patent_expiry": earliest_patent[1] if earliest_patent else "N/A",
+        "product": (
+            {"applicant_full_name": applicant, "drug_manufacturer": applicant}
+            if applicant is not None
+            else {}
+        ),
+    }
+
+
+EMPTY_SUMMARY = application_summary(None, None, None, 0, None)
+
+
+def group_by_application(path: str, columns: Tuple[str, ...]) -> Dict:
+    """Group the non-key columns of a file by application number"""
+    grouped = defaultdict(list)
+    if not os.path.exists(path):
+        print(f"Orange Book file not found, skipping: {path}")
+        return {}
+    for app_no, *values in read_columns(path, columns):
+        grouped[app_no].append(tuple(values))
+    return dict(grouped)
+
+
+class OrangeBookIndex:
+    """
+    Thread-safe, lazily refreshed view over the Orange Book files.
+
+    The first lookup parses the files if load() hasn't been called yet, so it
+    blocks (call it from a worker thread). After that, lookups never wait on
+    a reload: changed files are re-parsed in a background thread while the
+    old tables keep serving, and the new ones are swapped in with a single
+    reference assignment.
+    """
+
+    def __init__(self, data_dir: str = ORANGE_BOOK_DIR, check_interval: float = 5.0):
+        self.data_dir = data_dir
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._tables = ({}, {}, {}, {})
+        self._mtimes = None
+        self._last_check = 0.0
+        self._reloading = False
+        # Separate from _lock, which load() holds for the whole parse
+        self._reload_lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.data_dir, name)
+
+    def _file_mtimes(self) -> Tuple[Optional[int], ...]:
+        mtimes = []
+        for name in (PATENT_FILE, EXCLUSIVITY_FILE, PRODUCTS_FILE):
+            try:
+                mtimes.append(os.stat(self._path(name)).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def load(self) -> None:
+        """(Re)parse the Orange Book files and swap the new tables in"""
+        with self._lock:
+            mtimes = self._file_mtimes()
+            start = time.perf_counter()
+            tables = (
+                group_by_application(self._path(PATENT_FILE), PATENT_COLUMNS),
+                group_by_application(self._path(EXCLUSIVITY_FILE), EXCLUSIVITY_COLUMNS),
+                group_by_application(self._path(PRODUCTS_FILE), PRODUCTS_COLUMNS),
+            )
+            summaries = {}
+            patents, exclusivities, products = tables
+            for app_no in set(patents) | set(exclusivities) | set(products):
+                app_patents = patents.get(app_no, [])
+                app_exclusivities = exclusivities.get(app_no, [])
+                app_products = products.get(app_no, [])
+                latest, earliest, latest_excl, count = aggregate_indexes(
+                    app_patents, app_exclusivities
+                )
+                summaries[app_no] = application_summary(
+                    app_patents[latest] if latest is not None else None,
+                    app_patents[earliest] if earliest is not None else None,
+                    (
+                        app_exclusivities[latest_excl]
+                        if latest_excl is not None
+                        else None
+                    ),
+                    count,
+                    app_products[0][0] if app_products else None,
+                )
+            # One assignment keeps rows and aggregates consistent for readers
+            self._tables = tables + (summaries,)
+            self._mtimes = mtimes
+            self._last_check = time.monotonic()
+            print(
+                f"Orange Book index loaded in {time.perf_counter() - start:.2f}s "
+                f"({len(tables[0])} patent, {len(tables[1])} exclusivity, "
+                f"{len(tables[2])} product applications)"
+            )
+
+    def _ensure_fresh(self) -> None:
+        now = time.monotonic()
+        if self._mtimes is not None and now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        if self._mtimes is None:
+            self.load()
+        elif self._file_mtimes() != self._mtimes:
+            self._reload_in_background()
+
+    def _reload_in_background(self) -> None:
+        with self._reload_lock:
+            if self._reloading:
+                return
+            self._reloading = True
+
+        def reload() -> None:
+            try:
+                self.load()
+            except Exception as e:
+                # Keep serving the old tables; the next check tries again
+                print(f"Orange Book reload failed: {e}")
+            finally:
+                self._reloading = False
+
+        threading.Thread(target=reload, name="orange-book-reload", daemon=True).start()
+
+    def patents(self, app_no: str) -> List[Dict]:
+        """Patents listed for an application number"""
+        self._ensure_fresh()
+        return [
+            {"patent_number": patent_no, "expiration_date": expiration_date}
+            for patent_no, expiration_date in self._tables[0].get(app_no, ())
+        ]
+
+    def exclusivities(self, app_no: str) -> List[Dict]:
+        """Exclusivities listed for an application number"""
+        self._ensure_fresh()
+        return [
+            {"exclusivity_code": code, "expiration_date": expiration_date}
+            for code, expiration_date in self._tables[1].get(app_no, ())
+        ]
+
+    def products(self, app_no: str) -> List[Dict]:
+        """Products listed for an application number"""
+        self._ensure_fresh()
+        return [
+            {"applicant_full_name": applicant, "drug_manufacturer": applicant}
+            for (applicant,) in self._tables[2].get(app_no, ())
+        ]
+
+    def summary(self, app_no: str) -> Dict:
+        """
+        Precomputed aggregates for an application number: latest patent,
+        latest exclusivity, distinct patent count, earliest patent expiry and
+        the first listed product. The returned dict is shared; don't mutate it.
+        """
+        self._ensure_fresh()
+        return self._tables[3].get(app_no, EMPTY_SUMMARY)
+
+
+_index: Optional[OrangeBookIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_orange_book_index() -> OrangeBookIndex:
+    """
+    Return the shared Orange Book index, creating it on first use.
+    A compiled snapshot (see orange_book_snapshot) is preferred when present;
+    it rebuilds itself when the text files are newer.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                from .orange_book_snapshot import (
+                    ORANGE_BOOK_SNAPSHOT,
+                    OrangeBookSnapshot,
+                )
+
+                if os.path.exists(ORANGE_BOOK_SNAPSHOT):
+                    _index = OrangeBookSnapshot()
+                else:
+                    _index = OrangeBookIndex()
+    return _index
+
+
+def preload_orange_book() -> OrangeBookIndex:
+    """Load the shared index eagerly (called at application startup)"""
+    index = get_orange_book_index()
+    index.load()
+    return index
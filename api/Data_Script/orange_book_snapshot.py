@@ -0,0 +1,386 @@
+"""
+Compact, memory-mappable snapshot of the Orange Book tables.
+
+The snapshot is built once from the ~-delimited files and then mapped
+read-only by every worker, so all uvicorn processes share the same pages
+instead of each holding tens of thousands of small Python objects. A
+snapshot older than the text files it was built from is rebuilt before it
+is mapped (in the background once one is already mapped).
+
+File layout (all integers little-endian uint32):
+
+    header      magic, version and section counts (see HEADER)
+    apps        sorted numeric application numbers            [n_apps]
+    patent_idx  first patent record of each application       [n_apps + 1]
+    excl_idx    first exclusivity record of each application  [n_apps + 1]
+    prod_idx    first product record of each application      [n_apps + 1]
+    patents     (patent_no, expiration_date) string ids       [n_patents * 2]
+    excls       (exclusivity_code, expiration_date) string ids [n_excls * 2]
+    products    applicant_full_name string id                 [n_products]
+    summaries   (latest patent, earliest patent, latest exclusivity record
+                 or NONE, distinct patent count) per application [n_apps * 4]
+    str_idx     byte offset of each interned string           [n_strings + 1]
+    strings     utf-8 blob of every distinct string
+"""
+
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from .orange_book import (
+    EXCLUSIVITY_COLUMNS,
+    EXCLUSIVITY_FILE,
+    ORANGE_BOOK_DIR,
+    PATENT_COLUMNS,
+    PATENT_FILE,
+    PRODUCTS_COLUMNS,
+    PRODUCTS_FILE,
+    EMPTY_SUMMARY,
+    aggregate_indexes,
+    application_summary,
+    group_by_application,
+)
+
+MAGIC = b"OBSNAP\x00\x00"
+VERSION = 2
+NONE = 0xFFFFFFFF
+HEADER = struct.Struct("<8sIIIIII")
+U32 = struct.Struct("<I")
+
+ORANGE_BOOK_SNAPSHOT = os.getenv(
+    "ORANGE_BOOK_SNAPSHOT", os.path.join(ORANGE_BOOK_DIR, "orange_book.snap")
+)
+
+
+def _u32_array(values) -> array:
+    data = array("I", values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data
+
+
+def build_snapshot(
+    data_dir: str = ORANGE_BOOK_DIR, output_path: str = ORANGE_BOOK_SNAPSHOT
+) -> str:
+    """Compile the Orange Book files in data_dir into a snapshot file"""
+    patents = group_by_application(os.path.join(data_dir, PATENT_FILE), PATENT_COLUMNS)
+    exclusivities = group_by_application(
+        os.path.join(data_dir, EXCLUSIVITY_FILE), EXCLUSIVITY_COLUMNS
+    )
+    products = group_by_application(
+        os.path.join(data_dir, PRODUCTS_FILE), PRODUCTS_COLUMNS
+    )
+
+    apps = sorted(
+        {
+            int(app_no)
+            for table in (patents, exclusivities, products)
+            for app_no in table
+        }
+    )
+
+    strings: Dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        if value not in strings:
+            strings[value] = len(strings)
+        return strings[value]
+
+    patent_idx, excl_idx, prod_idx = [0], [0], [0]
+    patent_rows, excl_rows, prod_rows, summary_rows = [], [], [], []
+    for app in apps:
+        app_no = f"{app:06d}"
+        app_patents = patents.get(app_no, [])
+        app_exclusivities = exclusivities.get(app_no, [])
+        latest, earliest, latest_excl, count = aggregate_indexes(
+            app_patents, app_exclusivities
+        )
+        patent_base, excl_base = patent_idx[-1], excl_idx[-1]
+        summary_rows.extend(
+            (
+                NONE if latest is None else patent_base + latest,
+                NONE if earliest is None else patent_base + earliest,
+                NONE if latest_excl is None else excl_base + latest_excl,
+                count,
+            )
+        )
+        for patent_no, expiration_date in app_patents:
+            patent_rows.extend((intern(patent_no), intern(expiration_date)))
+        for code, expiration_date in app_exclusivities:
+            excl_rows.extend((intern(code), intern(expiration_date)))
+        for (applicant,) in products.get(app_no, ()):
+            prod_rows.append(intern(applicant))
+        patent_idx.append(len(patent_rows) // 2)
+        excl_idx.append(len(excl_rows) // 2)
+        prod_idx.append(len(prod_rows))
+
+    blob = bytearray()
+    str_idx = [0]
+    for value in strings:  # dicts preserve insertion order, i.e. string id order
+        blob.extend(value.encode("utf-8"))
+        str_idx.append(len(blob))
+
+    # Per process, so workers rebuilding at the same time don't share a file
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                len(apps),
+                len(patent_rows) // 2,
+                len(excl_rows) // 2,
+                len(prod_rows),
+                len(strings),
+            )
+        )
+        for section in (
+            apps,
+            patent_idx,
+            excl_idx,
+            prod_idx,
+            patent_rows,
+            excl_rows,
+            prod_rows,
+            summary_rows,
+            str_idx,
+        ):
+            _u32_array(section).tofile(f)
+        f.write(blob)
+    # Readers holding the old mapping keep their pages; new opens see the new file
+    os.replace(tmp_path, output_path)
+    print(
+        f"Orange Book snapshot written to {output_path} "
+        f"({len(apps)} applications, {len(strings)} strings)"
+    )
+    return output_path
+
+
+class OrangeBookSnapshot:
+    """
+    Read-only, mmap-backed Orange Book index with O(log n) lookups.
+
+    Exposes the same lookup methods as OrangeBookIndex, remaps the file when
+    it is replaced on disk and rebuilds it when the Orange Book files in
+    data_dir are newer.
+    """
+
+    def __init__(
+        self,
+        path: str = ORANGE_BOOK_SNAPSHOT,
+        check_interval: float = 5.0,
+        data_dir: str = ORANGE_BOOK_DIR,
+    ):
+        self.path = path
+        self.check_interval = check_interval
+        self.data_dir = data_dir
+        self._lock = threading.Lock()
+        self._view = None
+        self._mtime = None
+        self._last_check = 0.0
+        self._rebuilding = False
+        self._rebuild_lock = threading.Lock()
+
+    def is_stale(self) -> bool:
+        """Whether any Orange Book file changed after the snapshot was built"""
+        try:
+            snapshot_mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return True
+        for name in (PATENT_FILE, EXCLUSIVITY_FILE, PRODUCTS_FILE):
+            try:
+                if os.stat(os.path.join(self.data_dir, name)).st_mtime_ns > (
+                    snapshot_mtime
+                ):
+                    return True
+            except OSError:
+                continue
+        return False
+
+    def load(self) -> None:
+        """Map the snapshot file (rebuilding it first if stale) and parse its header"""
+        with self._lock:
+            if self.is_stale():
+                print(f"Orange Book snapshot {self.path} is out of date, rebuilding")
+                build_snapshot(self.data_dir, self.path)
+            with open(self.path, "rb") as f:
+                mtime = os.fstat(f.fileno()).st_mtime_ns
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, n_apps, n_patents, n_excls, n_products, n_strings = (
+                HEADER.unpack_from(mm, 0)
+            )
+            if magic != MAGIC or version != VERSION:
+                mm.close()
+                raise ValueError(
+                    f"Unsupported Orange Book snapshot {self.path} (version {version})"
+                )
+
+            offsets = {}
+            position = HEADER.size
+            for name, count in (
+                ("apps", n_apps),
+                ("patent_idx", n_apps + 1),
+                ("excl_idx", n_apps + 1),
+                ("prod_idx", n_apps + 1),
+                ("patents", n_patents * 2),
+                ("excls", n_excls * 2),
+                ("products", n_products),
+                ("summaries", n_apps * 4),
+                ("str_idx", n_strings + 1),
+                ("strings", 0),
+            ):
+                offsets[name] = position
+                position += count * U32.size
+
+            # The view is swapped as one tuple so concurrent lookups stay consistent
+            self._view = (mm, n_apps, offsets)
+            self._mtime = mtime
+            self._last_check = time.monotonic()
+
+    def _ensure_fresh(self) -> None:
+        now = time.monotonic()
+        if self._view is not None and now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        if self._view is None:
+            self.load()
+            return
+        if self.is_stale():
+            # Keep serving the current mapping while the new snapshot builds
+            self._rebuild_in_background()
+            return
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            self.load()
+
+    def _rebuild_in_background(self) -> None:
+        with self._rebuild_lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def rebuild() -> None:
+            try:
+                self.load()
+            except Exception as e:
+                print(f"Orange Book snapshot rebuild failed: {e}")
+            finally:
+                self._rebuilding = False
+
+        threading.Thread(
+            target=rebuild, name="orange-book-snapshot", daemon=True
+        ).start()
+
+    @staticmethod
+    def _u32(mm, offset: int, index: int) -> int:
+        return U32.unpack_from(mm, offset + index * U32.size)[0]
+
+    @classmethod
+    def _string(cls, view, string_id: int) -> str:
+        mm, _, offsets = view
+        start = cls._u32(mm, offsets["str_idx"], string_id)
+        end = cls._u32(mm, offsets["str_idx"], string_id + 1)
+        base = offsets["strings"]
+        return mm[base + start : base + end].decode("utf-8")
+
+    @classmethod
+    def _find(cls, view, app_no: str) -> Optional[int]:
+        """Binary search the sorted application table"""
+        mm, n_apps, offsets = view
+        try:
+            key = int(app_no)
+        except (TypeError, ValueError):
+            return None
+        lo, hi = 0, n_apps
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if cls._u32(mm, offsets["apps"], mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < n_apps and cls._u32(mm, offsets["apps"], lo) == key:
+            return lo
+        return None
+
+    @classmethod
+    def _record(cls, view, section: str, record: int, width: int):
+        mm, _, offsets = view
+        ids = struct.unpack_from(
+            f"<{width}I", mm, offsets[section] + record * width * U32.size
+        )
+        return tuple(cls._string(view, i) for i in ids)
+
+    def _records(self, app_no: str, index_section: str, section: str, width: int):
+        self._ensure_fresh()
+        view = self._view
+        position = self._find(view, app_no)
+        if position is None:
+            return []
+        mm, _, offsets = view
+        start = self._u32(mm, offsets[index_section], position)
+        end = self._u32(mm, offsets[index_section], position + 1)
+        return [
+            self._record(view, section, record, width) for record in range(start, end)
+        ]
+
+    def patents(self, app_no: str) -> List[Dict]:
+        """Patents listed for an application number"""
+        return [
+            {"patent_number": patent_no, "expiration_date": expiration_date}
+            for patent_no, expiration_date in self._records(
+                app_no, "patent_idx", "patents", 2
+            )
+        ]
+
+    def exclusivities(self, app_no: str) -> List[Dict]:
+        """Exclusivities listed for an application number"""
+        return [
+            {"exclusivity_code": code, "expiration_date": expiration_date}
+            for code, expiration_date in self._records(app_no, "excl_idx", "excls", 2)
+        ]
+
+    def products(self, app_no: str) -> List[Dict]:
+        """Products listed for an application number"""
+        return [
+            {"applicant_full_name": applicant, "drug_manufacturer": applicant}
+            for (applicant,) in self._records(app_no, "prod_idx", "products", 1)
+        ]
+
+    def summary(self, app_no: str) -> Dict:
+        """
+        Precomputed aggregates for an application number, in the same shape
+        as OrangeBookIndex.summary()
+        """
+        self._ensure_fresh()
+        view = self._view
+        position = self._find(view, app_no)
+        if position is None:
+            return EMPTY_SUMMARY
+        mm, _, offsets = view
+        latest, earliest, latest_excl, count = struct.unpack_from(
+            "<4I", mm, offsets["summaries"] + position * 4 * U32.size
+        )
+        products = self._records(app_no, "prod_idx", "products", 1)
+        return application_summary(
+            None if latest == NONE else self._record(view, "patents", latest, 2),
+            None if earliest == NONE else self._record(view, "patents", earliest, 2),
+            (
+                None
+                if latest_excl == NONE
+                else self._record(view, "excls", latest_excl, 2)
+            ),
+            count,
+            products[0][0] if products else None,
+        )
+
+
+if __name__ == "__main__":
+    build_snapshot(*sys.argv[1:3])
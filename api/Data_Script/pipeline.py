@@ -0,0 +1,99 @@
+"""
+Dependency-driven stage runner for the per-medication scrape.
+
+A pipeline is a set of named stages, each declaring the stages it needs.
+Every stage starts as soon as all of its requirements have finished, so
+independent stages run concurrently and expensive ones can be gated on cheap
+checks. The first stage to fail stops the run: stages waiting on it never
+start and the ones still running are cancelled.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Tuple
+
+# Receives the run's inputs plus the results of finished stages, by name
+StageFn = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class Stage(NamedTuple):
+    name: str
+    run: StageFn
+    requires: Tuple[str, ...] = ()
+
+
+class StageFailed(Exception):
+    """A stage raised; the original exception is kept as `error` (and __cause__)"""
+
+    def __init__(self, stage: str, error: BaseException):
+        super().__init__(f"{stage} stage failed: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class Pipeline:
+    """Runs stages in dependency order, each as early as its requirements allow"""
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique")
+        for stage in stages:
+            unknown = set(stage.requires) - set(self.stages)
+            if unknown:
+                raise ValueError(f"{stage.name} requires unknown stages {unknown}")
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        """Stage names with every stage after its requirements (rejects cycles)"""
+        order: List[str] = []
+        remaining = dict(self.stages)
+        while remaining:
+            ready = [
+                name
+                for name, stage in remaining.items()
+                if all(required in order for required in stage.requires)
+            ]
+            if not ready:
+                raise ValueError(f"Stage dependency cycle among {sorted(remaining)}")
+            order.extend(ready)
+            for name in ready:
+                del remaining[name]
+        return order
+
+    async def run(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run every stage and return their results by stage name. Raises
+        StageFailed for the first stage that raises.
+        """
+        clash = set(inputs) & set(self.stages)
+        if clash:
+            raise ValueError(f"Inputs {clash} clash with stage names")
+        context = dict(inputs)
+        results: Dict[str, Any] = {}
+        pending = list(self.order)
+        running: Dict[asyncio.Task, str] = {}
+        try:
+            while pending or running:
+                for name in [n for n in pending if self._ready(n, results)]:
+                    pending.remove(name)
+                    task = asyncio.create_task(self.stages[name].run(context))
+                    running[task] = name
+                done, _ = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    name = running.pop(task)
+                    error = task.exception()
+                    if error is not None:
+                        raise StageFailed(name, error) from error
+                    results[name] = context[name] = task.result()
+        finally:
+            # Don't leave sibling stages running when the run bailed out early
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        return results
+
+    def _ready(self, name: str, results: Dict[str, Any]) -> bool:
+        return all(required in results for required in self.stages[name].requires)
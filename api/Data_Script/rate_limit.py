@@ -0,0 +1,93 @@
+"""
+Per-host rate limiting for upstream APIs.
+
+Replaces the blanket one-second sleep between medications: each upstream
+host gets its own request rate, so concurrent workers only wait on the
+host they are actually about to call.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+# Requests per second allowed for each upstream host
+DEFAULT_HOST_RATES = {
+    "api.fda.gov": float(os.getenv("OPENFDA_RATE_LIMIT", "4")),  # 240/min without a key
+    "rxnav.nlm.nih.gov": float(os.getenv("RXNAV_RATE_LIMIT", "20")),
+    "go.drugbank.com": float(os.getenv("DRUGBANK_RATE_LIMIT", "1")),
+}
+DEFAULT_RATE = float(os.getenv("DEFAULT_RATE_LIMIT", "5"))
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` calls per second with bursts of `burst`"""
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float = 1.0) -> float:
+        """Take tokens and return how long the caller must wait before using them"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Block until the requested tokens are available"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0) -> None:
+        """Wait without blocking the event loop until the tokens are available"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class HostRateLimiter:
+    """Token bucket per upstream host, created on first use"""
+
+    def __init__(
+        self,
+        host_rates: Optional[Dict[str, float]] = None,
+        default_rate: float = DEFAULT_RATE,
+    ):
+        self.host_rates = dict(DEFAULT_HOST_RATES if host_rates is None else host_rates)
+        self.default_rate = default_rate
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).hostname or url
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(
+                    self.host_rates.get(host, self.default_rate)
+                )
+            return self._buckets[host]
+
+    def wait(self, url: str) -> None:
+        """Block until a request to url's host is allowed"""
+        self.bucket(url).acquire()
+
+    async def wait_async(self, url: str) -> None:
+        """Wait until a request to url's host is allowed, without blocking the loop"""
+        await self.bucket(url).acquire_async()
+
+
+# Shared by every scrape running in this process
+rate_limiter = HostRateLimiter()
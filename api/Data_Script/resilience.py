@@ -0,0 +1,201 @@
+"""
+Retry backoff and per-host circuit breakers for upstream requests.
+
+Retryable failures (429, 5xx, network errors) back off exponentially with
+full jitter and never retry sooner than the server's Retry-After. Each host
+also gets a circuit breaker: after a run of consecutive failures its
+requests are refused outright for a cool-down period, then a single probe
+request decides whether the host is healthy again. One upstream being down
+then costs every medication a fast error instead of a round of timeouts.
+"""
+
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from .http_client import get_client
+from .metrics import CIRCUIT_OPEN, CIRCUIT_REJECTED
+from .rate_limit import rate_limiter
+
+UPSTREAM_MAX_ATTEMPTS = int(os.getenv("UPSTREAM_MAX_ATTEMPTS", "3"))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))
+UPSTREAM_BACKOFF_CAP = float(os.getenv("UPSTREAM_BACKOFF_CAP", "8"))
+# Give up instead of waiting when a server asks for a longer pause
+UPSTREAM_RETRY_AFTER_MAX = float(os.getenv("UPSTREAM_RETRY_AFTER_MAX", "30"))
+# Consecutive failures that open a host's circuit, and how long it stays open
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+def is_retryable(status_code: int) -> bool:
+    return status_code in RETRYABLE_STATUS_CODES
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    """Retry-After as seconds (it may be a delay or an HTTP date), or None"""
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(
+    attempt: int,
+    retry_after: Optional[float] = None,
+    base: float = UPSTREAM_BACKOFF_BASE,
+    cap: float = UPSTREAM_BACKOFF_CAP,
+) -> float:
+    """Full-jitter exponential backoff, never shorter than Retry-After"""
+    delay = random.uniform(0, min(cap, base * 2**attempt))
+    return max(delay, retry_after or 0)
+
+
+class CircuitOpenError(Exception):
+    """Requests to the host are refused while its circuit is open"""
+
+
+class CircuitBreaker:
+    """Thread-safe closed -> open -> half-open breaker for one host"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_seconds: float = CIRCUIT_RESET_SECONDS,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """Whether requests are being refused right now (no probe due yet)"""
+        with self._lock:
+            return (
+                self.state == "open"
+                and time.monotonic() - self._opened_at < self.reset_seconds
+            )
+
+    def allow(self) -> None:
+        """Raise CircuitOpenError unless a request may be sent now"""
+        with self._lock:
+            if self.state == "closed":
+                return
+            now = time.monotonic()
+            if self.state == "open" and now - self._opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._probe_started = None
+            if self.state == "half_open":
+                # One probe at a time; a probe that never reported is replaced
+                if (
+                    self._probe_started is None
+                    or now - self._probe_started >= self.reset_seconds
+                ):
+                    self._probe_started = now
+                    return
+            retry_in = max(0.0, self._opened_at + self.reset_seconds - now)
+        CIRCUIT_REJECTED.labels(self.name).inc()
+        raise CircuitOpenError(
+            f"{self.name} is unavailable after repeated failures "
+            f"(retrying in {retry_in:.0f}s)"
+        )
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                print(f"Circuit for {self.name} closed")
+            self.state = "closed"
+            self.failures = 0
+            self._probe_started = None
+        CIRCUIT_OPEN.labels(self.name).set(0)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "closed" and self.failures < self.failure_threshold:
+                return
+            if self.state != "open":
+                print(f"Circuit for {self.name} opened after {self.failures} failures")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            self._probe_started = None
+        CIRCUIT_OPEN.labels(self.name).set(1)
+
+
+class HostCircuitBreakers:
+    """Circuit breaker per upstream host, created on first use"""
+
+    def __init__(
+        self,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_seconds: float = CIRCUIT_RESET_SECONDS,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        host = urlparse(url).hostname or url
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(
+                    host, self.failure_threshold, self.reset_seconds
+                )
+            return self._breakers[host]
+
+    def allow(self, url: str) -> None:
+        """Raise CircuitOpenError while url's host is considered down"""
+        self.breaker(url).allow()
+
+    def record(self, url: str, status_code: Optional[int]) -> None:
+        """
+        Record the outcome of a request to url's host; status_code None means
+        it failed without a response. Only 429 and 5xx count against the
+        host: a 404 or other client error is a healthy answer.
+        """
+        if status_code is None or is_retryable(status_code):
+            self.breaker(url).record_failure()
+        else:
+            self.breaker(url).record_success()
+
+
+# Shared by every scrape running in this process
+circuit_breakers = HostCircuitBreakers()
+
+
+async def guarded_get(url: str, **kwargs) -> httpx.Response:
+    """
+    GET url on its pooled client once the host's circuit breaker and rate
+    limit allow it, and record the outcome on the breaker. Raises
+    CircuitOpenError without sending anything while the host is down.
+    """
+    circuit_breakers.allow(url)
+    await rate_limiter.wait_async(url)
+    try:
+        response = await get_client(url).get(url, **kwargs)
+    except httpx.TransportError:
+        circuit_breakers.record(url, None)
+        raise
+    circuit_breakers.record(url, response.status_code)
+    return response
@@ -0,0 +1,318 @@
+"""
+Two-tier cache for upstream API responses (RxNav, openFDA drugsfda/label).
+
+A small in-process LRU sits in front of a SQLite store shared by all
+workers. Each endpoint has its own TTL; once an entry goes stale it is
+revalidated with If-None-Match / If-Modified-Since when the upstream sent
+an ETag or Last-Modified, so unchanged responses cost a 304 instead of a
+full download. Hit rates are tracked per endpoint.
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+
+import httpx
+
+from .resilience import guarded_get
+
+DAY = 24 * 3600
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+RESPONSE_CACHE_PATH = os.getenv(
+    "RESPONSE_CACHE_PATH",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ".cache",
+        "responses.sqlite3",
+    ),
+)
+RESPONSE_CACHE_MEMORY_ENTRIES = int(os.getenv("RESPONSE_CACHE_MEMORY_ENTRIES", "1000"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "50000"))
+# Stale entries are kept this long past their TTL so they can be revalidated
+RESPONSE_CACHE_STALE_TTL = float(os.getenv("RESPONSE_CACHE_STALE_TTL", str(30 * DAY)))
+
+# Per-endpoint TTLs in seconds; RxCUIs and class memberships change ~monthly
+RESPONSE_CACHE_TTL_RXCUI = float(os.getenv("RESPONSE_CACHE_TTL_RXCUI", str(30 * DAY)))
+RESPONSE_CACHE_TTL_RXCLASS = float(
+    os.getenv("RESPONSE_CACHE_TTL_RXCLASS", str(30 * DAY))
+)
+RESPONSE_CACHE_TTL_DRUGSFDA = float(
+    os.getenv("RESPONSE_CACHE_TTL_DRUGSFDA", str(7 * DAY))
+)
+RESPONSE_CACHE_TTL_LABEL = float(os.getenv("RESPONSE_CACHE_TTL_LABEL", str(7 * DAY)))
+RESPONSE_CACHE_DEFAULT_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(DAY)))
+
+# Endpoint name, URL path fragment, TTL
+ENDPOINTS = (
+    ("rxcui", "/rxcui.json", RESPONSE_CACHE_TTL_RXCUI),
+    ("rxclass", "/rxclass/", RESPONSE_CACHE_TTL_RXCLASS),
+    ("drugsfda", "/drugsfda.json", RESPONSE_CACHE_TTL_DRUGSFDA),
+    ("label", "/label.json", RESPONSE_CACHE_TTL_LABEL),
+)
+
+
+class CachedResponse(NamedTuple):
+    status_code: int
+    content: bytes
+    content_type: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float
+
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def to_response(self, url: str) -> httpx.Response:
+        headers = {"content-type": self.content_type, "x-cache": "HIT"}
+        if self.etag:
+            headers["etag"] = self.etag
+        if self.last_modified:
+            headers["last-modified"] = self.last_modified
+        return httpx.Response(
+            self.status_code,
+            content=self.content,
+            headers=headers,
+            request=httpx.Request("GET", url),
+        )
+
+
+def endpoint_for(url: str) -> str:
+    for name, fragment, _ in ENDPOINTS:
+        if fragment in url:
+            return name
+    return "other"
+
+
+def ttl_for(endpoint: str) -> float:
+    for name, _, ttl in ENDPOINTS:
+        if name == endpoint:
+            return ttl
+    return RESPONSE_CACHE_DEFAULT_TTL
+
+
+def response_cache_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """In-process LRU in front of an optional SQLite store"""
+
+    def __init__(
+        self,
+        path: Optional[str] = RESPONSE_CACHE_PATH,
+        memory_entries: int = RESPONSE_CACHE_MEMORY_ENTRIES,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        stale_ttl: float = RESPONSE_CACHE_STALE_TTL,
+    ):
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.stale_ttl = stale_ttl
+        self._memory: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._conn = None
+        if path:
+            try:
+                self._conn = self._open(path)
+            except sqlite3.Error as e:
+                print(f"Could not open response cache at {path}: {e}")
+
+    def _open(self, path: str) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    status_code INTEGER NOT NULL,
+                    content BLOB NOT NULL,
+                    content_type TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at "
+                "ON responses (accessed_at)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_expires_at "
+                "ON responses (expires_at)"
+            )
+        return conn
+
+    def record(self, endpoint: str, outcome: str) -> None:
+        """Count a lookup outcome: memory_hit, disk_hit, revalidated or miss"""
+        with self._lock:
+            counts = self._stats.setdefault(
+                endpoint,
+                {"memory_hit": 0, "disk_hit": 0, "revalidated": 0, "miss": 0},
+            )
+            counts[outcome] += 1
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-endpoint counts plus the share of lookups served without a download"""
+        with self._lock:
+            report = {}
+            for endpoint, counts in self._stats.items():
+                total = sum(counts.values())
+                served = total - counts["miss"]
+                report[endpoint] = {
+                    **counts,
+                    "hit_rate": round(served / total, 3) if total else 0.0,
+                }
+            return report
+
+    def _remember(self, key: str, entry: CachedResponse) -> None:
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get_memory(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            return entry
+
+    def get_disk(self, key: str) -> Optional[CachedResponse]:
+        """Blocking SQLite lookup; the entry is promoted to memory"""
+        if self._conn is None:
+            return None
+        with self._disk_lock, self._conn:
+            row = self._conn.execute(
+                "SELECT status_code, content, content_type, etag, last_modified, "
+                "expires_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                (time.time(), key),
+            )
+        entry = CachedResponse(*row)
+        self._remember(key, entry)
+        return entry
+
+    def set(self, key: str, entry: CachedResponse) -> None:
+        """Store in memory and (blocking) on disk"""
+        self._remember(key, entry)
+        if self._conn is None:
+            return
+        now = time.time()
+        with self._disk_lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, *entry, now),
+            )
+            # Drop entries too stale to revalidate, then the LRU overflow
+            self._conn.execute(
+                "DELETE FROM responses WHERE expires_at < ?", (now - self.stale_ttl,)
+            )
+            self._conn.execute(
+                """DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY accessed_at
+                    LIMIT max(0, (SELECT count(*) FROM responses) - ?)
+                )""",
+                (self.max_entries,),
+            )
+
+    def openfda_names(self) -> List[str]:
+        """
+        Brand and generic names in cached openFDA responses (drugsfda and
+        label results both carry them). Blocking; JSON is parsed by SQLite.
+        """
+        if self._conn is None:
+            return []
+        names: List[str] = []
+        try:
+            with self._disk_lock:
+                for field in ("brand_name", "generic_name"):
+                    rows = self._conn.execute(f"""SELECT DISTINCT name.value
+                        FROM responses,
+                            json_each(
+                                CASE WHEN json_valid(CAST(content AS TEXT))
+                                THEN CAST(content AS TEXT) ELSE '{{}}' END,
+                                '$.results'
+                            ) AS result,
+                            json_each(result.value, '$.openfda.{field}') AS name
+                        WHERE status_code = 200
+                            AND content_type LIKE '%json%'""").fetchall()
+                    names.extend(value for (value,) in rows if isinstance(value, str))
+        except sqlite3.Error as e:
+            print(f"Could not read names from the response cache: {e}")
+        return names
+
+
+def create_response_cache() -> Optional[ResponseCache]:
+    """Build the configured cache, or None when caching is disabled"""
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    return ResponseCache()
+
+
+response_cache = create_response_cache()
+
+
+async def cached_get(url: str, params: Optional[Dict] = None) -> httpx.Response:
+    """
+    GET url through the response cache. Fresh entries are returned without
+    touching the network (or the rate limiter and circuit breaker); stale
+    ones are revalidated when possible. Only 200 responses are cached.
+    """
+    if response_cache is None:
+        return await guarded_get(url, params=params)
+
+    # httpx.URL(url, params=None) would drop a query string already in url
+    full_url = str(httpx.URL(url, params=params)) if params else url
+    key = response_cache_key(full_url)
+    endpoint = endpoint_for(full_url)
+
+    entry = response_cache.get_memory(key)
+    outcome = "memory_hit"
+    if entry is None:
+        entry = await asyncio.to_thread(response_cache.get_disk, key)
+        outcome = "disk_hit"
+    if entry is not None and entry.is_fresh():
+        response_cache.record(endpoint, outcome)
+        return entry.to_response(full_url)
+
+    headers = {}
+    if entry is not None:
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+    response = await guarded_get(full_url, headers=headers)
+    expires_at = time.time() + ttl_for(endpoint)
+
+    if response.status_code == 304 and entry is not None:
+        entry = entry._replace(expires_at=expires_at)
+        await asyncio.to_thread(response_cache.set, key, entry)
+        response_cache.record(endpoint, "revalidated")
+        return entry.to_response(full_url)
+
+    response_cache.record(endpoint, "miss")
+    if response.status_code == 200:
+        entry = CachedResponse(
+            200,
+            response.content,
+            response.headers.get("content-type", "application/json"),
+            response.headers.get("etag"),
+            response.headers.get("last-modified"),
+            expires_at,
+        )
+        await asyncio.to_thread(response_cache.set, key, entry)
+    return response
@@ -0,0 +1,353 @@
+"""
+Local RxNorm/RxClass index for name -> RxCUI and drug class lookups.
+
+Names and ingredient links come from the RxNorm RRF release
+(RXNCONSO.RRF and RXNREL.RRF, https://www.nlm.nih.gov/research/umls/rxnorm/).
+Class memberships are not part of the RRF files, so they are loaded from a
+tab-separated dump of RxClass relations (rxcui, classType, classId,
+className) that `dump-classes` builds from the RxClass API once.
+
+    cd api
+    python -m Data_Script.rxnorm_index dump-classes rxclass.tsv
+    python -m Data_Script.rxnorm_index build path/to/rrf rxclass.tsv
+
+Once both steps have completed (each records its row count in the meta
+table) the scraper uses the index instead of two RxNav calls per drug. A
+missing, empty or half-built index falls back to RxNav, as does
+RXNORM_SOURCE=live.
+"""
+
+import csv
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Set
+
+import httpx
+
+from .rate_limit import rate_limiter
+
+RXNORM_INDEX_PATH = os.getenv(
+    "RXNORM_INDEX_PATH",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ".cache",
+        "rxnorm.sqlite3",
+    ),
+)
+# "auto" uses the local index once it is fully built, "live" always calls RxNav
+RXNORM_SOURCE = os.getenv("RXNORM_SOURCE", "auto")
+RXCLASS_API_URL = (
+    os.getenv("RXNAV_API_URL", "https://rxnav.nlm.nih.gov/REST") + "/rxclass"
+)
+
+# RxClass classType -> record field, as returned by get_drug_classes
+CLASS_TYPE_FIELDS = {
+    "VA": "broad_class",
+    "ATC1-4": "narrow_class",
+    "EPC": "pharmacologic_class",
+}
+# relaSource (and rela) used to list each class type's members
+CLASS_MEMBER_SOURCES = {
+    "VA": {"relaSource": "VA"},
+    "ATC1-4": {"relaSource": "ATC"},
+    "EPC": {"relaSource": "DAILYMED", "rela": "has_epc"},
+}
+# Preferred term types when several concepts share a name
+TTY_RANK = {"BN": 0, "IN": 1, "PIN": 2, "MIN": 3, "SBD": 4, "SCD": 5}
+INGREDIENT_TTYS = ("IN", "PIN", "MIN")
+INGREDIENT_RELAS = {
+    "has_tradename",
+    "tradename_of",
+    "has_ingredient",
+    "ingredient_of",
+    "has_form",
+    "form_of",
+}
+
+
+def lookup_key(name: str) -> str:
+    """Normalized name: case, whitespace and punctuation insensitive"""
+    return re.sub(r"[^a-z0-9]+", " ", name.casefold()).strip()
+
+
+def empty_classes() -> Dict[str, List[str]]:
+    return {field: [] for field in CLASS_TYPE_FIELDS.values()}
+
+
+def read_rrf(path: str) -> Iterator[List[str]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield line.rstrip("\n").split("|")
+
+
+class RxNormIndex:
+    """SQLite-backed name and class index; lookups are cached in memory"""
+
+    def __init__(self, path: str = RXNORM_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS names (
+                    name TEXT NOT NULL,
+                    normalized TEXT NOT NULL,
+                    rxcui TEXT NOT NULL,
+                    rank INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS names_name ON names (name);
+                CREATE INDEX IF NOT EXISTS names_normalized ON names (normalized);
+                CREATE TABLE IF NOT EXISTS ingredients (
+                    rxcui TEXT NOT NULL,
+                    ingredient TEXT NOT NULL,
+                    PRIMARY KEY (rxcui, ingredient)
+                );
+                CREATE TABLE IF NOT EXISTS classes (
+                    rxcui TEXT NOT NULL,
+                    class_type TEXT NOT NULL,
+                    class_id TEXT NOT NULL,
+                    class_name TEXT NOT NULL,
+                    PRIMARY KEY (rxcui, class_type, class_id)
+                );
+                -- Row counts of the last completed build steps
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                """)
+        # Only hits are cached: a miss raises out of the lru_cache
+        self._cached_rxcui = lru_cache(maxsize=65536)(self._rxcui_or_raise)
+        self.classes = lru_cache(maxsize=65536)(self._classes)
+
+    def _set_meta(self, counts: Dict[str, int]) -> None:
+        rows = [(key, str(value)) for key, value in counts.items()]
+        rows.append(("built_at", str(time.time())))
+        self._conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", rows)
+
+    def is_complete(self) -> bool:
+        """Whether both the RRF build and the class dump load have finished"""
+        with self._lock:
+            counts = dict(
+                self._conn.execute(
+                    "SELECT key, value FROM meta WHERE key IN ('names', 'classes')"
+                ).fetchall()
+            )
+        return all(int(counts.get(key, 0)) > 0 for key in ("names", "classes"))
+
+    def build_from_rrf(self, rrf_dir: str) -> Dict[str, int]:
+        """Replace names and ingredient links with those of an RxNorm release"""
+        ttys: Dict[str, str] = {}
+        # One transaction: an interrupted build leaves the previous index intact
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM names")
+            self._conn.execute("DELETE FROM ingredients")
+            self._conn.execute(
+                "DELETE FROM meta WHERE key IN ('names', 'ingredient_links')"
+            )
+            rows = []
+            for row in read_rrf(os.path.join(rrf_dir, "RXNCONSO.RRF")):
+                rxcui, lat, sab, tty = row[0], row[1], row[11], row[12]
+                name, suppress = row[14], row[16]
+                if lat != "ENG" or sab != "RXNORM" or suppress not in ("N", ""):
+                    continue
+                rank = TTY_RANK.get(tty, len(TTY_RANK))
+                if rank < TTY_RANK.get(ttys.get(rxcui), len(TTY_RANK) + 1):
+                    ttys[rxcui] = tty
+                rows.append((name.casefold(), lookup_key(name), rxcui, rank))
+            self._conn.executemany("INSERT INTO names VALUES (?, ?, ?, ?)", rows)
+
+            links: Set[tuple] = set()
+            for row in read_rrf(os.path.join(rrf_dir, "RXNREL.RRF")):
+                first, second, rela, sab = row[0], row[4], row[7], row[10]
+                if sab != "RXNORM" or rela not in INGREDIENT_RELAS:
+                    continue
+                # Link products and brands (or salt forms) to their base ingredient
+                for product, ingredient in ((first, second), (second, first)):
+                    if (
+                        ttys.get(ingredient) in INGREDIENT_TTYS
+                        and ttys.get(product) != "IN"
+                    ):
+                        links.add((product, ingredient))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO ingredients VALUES (?, ?)", links
+            )
+            counts = {"names": len(rows), "ingredient_links": len(links)}
+            self._set_meta(counts)
+        self._cached_rxcui.cache_clear()
+        self.classes.cache_clear()
+        return counts
+
+    def load_class_dump(self, path: str) -> int:
+        """Replace class memberships with a rxcui/classType/classId/className TSV"""
+        with self._lock, self._conn, open(path, encoding="utf-8") as f:
+            self._conn.execute("DELETE FROM classes")
+            self._conn.execute("DELETE FROM meta WHERE key = 'classes'")
+            rows = [
+                tuple(row[:4])
+                for row in csv.reader(f, delimiter="\t")
+                if len(row) >= 4 and row[1] in CLASS_TYPE_FIELDS
+            ]
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO classes VALUES (?, ?, ?, ?)", rows
+            )
+            self._set_meta({"classes": len(rows)})
+        self.classes.cache_clear()
+        return len(rows)
+
+    def _rxcui(self, name: str) -> Optional[str]:
+        """RxCUI for an exact (case-insensitive) name, else a normalized match"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT rxcui FROM names WHERE name = ? ORDER BY rank LIMIT 1",
+                (name.strip().casefold(),),
+            ).fetchone()
+            if row is None:
+                row = self._conn.execute(
+                    "SELECT rxcui FROM names WHERE normalized = ? ORDER BY rank LIMIT 1",
+                    (lookup_key(name),),
+                ).fetchone()
+        return row[0] if row else None
+
+    def _rxcui_or_raise(self, name: str) -> str:
+        rxcui = self._rxcui(name)
+        if rxcui is None:
+            raise KeyError(name)
+        return rxcui
+
+    def rxcui(self, name: str) -> Optional[str]:
+        """RxCUI for a medication name, or None (misses are not cached)"""
+        try:
+            return self._cached_rxcui(name)
+        except KeyError:
+            return None
+
+    def _classes(self, rxcui: str) -> Dict[str, List[str]]:
+        """
+        Classes of the concept and of its ingredients (two hops, so brand ->
+        salt form -> base ingredient is covered), bucketed like RxClass.
+        """
+        with self._lock:
+            concepts = {rxcui}
+            for _ in range(2):
+                placeholders = ",".join("?" * len(concepts))
+                concepts |= {
+                    ingredient
+                    for (ingredient,) in self._conn.execute(
+                        f"SELECT ingredient FROM ingredients "
+                        f"WHERE rxcui IN ({placeholders})",
+                        tuple(concepts),
+                    )
+                }
+            placeholders = ",".join("?" * len(concepts))
+            rows = self._conn.execute(
+                f"SELECT DISTINCT class_type, class_name FROM classes "
+                f"WHERE rxcui IN ({placeholders}) ORDER BY class_name",
+                tuple(concepts),
+            ).fetchall()
+        classes = empty_classes()
+        for class_type, class_name in rows:
+            classes[CLASS_TYPE_FIELDS[class_type]].append(class_name)
+        return classes
+
+    def known_names(self) -> List[str]:
+        """Distinct brand and ingredient names (casefolded)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT name FROM names WHERE rank <= ?",
+                (TTY_RANK["MIN"],),
+            ).fetchall()
+        return [name for (name,) in rows]
+
+    def lookup_classes(self, name: str) -> Optional[Dict[str, List[str]]]:
+        """Classes for a medication name, or None if the name is unknown"""
+        rxcui = self.rxcui(name)
+        if rxcui is None:
+            return None
+        # Copy so callers can't mutate the cached lists
+        return {k: list(v) for k, v in self.classes(rxcui).items()}
+
+
+_index: Optional[RxNormIndex] = None
+_index_lock = threading.Lock()
+# Set once the index has been seen fully built; until then every call re-checks
+_index_complete = False
+
+
+def get_rxnorm_index() -> Optional[RxNormIndex]:
+    """
+    The local index if configured and completely built, else None (use
+    RxNav). An incomplete index is re-checked on every call, so a build
+    finishing in another process is picked up without a restart.
+    """
+    global _index, _index_complete
+    if RXNORM_SOURCE == "live" or not os.path.exists(RXNORM_INDEX_PATH):
+        return None
+    if not _index_complete:
+        with _index_lock:
+            if _index is None:
+                _index = RxNormIndex()
+            if not _index_complete:
+                _index_complete = _index.is_complete()
+            if not _index_complete:
+                return None
+    return _index
+
+
+def dump_classes(output_path: str) -> int:
+    """Write every VA, ATC1-4 and EPC class membership from RxClass to a TSV"""
+    rows = 0
+    with httpx.Client(timeout=60) as client, open(
+        output_path, "w", encoding="utf-8", newline=""
+    ) as f:
+        writer = csv.writer(f, delimiter="\t")
+
+        def get(path: str, params: Dict) -> Dict:
+            url = f"{RXCLASS_API_URL}/{path}"
+            rate_limiter.wait(url)
+            response = client.get(url, params=params)
+            response.raise_for_status()
+            return response.json()
+
+        for class_type, source in CLASS_MEMBER_SOURCES.items():
+            concepts = get("allClasses.json", {"classTypes": class_type})
+            for concept in concepts.get("rxclassMinConceptList", {}).get(
+                "rxclassMinConcept", []
+            ):
+                members = get(
+                    "classMembers.json", {"classId": concept["classId"], **source}
+                )
+                for member in members.get("drugMemberGroup", {}).get("drugMember", []):
+                    writer.writerow(
+                        [
+                            member["minConcept"]["rxcui"],
+                            class_type,
+                            concept["classId"],
+                            concept["className"],
+                        ]
+                    )
+                    rows += 1
+            print(f"Dumped {class_type} classes ({rows} memberships so far)")
+    return rows
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "dump-classes" and len(sys.argv) == 3:
+        print(f"Wrote {dump_classes(sys.argv[2])} class memberships")
+    elif command == "build" and len(sys.argv) in (3, 4):
+        index = RxNormIndex()
+        print(f"Loaded {index.build_from_rrf(sys.argv[2])} from {sys.argv[2]}")
+        if len(sys.argv) == 4:
+            print(f"Loaded {index.load_class_dump(sys.argv[3])} class memberships")
+    else:
+        print(
+            "Usage: python -m Data_Script.rxnorm_index "
+            "build <rrf_dir> [class_dump.tsv] | dump-classes <output.tsv>"
+        )
+        sys.exit(1)
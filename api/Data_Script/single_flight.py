@@ -0,0 +1,57 @@
+"""
+Single-flight execution: concurrent callers asking for the same key share
+one in-flight call and its result.
+
+Used so overlapping scrape runs don't fetch the same medication twice at
+the same time. The shared call runs in its own task; it is only cancelled
+once every caller waiting on it has gone away.
+"""
+
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Per-key deduplication of concurrent coroutine calls (one event loop)"""
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self.shared = 0
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._tasks
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn() for key, or join the call already running for it. Every
+        caller gets its own deep copy of the result so none can mutate what
+        the others see.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        else:
+            self.shared += 1
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters.get(key) == 1:
+                task.cancel()
+            raise
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+        return copy.deepcopy(result)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # Mark any exception retrieved; the waiters re-raise it
+            task.exception()
@@ -1,20 +1,75 @@
 import os
 import json
 import requests
-from typing import Optional
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
+from .metrics import stage
+from .summary_cache import create_summary_cache, summary_cache_key
+from .summary_executor import SummarizerError, summary_executor
 
 # Load environment variables
 load_dotenv()
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_API_URL = os.getenv(
+    "OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions"
+)
+OPENROUTER_MODEL = "mistralai/mixtral-8x7b-instruct"
+
+# Persistent summary cache; replace with any SummaryCache (or None to disable)
+summary_cache = create_summary_cache()
+
+
+def _cached_summary(text: str, max_length: int) -> Optional[str]:
+    if summary_cache is None:
+        return None
+    return summary_cache.get(summary_cache_key(text, OPENROUTER_MODEL, max_length))
+
+
+def _store_summary(text: str, max_length: int, summary: Optional[str]) -> None:
+    if summary_cache is not None and summary:
+        summary_cache.set(
+            summary_cache_key(text, OPENROUTER_MODEL, max_length), summary
+        )
+
+
+def _request_completion(prompt: str, max_tokens: int) -> str:
+    """
+    Send a single-message chat completion to OpenRouter and return its text.
+    Rate limiting, timeouts, retries and token accounting are handled by the
+    summary executor; raises SummarizerError if the call ultimately fails and
+    ValueError if the response has no message content.
+    """
+
+    def send(timeout: float) -> requests.Response:
+        return requests.post(
+            url=OPENROUTER_API_URL,
+            headers={
+                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "model": OPENROUTER_MODEL,
+                "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": max_tokens,  # Limit response length
+                "temperature": 0.3,  # Lower temperature for more focused summaries
+            },
+            timeout=timeout,
+        )
+
+    with stage("summarize"):
+        result = summary_executor.call(send)
+    try:
+        return result["choices"][0]["message"]["content"].strip()
+    except (KeyError, IndexError, TypeError, AttributeError) as e:
+        raise ValueError(f"Unexpected OpenRouter response: {result!r:.200}") from e
 
 
 def generate_summary(text: str, max_length: int = 300) -> Optional[str]:
     """
     Generate a summary of the given text using OpenRouter's Mixtral model.
     The summary will be concise but informative, suitable for a mobile screen.
+    Summaries of previously seen text are served from the summary cache.
 
     Args:
         text (str): The text to summarize
@@ -26,6 +81,17 @@ def generate_summary(text: str, max_length: int = 300) -> Optional[str]:
     if not text or text == "N/A":
         return "N/A"
 
+    cached = _cached_summary(text, max_length)
+    if cached is not None:
+        return cached
+
+    summary = _summarize_text(text, max_length)
+    _store_summary(text, max_length, summary)
+    return summary
+
+
+def _summarize_text(text: str, max_length: int) -> Optional[str]:
+    """Summarize one text with OpenRouter, bypassing the cache"""
     try:
         # Prepare the prompt
         prompt = f"""Create a clear and concise summary of the following text. 
@@ -36,30 +102,89 @@ def generate_summary(text: str, max_length: int = 300) -> Optional[str]:
         {text}"""
 
         # Make the API request
-        response = requests.post(
-            url=OPENROUTER_API_URL,
-            headers={
-                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": "mistralai/mixtral-8x7b-instruct",
-                "messages": [{"role": "user", "content": prompt}],
-                "max_tokens": 150,  # Limit response length
-                "temperature": 0.3,  # Lower temperature for more focused summaries
-            },
-        )
-
-        if response.status_code == 200:
-            result = response.json()
-            summary = result["choices"][0]["message"]["content"].strip()
-            return summary
-        else:
-            print(
-                f"Error from OpenRouter API: {response.status_code} - {response.text}"
-            )
-            return None
+        return _request_completion(prompt, max_tokens=150)
 
     except Exception as e:
         print(f"Error generating summary: {str(e)}")
         return None
+
+
+def _parse_summaries(content: str, fields: List[str]) -> Dict[str, str]:
+    """
+    Pull the JSON object out of a batched response, tolerating code fences
+    or chatter around it. Only non-empty string values for requested fields
+    are kept.
+    """
+    start, end = content.find("{"), content.rfind("}")
+    if start == -1 or end <= start:
+        raise ValueError("No JSON object in batched summary response")
+    parsed = json.loads(content[start : end + 1])
+    if not isinstance(parsed, dict):
+        raise ValueError("Batched summary response is not a JSON object")
+    return {
+        field: parsed[field].strip()
+        for field in fields
+        if isinstance(parsed.get(field), str) and parsed[field].strip()
+    }
+
+
+def generate_summaries(
+    texts: Dict[str, str], max_length: int = 300
+) -> Dict[str, Optional[str]]:
+    """
+    Summarize several fields of one medication with a single OpenRouter call.
+
+    Args:
+        texts (dict): Field name -> text to summarize
+        max_length (int): Maximum length of each summary in characters
+
+    Returns:
+        dict: Field name -> summary ("N/A" for empty input, None on error).
+        Fields missing from the batched response, or every field if the
+        response can't be parsed, are summarized one by one instead. If the
+        batched request itself fails (network or HTTP errors, token budget)
+        every pending field is None: retrying field by field would only
+        repeat the failure.
+    """
+    summaries = {
+        field: "N/A" for field, text in texts.items() if not text or text == "N/A"
+    }
+    for field, text in texts.items():
+        if field not in summaries:
+            cached = _cached_summary(text, max_length)
+            if cached is not None:
+                summaries[field] = cached
+    pending = [field for field in texts if field not in summaries]
+    if not pending:
+        return summaries
+
+    sections = "\n\n".join(f"### {field}\n{texts[field]}" for field in pending)
+    prompt = f"""Create a clear and concise summary of each section below.
+        Focus on the key points and main information.
+        Keep each summary under {max_length} characters.
+        Respond with only a JSON object whose keys are exactly the section
+        names ({", ".join(pending)}) and whose values are the summaries.
+
+        {sections}"""
+
+    try:
+        content = _request_completion(prompt, max_tokens=150 * len(pending))
+    except SummarizerError as e:
+        print(f"Batched summary failed, leaving {len(pending)} fields empty: {e}")
+        summaries.update((field, None) for field in pending)
+        return summaries
+    try:
+        summaries.update(_parse_summaries(content, pending))
+    except ValueError as e:  # includes json.JSONDecodeError
+        print(f"Batched summary unreadable, falling back to per-field calls: {e}")
+
+    # Remaining fields are independent, so they are summarized concurrently
+    missing = [field for field in pending if field not in summaries]
+    fallback = summary_executor.map(
+        lambda field: _summarize_text(texts[field], max_length), missing
+    )
+    summaries.update(zip(missing, fallback))
+
+    for field in pending:
+        _store_summary(texts[field], max_length, summaries[field])
+    return summaries
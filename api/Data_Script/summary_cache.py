@@ -0,0 +1,184 @@
+"""
+Content-addressed cache for LLM summaries.
+
+Summaries are keyed by a hash of the input text, the model and the
+requested length, so re-scraping unchanged FDA label sections never calls
+OpenRouter again. Entries expire after a TTL and the least recently used
+ones are evicted once the cache is full.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+SUMMARY_CACHE_ENABLED = os.getenv("SUMMARY_CACHE_ENABLED", "1") == "1"
+SUMMARY_CACHE_PATH = os.getenv(
+    "SUMMARY_CACHE_PATH",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ".cache",
+        "summaries.sqlite3",
+    ),
+)
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", str(30 * 24 * 3600)))
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "100000"))
+
+
+def summary_cache_key(text: str, model: str, max_length: int) -> str:
+    """Stable key for one summarization request"""
+    digest = hashlib.sha256()
+    for part in (model, str(max_length), text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SummaryCache:
+    """
+    Base class for summary stores. Subclasses implement _get/_set; hit and
+    miss counting lives here so every store reports the same stats.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def _set(self, key: str, summary: str) -> None:
+        raise NotImplementedError
+
+    def get(self, key: str) -> Optional[str]:
+        summary = self._get(key)
+        with self._stats_lock:
+            if summary is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return summary
+
+    def set(self, key: str, summary: str) -> None:
+        self._set(key, summary)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class MemorySummaryCache(SummaryCache):
+    """In-process LRU store, useful for tests and short-lived scripts"""
+
+    def __init__(
+        self,
+        ttl: float = SUMMARY_CACHE_TTL,
+        max_entries: int = SUMMARY_CACHE_MAX_ENTRIES,
+    ):
+        super().__init__()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            summary, created_at = entry
+            if time.time() - created_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return summary
+
+    def _set(self, key: str, summary: str) -> None:
+        with self._lock:
+            self._entries[key] = (summary, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteSummaryCache(SummaryCache):
+    """Persistent store in a local SQLite file, shared by all workers"""
+
+    def __init__(
+        self,
+        path: str = SUMMARY_CACHE_PATH,
+        ttl: float = SUMMARY_CACHE_TTL,
+        max_entries: int = SUMMARY_CACHE_MAX_ENTRIES,
+    ):
+        super().__init__()
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS summaries (
+                    key TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS summaries_accessed_at "
+                "ON summaries (accessed_at)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS summaries_created_at "
+                "ON summaries (created_at)"
+            )
+
+    def _get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT summary, created_at FROM summaries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                return None
+            self._conn.execute(
+                "UPDATE summaries SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            return row[0]
+
+    def _set(self, key: str, summary: str) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?)",
+                (key, summary, now, now),
+            )
+            # Evict expired entries, then the least recently used overflow
+            self._conn.execute(
+                "DELETE FROM summaries WHERE created_at < ?", (now - self.ttl,)
+            )
+            self._conn.execute(
+                """DELETE FROM summaries WHERE key IN (
+                    SELECT key FROM summaries ORDER BY accessed_at
+                    LIMIT max(0, (SELECT count(*) FROM summaries) - ?)
+                )""",
+                (self.max_entries,),
+            )
+
+
+def create_summary_cache() -> Optional[SummaryCache]:
+    """Build the configured cache, or None when caching is disabled"""
+    if not SUMMARY_CACHE_ENABLED:
+        return None
+    try:
+        return SQLiteSummaryCache()
+    except sqlite3.Error as e:
+        print(f"Could not open summary cache at {SUMMARY_CACHE_PATH}: {e}")
+        return MemorySummaryCache()
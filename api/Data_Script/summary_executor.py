@@ -0,0 +1,183 @@
+"""
+Executor for OpenRouter summarization calls.
+
+Bounds the number of in-flight LLM requests, paces them with a token bucket
+matched to the provider's rate limit, enforces a per-call timeout, retries
+429/5xx responses with jittered exponential backoff and records token spend
+for the current scrape run.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional
+
+import requests
+
+from .metrics import record_retry
+from .rate_limit import TokenBucket
+from .resilience import backoff_delay, retry_after_seconds
+
+SUMMARY_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "8"))
+OPENROUTER_REQUESTS_PER_SECOND = float(os.getenv("OPENROUTER_REQUESTS_PER_SECOND", "5"))
+OPENROUTER_BURST = float(os.getenv("OPENROUTER_BURST", "5"))
+SUMMARY_TIMEOUT = float(os.getenv("SUMMARY_TIMEOUT", "60"))
+SUMMARY_MAX_RETRIES = int(os.getenv("SUMMARY_MAX_RETRIES", "4"))
+SUMMARY_BACKOFF_BASE = float(os.getenv("SUMMARY_BACKOFF_BASE", "1"))
+SUMMARY_BACKOFF_CAP = float(os.getenv("SUMMARY_BACKOFF_CAP", "30"))
+# Optional cap on tokens spent per run (0 = unlimited)
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "0"))
+
+
+class SummarizerError(Exception):
+    """OpenRouter returned an error that retrying won't (or didn't) fix"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class TokenBudgetExceeded(SummarizerError):
+    """The run has spent its summarization token budget"""
+
+
+class SummaryUsage:
+    """Thread-safe running total of LLM requests and tokens for one run"""
+
+    def __init__(self, token_budget: int = SUMMARY_TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self.requests = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, usage: Dict) -> None:
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += usage.get("prompt_tokens", 0)
+            self.completion_tokens += usage.get("completion_tokens", 0)
+            self.total_tokens += usage.get("total_tokens", 0)
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def check_budget(self) -> None:
+        if self.token_budget and self.total_tokens >= self.token_budget:
+            raise TokenBudgetExceeded(
+                f"Summary token budget of {self.token_budget} exhausted"
+            )
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+        }
+
+
+# Usage of the run in progress; copied into worker threads by asyncio.to_thread
+_current_usage: contextvars.ContextVar = contextvars.ContextVar(
+    "summary_usage", default=None
+)
+
+
+@contextmanager
+def track_summary_usage(token_budget: int = SUMMARY_TOKEN_BUDGET):
+    """Attribute every summarization call made inside the block to one run"""
+    usage = SummaryUsage(token_budget)
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+class SummarizationExecutor:
+    """Runs OpenRouter calls with concurrency, rate, timeout and retry limits"""
+
+    def __init__(
+        self,
+        max_concurrency: int = SUMMARY_MAX_CONCURRENCY,
+        requests_per_second: float = OPENROUTER_REQUESTS_PER_SECOND,
+        burst: float = OPENROUTER_BURST,
+        timeout: float = SUMMARY_TIMEOUT,
+        max_retries: int = SUMMARY_MAX_RETRIES,
+        backoff_base: float = SUMMARY_BACKOFF_BASE,
+        backoff_cap: float = SUMMARY_BACKOFF_CAP,
+    ):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._bucket = TokenBucket(requests_per_second, burst)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="summarizer"
+        )
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Full-jitter exponential backoff, never shorter than Retry-After"""
+        return backoff_delay(attempt, retry_after, self.backoff_base, self.backoff_cap)
+
+    def call(self, send: Callable[[float], requests.Response]) -> Dict:
+        """
+        Issue one request via send(timeout) and return the decoded JSON body.
+        Raises SummarizerError for non-retryable errors or once retries run out.
+        """
+        usage = _current_usage.get()
+        for attempt in range(self.max_retries + 1):
+            if usage is not None:
+                usage.check_budget()
+            self._bucket.acquire()
+            retry_after = None
+            with self._slots:
+                try:
+                    response = send(self.timeout)
+                except (requests.Timeout, requests.ConnectionError) as e:
+                    error = SummarizerError(f"OpenRouter request failed: {e}")
+                else:
+                    if response.status_code == 200:
+                        result = response.json()
+                        if usage is not None:
+                            usage.record(result.get("usage") or {})
+                        return result
+                    error = SummarizerError(
+                        f"Error from OpenRouter API: {response.status_code} - "
+                        f"{response.text}",
+                        response.status_code,
+                    )
+                    if response.status_code != 429 and response.status_code < 500:
+                        raise error
+                    retry_after = retry_after_seconds(response.headers)
+
+            if attempt == self.max_retries:
+                raise error
+            if usage is not None:
+                usage.record_retry()
+            record_retry("openrouter")
+            delay = self._backoff(attempt, retry_after)
+            print(f"{error}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    def map(self, fn: Callable, items: Iterable) -> List:
+        """
+        Apply fn to every item concurrently (bounded by max_concurrency) and
+        return results in input order. The caller's run context is preserved.
+        """
+        futures = [
+            self._pool.submit(contextvars.copy_context().run, fn, item)
+            for item in items
+        ]
+        return [future.result() for future in futures]
+
+
+summary_executor = SummarizationExecutor()
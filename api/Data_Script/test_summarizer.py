@@ -1,6 +1,10 @@
-from summarizer import generate_summary
 import json
 import os
+import sys
+
+# Import through the package so the summarizer's relative imports resolve
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Data_Script.summarizer import generate_summary
 
 # Get the current directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -0,0 +1,116 @@
+"""
+Pool of warm Selenium WebDriver sessions.
+
+Starting headless Chrome costs seconds and hundreds of MB, so sessions are
+kept alive between scrapes, leased to one caller at a time, health-checked
+and recycled after a number of uses or when they stop responding.
+"""
+
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledDriver:
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+
+
+class WebDriverPool:
+    """
+    Keeps up to `size` browser sessions created by `factory`.
+
+    Use `with pool.lease() as driver:`; a session is retired after `max_uses`
+    leases or as soon as it fails a health check.
+    """
+
+    def __init__(
+        self,
+        factory: Callable,
+        size: int = 2,
+        max_uses: int = 50,
+    ):
+        self.factory = factory
+        self.size = size
+        self.max_uses = max_uses
+        self._idle: "queue.LifoQueue[_PooledDriver]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def start(self) -> None:
+        """Launch the browser sessions up front so the first scrapes are warm"""
+        self._closed = False
+        while self._idle.qsize() < self.size:
+            self._idle.put(_PooledDriver(self.factory()))
+        logger.info(f"WebDriver pool started with {self.size} sessions")
+
+    @staticmethod
+    def _is_healthy(pooled: _PooledDriver) -> bool:
+        try:
+            pooled.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(pooled: _PooledDriver) -> None:
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.error(f"Error closing browser: {e}")
+
+    def _checkout(self) -> _PooledDriver:
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                logger.info("Launching a new browser session for the pool")
+                return _PooledDriver(self.factory())
+            if self._is_healthy(pooled):
+                return pooled
+            logger.warning("Discarding unresponsive browser session")
+            self._quit(pooled)
+
+    def _checkin(self, pooled: _PooledDriver) -> None:
+        pooled.uses += 1
+        if self._closed:
+            self._quit(pooled)
+        elif pooled.uses >= self.max_uses:
+            logger.info(f"Recycling browser session after {pooled.uses} uses")
+            self._quit(pooled)
+        elif not self._is_healthy(pooled):
+            logger.warning("Browser session crashed, recycling it")
+            self._quit(pooled)
+        else:
+            self._idle.put(pooled)
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None):
+        """Borrow a driver, waiting up to `timeout` seconds for a free session"""
+        if self._closed:
+            raise RuntimeError("WebDriver pool is closed")
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("Timed out waiting for a browser session")
+        pooled = None
+        try:
+            pooled = self._checkout()
+            yield pooled.driver
+        finally:
+            if pooled is not None:
+                self._checkin(pooled)
+            self._slots.release()
+
+    def close(self) -> None:
+        """Quit idle sessions; leased sessions are quit when they are returned"""
+        self._closed = True
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        logger.info("WebDriver pool closed")
@@ -1,12 +1,38 @@
+import asyncio
 import json
-import requests
+import os
 import csv
 from collections import defaultdict
-import time
-from pprint import pprint
-from .drugbank import get_drugbank_info
-from .summarizer import generate_summary
-from typing import Dict, List
+
+import httpx
+
+from .drugbank import get_drugbank_info, shutdown_driver_pool
+from .drugbank_http import DRUGBANK_BASE_URL, fetch_drugbank_info
+from .http_client import close_clients
+from .metrics import MEDICATIONS_PROCESSED, record_retry, stage
+from .name_resolver import NameResolution, resolve_medication_names
+from .names import normalize_medication_name
+from .negative_cache import is_known_missing, known_missing, record_missing
+from .openfda_bulk import OPENFDA_BULK_ENABLED, OpenFDABatch
+from .openfda_fields import extract_label_fields
+from .openfda_mirror import OPENFDA_SOURCE, get_openfda_mirror
+from .orange_book import ORANGE_BOOK_DIR, get_orange_book_index
+from .pipeline import Pipeline, Stage, StageFailed
+from .rate_limit import rate_limiter
+from .resilience import (
+    UPSTREAM_MAX_ATTEMPTS,
+    UPSTREAM_RETRY_AFTER_MAX,
+    backoff_delay,
+    circuit_breakers,
+    is_retryable,
+    retry_after_seconds,
+)
+from .response_cache import cached_get
+from .rxnorm_index import empty_classes, get_rxnorm_index
+from .single_flight import SingleFlight
+from .summarizer import generate_summaries
+from .summary_executor import track_summary_usage
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
 
 MEDICATIONS = [
     "Abilify",
@@ -21,34 +47,105 @@ MEDICATIONS = [
     "Botox",
 ]
 
-openfda_base_url = "https://api.fda.gov/drug/drugsfda.json"
-openfda_label_url = "https://api.fda.gov/drug/label.json"
-rxnav_base_url = "https://rxnav.nlm.nih.gov/REST"
-
-
-def make_request(url, params=None, max_retries=3, delay=1):
-    """Make a request with retry logic"""
-    for attempt in range(max_retries):
+# Upstream base URLs; overridable so benchmarks can point at a local stub
+OPENFDA_API_URL = os.getenv("OPENFDA_API_URL", "https://api.fda.gov")
+RXNAV_API_URL = os.getenv("RXNAV_API_URL", "https://rxnav.nlm.nih.gov/REST")
+
+openfda_base_url = f"{OPENFDA_API_URL}/drug/drugsfda.json"
+openfda_label_url = f"{OPENFDA_API_URL}/drug/label.json"
+rxnav_base_url = RXNAV_API_URL
+drugbank_base_url = DRUGBANK_BASE_URL
+
+# Number of medications scraped concurrently
+SCRAPE_MAX_WORKERS = int(os.getenv("SCRAPE_MAX_WORKERS", "4"))
+
+# Label sections that get an LLM summary alongside the DrugBank fields
+LABEL_SUMMARY_FIELDS = (
+    "indications_and_usage",
+    "dosage_and_administration",
+    "mechanism_of_action",
+    "adverse_reactions",
+    "drug_interactions",
+    "contraindications",
+    "pregnancy",
+    "pediatric_use",
+    "geriatric_use",
+    "information_for_patients",
+)
+
+# Try plain HTTP + HTML parsing for DrugBank before launching a browser
+DRUGBANK_HTTP_ENABLED = os.getenv("DRUGBANK_HTTP_ENABLED", "1") == "1"
+
+# Concurrent runs scraping the same medication share one scrape
+scrape_flight = SingleFlight()
+
+
+async def get_with_retries(
+    url: str, params: Optional[Dict] = None, max_attempts: int = UPSTREAM_MAX_ATTEMPTS
+) -> httpx.Response:
+    """
+    GET url through the response cache, retrying 429/5xx responses and
+    network errors with jittered exponential backoff (never sooner than
+    Retry-After). Any other response, including a 404 miss, is returned at
+    once, as is the last one when attempts run out. Raises CircuitOpenError
+    while the host's circuit is open, or the last network error.
+    """
+    for attempt in range(max_attempts):
+        retry_after = None
         try:
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                return response.json()
-            time.sleep(delay)
-        except Exception as e:
-            if attempt == max_retries - 1:
-                print(f"Failed after {max_retries} attempts: {str(e)}")
-            time.sleep(delay)
+            response = await cached_get(url, params)
+        except httpx.TransportError as e:
+            if attempt == max_attempts - 1:
+                raise
+            print(f"Request to {url} failed: {e}")
+        else:
+            if not is_retryable(response.status_code) or attempt == max_attempts - 1:
+                return response
+            retry_after = retry_after_seconds(response.headers)
+            if retry_after is not None and retry_after > UPSTREAM_RETRY_AFTER_MAX:
+                print(f"{url} asked to retry in {retry_after:.0f}s; giving up")
+                return response
+        record_retry(url)
+        await asyncio.sleep(backoff_delay(attempt, retry_after))
+
+
+async def make_request(url, params=None, max_attempts=UPSTREAM_MAX_ATTEMPTS):
+    """Make a request with retry logic; None on a miss or failure"""
+    try:
+        response = await get_with_retries(url, params, max_attempts)
+        if response.status_code == 200:
+            return response.json()
+        if is_retryable(response.status_code):
+            print(f"Request to {url} failed: {response.status_code}")
+    except Exception as e:
+        print(f"Request to {url} failed: {e}")
     return None
 
 
-def fetch_fda_label_data(brand_name: str, generic_name: str) -> Dict:
-    """Fetch medication label data from OpenFDA API."""
-    search_query = f'openfda.generic_name:"{generic_name}"'
-    print(f"Trying search query: {search_query}")
+async def summarize_fields(texts: Dict[str, str]) -> Dict[str, str]:
+    """Run the blocking batched summarizer without holding up the event loop"""
+    return await asyncio.to_thread(generate_summaries, texts)
+
 
-    data = make_request(openfda_label_url, params={"search": search_query, "limit": 1})
+async def fetch_fda_label_data(
+    brand_name: str, generic_name: str, fda_batch: Optional[OpenFDABatch] = None
+) -> Dict:
+    """Fetch medication label data from OpenFDA API (or a bulk prefetch)."""
+    with stage("label") as span:
+        if fda_batch is not None and fda_batch.has_label(generic_name):
+            result = fda_batch.label(generic_name)
+        else:
+            search_query = f'openfda.generic_name:"{generic_name}"'
+            print(f"Trying search query: {search_query}")
 
-    if not data or not data.get("results"):
+            data = await make_request(
+                openfda_label_url, params={"search": search_query, "limit": 1}
+            )
+            result = data["results"][0] if data and data.get("results") else None
+        if result is None:
+            span.outcome = "not_found"
+
+    if result is None:
         print(f"No label data found for {brand_name}")
         return {
             "brand_name": brand_name,
@@ -56,102 +153,31 @@ def fetch_fda_label_data(brand_name: str, generic_name: str) -> Dict:
             "error": "No data found",
         }
 
-    result = data["results"][0]
-
-    print("result", result)
-
     # Extract relevant fields
-    return {
-        "indications_and_usage": (
-            result.get("indications_and_usage", ["N/A"])[0]
-            if result.get("indications_and_usage")
-            else "N/A"
-        ),
-        "dosage_and_administration": (
-            result.get("dosage_and_administration", ["N/A"])[0]
-            if result.get("dosage_and_administration")
-            else "N/A"
-        ),
-        "mechanism_of_action": (
-            result.get("mechanism_of_action", ["N/A"])[0]
-            if result.get("mechanism_of_action")
-            else "N/A"
-        ),
-        "boxed_warning": (
-            result.get("boxed_warning", ["N/A"])[0]
-            if result.get("boxed_warning")
-            else "N/A"
-        ),
-        "warnings_and_cautions": (
-            result.get("warnings_and_cautions", ["N/A"])[0]
-            if result.get("warnings_and_cautions")
-            else "N/A"
-        ),
-        "adverse_reactions": (
-            result.get("adverse_reactions", ["N/A"])[0]
-            if result.get("adverse_reactions")
-            else "N/A"
-        ),
-        "abuse": (result.get("abuse", ["N/A"])[0] if result.get("abuse") else "N/A"),
-        "dependence": (
-            result.get("dependence", ["N/A"])[0] if result.get("dependence") else "N/A"
-        ),
-        "spl_medguide": (
-            result.get("spl_medguide", ["N/A"])[0]
-            if result.get("spl_medguide")
-            else "N/A"
-        ),
-        "information_for_patients": (
-            result.get("information_for_patients", ["N/A"])[0]
-            if result.get("information_for_patients")
-            else "N/A"
-        ),
-        "drug_interactions": (
-            result.get("drug_interactions", ["N/A"])[0]
-            if result.get("drug_interactions")
-            else "N/A"
-        ),
-        "contraindications": (
-            result.get("contraindications", ["N/A"])[0]
-            if result.get("contraindications")
-            else "N/A"
-        ),
-        "pregnancy": (
-            result.get("pregnancy", ["N/A"])[0] if result.get("pregnancy") else "N/A"
-        ),
-        "pediatric_use": (
-            result.get("pediatric_use", ["N/A"])[0]
-            if result.get("pediatric_use")
-            else "N/A"
-        ),
-        "geriatric_use": (
-            result.get("geriatric_use", ["N/A"])[0]
-            if result.get("geriatric_use")
-            else "N/A"
-        ),
-        "controlled_substance": (
-            result.get("controlled_substance", ["N/A"])[0]
-            if result.get("controlled_substance")
-            else "N/A"
-        ),
-    }
+    return extract_label_fields(result)
 
 
-def get_rxcui(drug_name):
+async def get_rxcui(drug_name):
     """Get RxCUI for a drug name"""
     print(f"Getting RxCUI for {drug_name}...")
-    url = f"{rxnav_base_url}/rxcui.json?name={drug_name}"
-    data = make_request(url)
+    url = f"{rxnav_base_url}/rxcui.json"
+    with stage("rxcui") as span:
+        data = await make_request(url, params={"name": drug_name})
+        if data is not None and "rxnormId" not in data.get("idGroup", {}):
+            # RxNav answered but has no concept by that name
+            span.outcome = "not_found"
+            await record_missing("rxcui", drug_name)
     if data and "idGroup" in data and "rxnormId" in data["idGroup"]:
         return data["idGroup"]["rxnormId"][0]
     return None
 
 
-def get_drug_classes(rxcui):
+async def get_drug_classes(rxcui):
     """Get therapeutic and pharmacological classes"""
     print(f"Getting drug classes for RxCUI {rxcui}...")
-    url = f"{rxnav_base_url}/rxclass/class/byRxcui.json?rxcui={rxcui}"
-    data = make_request(url)
+    url = f"{rxnav_base_url}/rxclass/class/byRxcui.json"
+    with stage("rxclass"):
+        data = await make_request(url, params={"rxcui": rxcui})
     classes = {
         "broad_class": set(),  # VA Class
         "narrow_class": set(),  # ATC Class
@@ -170,14 +196,20 @@ def get_drug_classes(rxcui):
             elif class_type == "EPC":
                 classes["pharmacologic_class"].add(class_info["className"])
 
-    return {k: list(v) for k, v in classes.items()}
+    # Sorted so records (and their content hashes) don't depend on set order
+    return {k: sorted(v) for k, v in classes.items()}
 
 
-def load_orange_book_data():
+def load_orange_book_data(data_dir: str = ORANGE_BOOK_DIR):
+    """
+    Parse the full Orange Book files with csv.DictReader.
+    The scraper uses the shared index in orange_book; this per-call loader is
+    kept as the baseline for benchmarks/bench_orange_book.py.
+    """
     print("Loading Orange Book data...")
     # Load patent data
     patent_data = defaultdict(list)
-    with open("Orange_Data/patent.txt", "r") as f:
+    with open(os.path.join(data_dir, "patent.txt"), "r") as f:
         reader = csv.DictReader(f, delimiter="~")
         for row in reader:
             app_no = row["Appl_No"]
@@ -190,7 +222,7 @@ def load_orange_book_data():
 
     # Load exclusivity data
     exclusivity_data = defaultdict(list)
-    with open("Orange_Data/exclusivity.txt", "r") as f:
+    with open(os.path.join(data_dir, "exclusivity.txt"), "r") as f:
         reader = csv.DictReader(f, delimiter="~")
         for row in reader:
             app_no = row["Appl_No"]
@@ -203,221 +235,472 @@ def load_orange_book_data():
 
     # Load products data
     products_data = defaultdict(list)
-    with open("Orange_Data/products.txt", "r") as f:
-        reader = csv.DictReader(f, delimiter="~")
-        for row in reader:
-            app_no = row["Appl_No"]
-            products_data[app_no].append(
-                {
-                    "applicant_full_name": row["Applicant_Full_Name"],
-                    "drug_manufacturer": row["Applicant_Full_Name"],
-                }
-            )
+    products_path = os.path.join(data_dir, "products.txt")
+    if os.path.exists(products_path):
+        with open(products_path, "r") as f:
+            reader = csv.DictReader(f, delimiter="~")
+            for row in reader:
+                app_no = row["Appl_No"]
+                products_data[app_no].append(
+                    {
+                        "applicant_full_name": row["Applicant_Full_Name"],
+                        "drug_manufacturer": row["Applicant_Full_Name"],
+                    }
+                )
 
     return patent_data, exclusivity_data, products_data
 
 
-def scrape_medications(medications: List[str]) -> List[Dict]:
+async def get_rxnorm_classes(medication: str) -> Dict:
+    """Get RxNorm drug classes for a medication name"""
+    rxnorm_index = get_rxnorm_index()
+    if rxnorm_index is not None:
+        # Local RxNorm/RxClass index: no RxNav round trips
+        with stage("rxcui") as span:
+            rxcui = rxnorm_index.rxcui(medication)
+            if rxcui is None:
+                span.outcome = "not_found"
+        if rxcui is None:
+            print(f"Could not find RxCUI for {medication}")
+            return empty_classes()
+        with stage("rxclass"):
+            return rxnorm_index.lookup_classes(medication)
+
+    if await is_known_missing("rxcui", medication):
+        print(f"RxNav recently had no RxCUI for {medication}, skipping lookup")
+        return empty_classes()
+    rxcui = await get_rxcui(medication)
+    if rxcui:
+        print(f"Found RxCUI: {rxcui}")
+        return await get_drug_classes(rxcui)
+    print(f"Could not find RxCUI for {medication}")
+    return {
+        "broad_class": [],
+        "narrow_class": [],
+        "pharmacologic_class": [],
+    }
+
+
+async def get_drugbank_data(medication: str) -> Dict:
     """
-    Scrape medication data from various sources and return a list of dictionaries.
-    Each dictionary contains detailed information about a medication.
+    Get DrugBank data, respecting the DrugBank rate limit. The browserless
+    fetch is tried first; Selenium is only used when it fails, and not at
+    all while DrugBank's circuit breaker is open.
     """
-    print(f"\nStarting to scrape data for medications: {medications}")
+    print(f"Getting DrugBank data for {medication}...")
+    drugbank_info = None
+    with stage("drugbank"):
+        if DRUGBANK_HTTP_ENABLED:
+            drugbank_info = await fetch_drugbank_info(medication)
+        if (
+            drugbank_info is None
+            and circuit_breakers.breaker(drugbank_base_url).is_open
+        ):
+            # DrugBank is down: don't spend a browser session finding that out
+            print(f"DrugBank unavailable, skipping browser scrape of {medication}")
+            drugbank_info = {"metabolism": "N/A", "route_of_elimination": "N/A"}
+        if drugbank_info is None:
+            await rate_limiter.wait_async(drugbank_base_url)
+            # Selenium is blocking, so it runs in a worker thread
+            drugbank_info = await asyncio.to_thread(get_drugbank_info, medication)
+    print(f"DrugBank data retrieved: {drugbank_info}")
+    return drugbank_info
+
+
+class MedicationNotFound(Exception):
+    """openFDA drugsfda has no application for the medication"""
+
+
+async def fetch_drugsfda_data(
+    medication: str, fda_batch: Optional[OpenFDABatch] = None
+) -> Dict:
+    """Look up a brand name in openFDA drugsfda (raises MedicationNotFound)"""
+    with stage("drugsfda") as span:
+        try:
+            if fda_batch is not None and fda_batch.has_drugsfda(medication):
+                result = fda_batch.drugsfda(medication)
+                if result is None:
+                    # Only live answers are cached as misses; a bulk query or
+                    # the mirror may be incomplete or out of date
+                    raise MedicationNotFound(f"No drugsfda match for {medication}")
+                return {"results": [result]}
 
-    try:
-        # Load Orange Book data
-        print("Loading Orange Book data...")
-        patent_data, exclusivity_data, products_data = load_orange_book_data()
-        print("Orange Book data loaded successfully")
-    except Exception as e:
-        print(f"Error loading Orange Book data: {e}")
-        patent_data, exclusivity_data, products_data = {}, {}, {}
+            print(f"Getting FDA data for {medication}...")
+            search_url = f"{openfda_base_url}?search=openfda.brand_name:{medication}"
+            response = await get_with_retries(search_url)
+            if response.status_code == 404:
+                await record_missing("drugsfda", medication)
+                raise MedicationNotFound(f"404 Not Found for url '{search_url}'")
+            response.raise_for_status()
+            data = response.json()
+            if not data.get("results"):
+                await record_missing("drugsfda", medication)
+            return data
+        except MedicationNotFound:
+            span.outcome = "not_found"
+            raise
 
-    # Dictionary to store results
-    medication_data = {}
 
-    for medication in medications:
-        print(f"\nProcessing {medication}...")
+async def drugsfda_stage(ctx: Dict) -> Dict:
+    """Identity: the drugsfda application for the medication, or not found"""
+    data = await fetch_drugsfda_data(ctx["medication"], ctx["fda_batch"])
+    if not data.get("results"):
+        raise MedicationNotFound("No FDA data found")
+    return data["results"][0]
+
+
+def openfda_field(result: Dict, field: str) -> str:
+    return result.get("openfda", {}).get(field, ["N/A"])[0]
+
+
+async def patents_stage(ctx: Dict) -> Dict:
+    """Precomputed Orange Book aggregates (dates compared chronologically)"""
+    # Application number without the 'NDA' prefix
+    app_number = openfda_field(ctx["drugsfda"], "application_number")
+    if app_number != "N/A":
+        app_number = app_number.replace("NDA", "")
+    # A lookup may parse or map the files first, so keep it off the event loop
+    return await asyncio.to_thread(ctx["orange_book"].summary, app_number)
+
+
+async def label_stage(ctx: Dict) -> Dict:
+    generic_name = openfda_field(ctx["drugsfda"], "generic_name")
+    return await fetch_fda_label_data(ctx["medication"], generic_name, ctx["fda_batch"])
+
+
+async def classes_stage(ctx: Dict) -> Dict:
+    return await get_rxnorm_classes(ctx["medication"])
+
+
+async def drugbank_stage(ctx: Dict) -> Dict:
+    return await get_drugbank_data(ctx["medication"])
+
+
+async def summaries_stage(ctx: Dict) -> Dict:
+    """Summarize every label section and DrugBank field with one batched LLM call"""
+    label_data, drugbank_info = ctx["label"], ctx["drugbank"]
+    summary_inputs = {
+        field: label_data.get(field, "N/A") for field in LABEL_SUMMARY_FIELDS
+    }
+    summary_inputs["metabolism"] = drugbank_info["metabolism"]
+    summary_inputs["route_of_elimination"] = drugbank_info["route_of_elimination"]
+    return await summarize_fields(summary_inputs)
+
+
+# drugsfda identifies the drug; nothing else is fetched for one openFDA
+# doesn't know. The cheap lookups (Orange Book, label, RxNav) and the
+# DrugBank scrape then run concurrently, and summarization waits for the
+# texts it summarizes.
+MEDICATION_PIPELINE = Pipeline(
+    [
+        Stage("drugsfda", drugsfda_stage),
+        Stage("patents", patents_stage, ("drugsfda",)),
+        Stage("label", label_stage, ("drugsfda",)),
+        Stage("classes", classes_stage, ("drugsfda",)),
+        Stage("drugbank", drugbank_stage, ("drugsfda",)),
+        Stage("summaries", summaries_stage, ("label", "drugbank")),
+    ]
+)
+
+
+def build_record(medication: str, results: Dict) -> Dict:
+    """Combine the pipeline's stage results into one medication record"""
+    result = results["drugsfda"]
+    orange_book_summary = results["patents"]
+    latest_patent = orange_book_summary["latest_patent"]
+    latest_exclusivity = orange_book_summary["latest_exclusivity"]
+    product_details = orange_book_summary["product"]
+    label_data = results["label"]
+    classes = results["classes"]
+    drugbank_info = results["drugbank"]
+    summaries = results["summaries"]
+    return {
+        "name": medication,
+        "application_number": openfda_field(result, "application_number"),
+        "brand_name": openfda_field(result, "brand_name"),
+        "generic_name": openfda_field(result, "generic_name"),
+        "manufacturer_name": openfda_field(result, "manufacturer_name"),
+        "patent_expiry_date": latest_patent.get("expiration_date", "N/A"),
+        "patent_number": latest_patent.get("patent_number", "N/A"),
+        "patent_count": orange_book_summary["patent_count"],
+        "earliest_patent_expiry_date": orange_book_summary["earliest_patent_expiry"],
+        "exclusivity_expiry_date": latest_exclusivity.get("expiration_date", "N/A"),
+        "exclusivity_code": latest_exclusivity.get("exclusivity_code", "N/A"),
+        "current_patent_owner": product_details.get("applicant_full_name", "N/A"),
+        "drug_manufacturer": product_details.get("drug_manufacturer", "N/A"),
+        "therapeutic_class": classes["broad_class"],
+        "broad_pharmacological_class": classes["narrow_class"],
+        "narrow_pharmacologic_class": classes["pharmacologic_class"],
+        "metabolism": drugbank_info["metabolism"],
+        "route_of_elimination": drugbank_info["route_of_elimination"],
+        "off_label_uses": "N/A",  # New field for manual filling
+        # Detailed fields
+        "indications_and_usage": label_data.get("indications_and_usage", "N/A"),
+        "dosage_and_administration": label_data.get("dosage_and_administration", "N/A"),
+        "mechanism_of_action": label_data.get("mechanism_of_action", "N/A"),
+        "adverse_reactions": label_data.get("adverse_reactions", "N/A"),
+        "drug_interactions": label_data.get("drug_interactions", "N/A"),
+        "contraindications": label_data.get("contraindications", "N/A"),
+        "pregnancy": label_data.get("pregnancy", "N/A"),
+        "pediatric_use": label_data.get("pediatric_use", "N/A"),
+        "geriatric_use": label_data.get("geriatric_use", "N/A"),
+        "information_for_patients": label_data.get("information_for_patients", "N/A"),
+        # Summary fields
+        **{f"{field}_summary": summary for field, summary in summaries.items()},
+        **label_data,  # Include all FDA label data
+    }
+
+
+async def scrape_medication(
+    medication: str, orange_book, fda_batch: Optional[OpenFDABatch] = None
+) -> Dict:
+    """
+    Scrape a single medication by running MEDICATION_PIPELINE: a drug
+    drugsfda doesn't know never costs RxNav requests or a DrugBank session,
+    and a failing stage cancels the others. openFDA results already in
+    fda_batch are used instead of live requests.
+    """
+    print(f"\nProcessing {medication}...")
+    stage_name = None
+    try:
         try:
-            # Get RxNorm data
-            rxcui = get_rxcui(medication)
-            if rxcui:
-                print(f"Found RxCUI: {rxcui}")
-                classes = get_drug_classes(rxcui)
-            else:
-                print(f"Could not find RxCUI for {medication}")
-                classes = {
-                    "broad_class": [],
-                    "narrow_class": [],
-                    "pharmacologic_class": [],
+            results = await MEDICATION_PIPELINE.run(
+                {
+                    "medication": medication,
+                    "orange_book": orange_book,
+                    "fda_batch": fda_batch,
                 }
+            )
+        except StageFailed as e:
+            if isinstance(e.error, MedicationNotFound):
+                return fda_not_found_record(medication, str(e.error))
+            stage_name = e.stage
+            raise e.error
+        record = build_record(medication, results)
+        print(f"Successfully processed {medication}")
+        return record
+    except Exception as e:
+        print(f"Error processing {medication}: {e}")
+        return {
+            "name": medication,
+            "error": str(e),
+            "error_type": type(e).__name__,
+            "error_source": "scraper",
+            "error_stage": stage_name,
+        }
 
-            # Get DrugBank data
-            print(f"Getting DrugBank data for {medication}...")
-            drugbank_info = get_drugbank_info(medication)
-            print(f"DrugBank data retrieved: {drugbank_info}")
 
-            # Get FDA data
-            print(f"Getting FDA data for {medication}...")
-            try:
-                search_url = (
-                    f"{openfda_base_url}?search=openfda.brand_name:{medication}"
-                )
-                response = requests.get(search_url)
-                response.raise_for_status()
-                data = response.json()
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 404:
-                    print(f"Medication {medication} not found in FDA database")
-                    medication_data[medication] = {
-                        "name": medication,
-                        "error": f"Medication not found in FDA database: {str(e)}",
-                        "error_type": "FDA_NOT_FOUND",
-                    }
-                    continue
-                else:
-                    raise
-
-            if data.get("results"):
-                result = data["results"][0]
-                openfda = result.get("openfda", {})
-                products = result.get("products", [])
-
-                # Get application number without 'NDA' prefix
-                app_number = openfda.get("application_number", ["N/A"])[0]
-                if app_number != "N/A":
-                    app_number = app_number.replace("NDA", "")
-
-                # Get Orange Book data
-                patent_info = patent_data.get(app_number, [])
-                exclusivity_info = exclusivity_data.get(app_number, [])
-                product_info = products_data.get(app_number, [])
-
-                # Get latest patent and exclusivity dates
-                latest_patent = (
-                    max(patent_info, key=lambda x: x["expiration_date"])
-                    if patent_info
-                    else {}
-                )
-                latest_exclusivity = (
-                    max(exclusivity_info, key=lambda x: x["expiration_date"])
-                    if exclusivity_info
-                    else {}
+def fda_not_found_record(medication: str, reason: str) -> Dict:
+    print(f"Medication {medication} not found in FDA database")
+    return {
+        "name": medication,
+        "error": f"Medication not found in FDA database: {reason}",
+        "error_type": "FDA_NOT_FOUND",
+    }
+
+
+def unresolved_record(resolution: NameResolution) -> Dict:
+    """Error record for a name with nothing to look up (blank input)"""
+    print(f"Invalid medication name {resolution.query!r}")
+    return {
+        "name": resolution.query,
+        "error": "Medication name is empty",
+        "error_type": "NAME_NOT_RESOLVED",
+        "error_source": "name_resolver",
+        "suggestions": resolution.suggestions,
+    }
+
+
+async def iter_scrape_medications(
+    medications: List[str],
+    max_workers: int = SCRAPE_MAX_WORKERS,
+    on_progress: Optional[Callable[[str, str, Optional[Dict]], None]] = None,
+) -> AsyncIterator[Tuple[int, Dict]]:
+    """
+    Scrape medications concurrently and yield (index, record) pairs as soon
+    as each one finishes, so callers can stream results instead of waiting
+    for the whole batch. index is the medication's position in the input.
+    Duplicate names (after normalization and resolution) are scraped and
+    yielded once, for their first position, and a medication already being
+    scraped by another run is shared with it rather than fetched again.
+
+    Up to max_workers medications are processed concurrently; per-host rate
+    limits (see rate_limit.py) keep the upstream APIs happy. openFDA is
+    queried in bulk for the whole list first (see openfda_bulk.py), or read
+    from the local dump index when OPENFDA_SOURCE=mirror.
+    Names are resolved first (see name_resolver.py). Names missing from the
+    local vocabulary are still scraped as typed; if drugsfda has no record of
+    one, the resolver's correction (when it offered one) is tried instead,
+    and a final not-found record carries the closest known names as
+    suggestions.
+    Names openFDA recently answered 404 for fail immediately as well (see
+    negative_cache.py).
+    Medications still in flight are cancelled if the caller stops iterating
+    early.
+
+    on_progress(medication, status, record) is called with status "running"
+    when a medication starts and "completed" or "failed" when it finishes,
+    once for every input name (duplicates report their first copy's status).
+    """
+    print(f"\nStarting to scrape data for medications: {medications}")
+
+    # Shared Orange Book index, parsed once per process
+    orange_book = get_orange_book_index()
+
+    # Canonicalize names before spending any upstream requests on them
+    with stage("name_resolution"):
+        resolutions = await asyncio.to_thread(resolve_medication_names, medications)
+    unique: Dict[str, int] = {}
+    # Input names skipped as duplicates of the key's first occurrence
+    duplicates: Dict[str, List[str]] = {}
+    for index, resolution in enumerate(resolutions):
+        key = normalize_medication_name(resolution.name or resolution.query)
+        if key in unique:
+            print(f"Skipping duplicate medication {medications[index]!r}")
+            duplicates.setdefault(key, []).append(medications[index])
+            continue
+        unique[key] = index
+    resolved = [
+        resolutions[index].name
+        for index in unique.values()
+        if resolutions[index].name is not None
+    ]
+
+    # Drugs openFDA recently had no record of fail without any requests
+    corrections = [
+        resolutions[index].correction
+        for index in unique.values()
+        if resolutions[index].correction is not None
+    ]
+    with stage("negative_cache"):
+        not_found = await known_missing("drugsfda", resolved + corrections)
+    resolved = [name for name in resolved if name not in not_found]
+
+    # Resolve the whole run against openFDA in a few combined queries
+    fda_batch = None
+    if OPENFDA_SOURCE == "mirror":
+        # Offline: everything comes from the local bulk-download index
+        with stage("openfda_prefetch"):
+            fda_batch = await asyncio.to_thread(
+                get_openfda_mirror().build_batch, resolved
+            )
+    elif OPENFDA_BULK_ENABLED and len(resolved) > 1:
+        try:
+            with stage("openfda_prefetch"):
+                fda_batch = await OpenFDABatch.prefetch(
+                    resolved, openfda_base_url, openfda_label_url
                 )
-                product_details = product_info[0] if product_info else {}
-
-                # Get FDA label data
-                generic_name = openfda.get("generic_name", ["N/A"])[0]
-                label_data = fetch_fda_label_data(medication, generic_name)
-
-                # Combine all data
-                medication_data[medication] = {
-                    "name": medication,
-                    "application_number": openfda.get("application_number", ["N/A"])[0],
-                    "brand_name": openfda.get("brand_name", ["N/A"])[0],
-                    "generic_name": generic_name,
-                    "manufacturer_name": openfda.get("manufacturer_name", ["N/A"])[0],
-                    "patent_expiry_date": latest_patent.get("expiration_date", "N/A"),
-                    "patent_number": latest_patent.get("patent_number", "N/A"),
-                    "exclusivity_expiry_date": latest_exclusivity.get(
-                        "expiration_date", "N/A"
-                    ),
-                    "exclusivity_code": latest_exclusivity.get(
-                        "exclusivity_code", "N/A"
-                    ),
-                    "current_patent_owner": product_details.get(
-                        "applicant_full_name", "N/A"
-                    ),
-                    "drug_manufacturer": product_details.get(
-                        "drug_manufacturer", "N/A"
-                    ),
-                    "therapeutic_class": classes["broad_class"],
-                    "broad_pharmacological_class": classes["narrow_class"],
-                    "narrow_pharmacologic_class": classes["pharmacologic_class"],
-                    "metabolism": drugbank_info["metabolism"],
-                    "route_of_elimination": drugbank_info["route_of_elimination"],
-                    "off_label_uses": "N/A",  # New field for manual filling
-                    # Detailed fields
-                    "indications_and_usage": label_data.get(
-                        "indications_and_usage", "N/A"
-                    ),
-                    "dosage_and_administration": label_data.get(
-                        "dosage_and_administration", "N/A"
-                    ),
-                    "mechanism_of_action": label_data.get("mechanism_of_action", "N/A"),
-                    "adverse_reactions": label_data.get("adverse_reactions", "N/A"),
-                    "drug_interactions": label_data.get("drug_interactions", "N/A"),
-                    "contraindications": label_data.get("contraindications", "N/A"),
-                    "pregnancy": label_data.get("pregnancy", "N/A"),
-                    "pediatric_use": label_data.get("pediatric_use", "N/A"),
-                    "geriatric_use": label_data.get("geriatric_use", "N/A"),
-                    "information_for_patients": label_data.get(
-                        "information_for_patients", "N/A"
-                    ),
-                    # Summary fields
-                    "indications_and_usage_summary": generate_summary(
-                        label_data.get("indications_and_usage", "N/A")
-                    ),
-                    "dosage_and_administration_summary": generate_summary(
-                        label_data.get("dosage_and_administration", "N/A")
-                    ),
-                    "mechanism_of_action_summary": generate_summary(
-                        label_data.get("mechanism_of_action", "N/A")
-                    ),
-                    "adverse_reactions_summary": generate_summary(
-                        label_data.get("adverse_reactions", "N/A")
-                    ),
-                    "drug_interactions_summary": generate_summary(
-                        label_data.get("drug_interactions", "N/A")
-                    ),
-                    "contraindications_summary": generate_summary(
-                        label_data.get("contraindications", "N/A")
-                    ),
-                    "pregnancy_summary": generate_summary(
-                        label_data.get("pregnancy", "N/A")
-                    ),
-                    "pediatric_use_summary": generate_summary(
-                        label_data.get("pediatric_use", "N/A")
-                    ),
-                    "geriatric_use_summary": generate_summary(
-                        label_data.get("geriatric_use", "N/A")
-                    ),
-                    "metabolism_summary": generate_summary(drugbank_info["metabolism"]),
-                    "route_of_elimination_summary": generate_summary(
-                        drugbank_info["route_of_elimination"]
-                    ),
-                    "information_for_patients_summary": generate_summary(
-                        label_data.get("information_for_patients", "N/A")
-                    ),
-                    **label_data,  # Include all FDA label data
-                }
-                print(f"Successfully processed {medication}")
+        except Exception as e:
+            print(f"Bulk openFDA prefetch failed, using single lookups: {e}")
+
+    semaphore = asyncio.Semaphore(max_workers)
+
+    def report(key: str, medication: str, status: str, record: Optional[Dict]):
+        if on_progress:
+            for name in [medication] + duplicates.get(key, []):
+                on_progress(name, status, record)
+
+    async def scrape_bounded(
+        index: int, key: str, medication: str, resolution: NameResolution
+    ) -> Tuple[int, Dict]:
+        # The name as typed, then the resolver's correction if drugsfda misses
+        candidates = [resolution.name, resolution.correction]
+        candidates = [name for name in candidates if name and name not in not_found]
+        if not candidates:
+            if resolution.name is None:
+                record = unresolved_record(resolution)
             else:
-                print(f"No FDA data found for {medication}")
-                medication_data[medication] = {
-                    "name": medication,
-                    "error": "No FDA data found",
-                }
+                record = fda_not_found_record(
+                    resolution.name, "no drugsfda match (cached)"
+                )
+                if resolution.suggestions:
+                    record["suggestions"] = resolution.suggestions
+            MEDICATIONS_PROCESSED.labels("failed").inc()
+            report(key, medication, "failed", record)
+            return index, record
+
+        async def scrape() -> Dict:
+            async with semaphore:
+                report(key, medication, "running", None)
+                for name in candidates:
+                    if name != candidates[0]:
+                        print(f"Trying {name!r} for {resolution.query!r}")
+                    record = await scrape_medication(name, orange_book, fda_batch)
+                    if record.get("error_type") != "FDA_NOT_FOUND":
+                        break
+                if record.get("error_type") == "FDA_NOT_FOUND":
+                    # Report the miss under the name that was asked for
+                    record["name"] = candidates[0]
+                    if resolution.suggestions:
+                        record["suggestions"] = resolution.suggestions
+                return record
+
+        if scrape_flight.in_flight(key):
+            print(f"{resolution.name} is already being scraped, sharing the result")
+            report(key, medication, "running", None)
+        record = await scrape_flight.do(key, scrape)
+        if record.get("name") != medication:
+            record["requested_name"] = medication
+        status = "failed" if "error" in record else "completed"
+        MEDICATIONS_PROCESSED.labels(status).inc()
+        report(key, medication, status, record)
+        return index, record
+
+    tasks = [
+        asyncio.create_task(
+            scrape_bounded(index, key, medications[index], resolutions[index])
+        )
+        for key, index in unique.items()
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def scrape_medications(
+    medications: List[str],
+    max_workers: int = SCRAPE_MAX_WORKERS,
+    on_progress: Optional[Callable[[str, str, Optional[Dict]], None]] = None,
+) -> List[Dict]:
+    """
+    Scrape medication data from various sources and return a list of dictionaries.
+    Each dictionary contains detailed information about a medication.
 
-        except Exception as e:
-            print(f"Error processing {medication}: {e}")
-            medication_data[medication] = {
-                "name": medication,
-                "error": str(e),
-                "error_type": type(e).__name__,
-                "error_source": "scraper",
-            }
+    Collects iter_scrape_medications; results keep the order of the input list,
+    with one record per distinct medication.
+    """
+    # Dictionary to store results, keyed by position in the input
+    medication_data = {}
 
-        # Be nice to the APIs
-        time.sleep(1)
+    async for index, record in iter_scrape_medications(
+        medications, max_workers, on_progress
+    ):
+        medication_data[index] = record
+    medication_data = dict(sorted(medication_data.items()))
 
     print(f"\nScraping complete. Processed {len(medication_data)} medications.")
     return list(medication_data.values())
 
 
+async def scrape_and_close(medications: List[str]) -> List[Dict]:
+    """Scrape from a standalone event loop, then release clients and browsers"""
+    try:
+        return await scrape_medications(medications)
+    finally:
+        await close_clients()
+        await asyncio.to_thread(shutdown_driver_pool)
+
+
 def main():
     # Use the predefined list of medications
-    results = scrape_medications(MEDICATIONS)
+    with track_summary_usage() as summary_usage:
+        results = asyncio.run(scrape_and_close(MEDICATIONS))
+    print(f"Summarization usage: {summary_usage.as_dict()}")
 
     # Save to a file
     with open("medication_data.json", "w") as f:
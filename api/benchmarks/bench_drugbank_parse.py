@@ -0,0 +1,69 @@
+"""
+Benchmark the browserless DrugBank extractor against saved HTML fixtures.
+
+Runs fully offline: each fixture is parsed repeatedly with every available
+BeautifulSoup parser and checked against the expected fields.
+
+    cd api
+    python benchmarks/bench_drugbank_parse.py
+"""
+
+import os
+import sys
+import time
+
+from bs4 import FeatureNotFound
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+from Data_Script import drugbank_http  # noqa: E402
+
+FIXTURES_DIR = os.path.join(API_DIR, "benchmarks", "fixtures", "drugbank")
+PARSERS = ("lxml", "html.parser")
+ITERATIONS = 200
+
+EXPECTED = {
+    "drug_page.html": ("Zolpidem is converted", "Zolpidem is excreted"),
+    "drug_page_no_elimination.html": ("As a monoclonal antibody", "N/A"),
+}
+
+
+def load_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), "r") as f:
+        return f.read()
+
+
+def check_fixtures() -> None:
+    """Fail loudly if the extractor no longer matches the fixtures"""
+    for name, (metabolism, elimination) in EXPECTED.items():
+        result = drugbank_http.parse_drug_page(load_fixture(name))
+        assert result["metabolism"].startswith(metabolism), result
+        assert result["route_of_elimination"].startswith(elimination), result
+    search = load_fixture("search_results.html")
+    assert drugbank_http.find_drug_url(search).endswith("/drugs/DB00425")
+    assert drugbank_http.parse_drug_page(search) is None
+
+
+def main():
+    pages = [load_fixture(name) for name in EXPECTED]
+    print(f"{'parser':<14}{'ms/page':>10}{'pages/s':>10}")
+    for parser in PARSERS:
+        drugbank_http.HTML_PARSER = parser
+        try:
+            check_fixtures()
+        except FeatureNotFound as e:
+            # Parser not installed; a failed check still raises and exits non-zero
+            print(f"{parser:<14}unavailable ({e})")
+            continue
+        start = time.perf_counter()
+        for _ in range(ITERATIONS):
+            for html in pages:
+                drugbank_http.parse_drug_page(html)
+        elapsed = time.perf_counter() - start
+        parsed = ITERATIONS * len(pages)
+        print(f"{parser:<14}{elapsed / parsed * 1000:>10.3f}{parsed / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
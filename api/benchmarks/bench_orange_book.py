@@ -0,0 +1,105 @@
+"""
+Compare Orange Book loaders: cold-start time, RSS growth and lookup latency.
+
+Each loader runs in a fresh interpreter so import caches and the allocator
+state of one loader don't skew the next one.
+
+    cd api
+    python benchmarks/bench_orange_book.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+LOADERS = ("dictreader", "index", "snapshot")
+LOOKUPS = 10000
+
+
+def rss_kb() -> int:
+    """Current resident set size in kB"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def sample_app_numbers() -> list:
+    """Application numbers listed in patent.txt, the same for every loader"""
+    from Data_Script.orange_book import ORANGE_BOOK_DIR, PATENT_FILE, read_columns
+
+    path = os.path.join(ORANGE_BOOK_DIR, PATENT_FILE)
+    return sorted({app_no for (app_no,) in read_columns(path, ("Appl_No",))})
+
+
+def run_loader(name: str) -> dict:
+    """Load with one strategy inside this process and report the numbers"""
+    from Data_Script.orange_book import OrangeBookIndex
+    from Data_Script.orange_book_snapshot import (
+        ORANGE_BOOK_SNAPSHOT,
+        OrangeBookSnapshot,
+        build_snapshot,
+    )
+    from Data_Script.working import load_orange_book_data
+
+    if name == "snapshot" and not os.path.exists(ORANGE_BOOK_SNAPSHOT):
+        build_snapshot()
+    # Read before measuring so the sample isn't counted against the loader
+    app_numbers = sample_app_numbers()
+
+    rss_before = rss_kb()
+    start = time.perf_counter()
+    if name == "dictreader":
+        patent_data, _, _ = load_orange_book_data()
+        lookup = patent_data.get
+    else:
+        index = OrangeBookIndex() if name == "index" else OrangeBookSnapshot()
+        index.load()
+        lookup = index.patents
+    load_seconds = time.perf_counter() - start
+    rss_after = rss_kb()
+
+    start = time.perf_counter()
+    for i in range(LOOKUPS):
+        lookup(app_numbers[i % len(app_numbers)])
+    lookup_seconds = time.perf_counter() - start
+
+    return {
+        "loader": name,
+        "load_ms": round(load_seconds * 1000, 1),
+        "rss_delta_kb": rss_after - rss_before,
+        "lookup_us": round(lookup_seconds / LOOKUPS * 1e6, 2),
+    }
+
+
+def main():
+    results = []
+    for name in LOADERS:
+        output = subprocess.run(
+            [sys.executable, __file__, name],
+            cwd=API_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'loader':<12}{'load ms':>10}{'RSS kB':>10}{'lookup us':>12}")
+    for r in results:
+        print(
+            f"{r['loader']:<12}{r['load_ms']:>10}{r['rss_delta_kb']:>10}"
+            f"{r['lookup_us']:>12}"
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        print(json.dumps(run_loader(sys.argv[1])))
+    else:
+        main()
@@ -0,0 +1,191 @@
+"""
+End-to-end throughput of the scrape pipeline against local stub upstreams.
+
+openFDA, RxNav, DrugBank and OpenRouter are replaced by stub servers that
+replay responses built from captured records (see stub_upstream.py), and
+results are committed to the in-memory Firestore fake, so nothing leaves
+the machine. Each run size reports wall time, drugs/s and a per-stage
+breakdown from the pipeline's own timing spans.
+
+    cd api
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --sizes 100 --latency 0.05 \\
+        --latency drugbank=0.3 --error-rate 0.02 --json results.json
+
+Upstream rate limits are lifted unless --rate-limited is given, in which
+case each stub gets the production limit of the host it stands in for.
+Response and summary caches and name resolution are disabled so every run
+does the full amount of work.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List
+
+from stub_upstream import (
+    CAPTURES_PATH,
+    add_stub_arguments,
+    per_upstream,
+    start_stubs,
+    synthetic_names,
+)
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+# Read by Data_Script at import time, so set before importing it
+BENCH_ENV = {
+    "RESPONSE_CACHE_ENABLED": "0",
+    "SUMMARY_CACHE_ENABLED": "0",
+    "NEGATIVE_CACHE_ENABLED": "0",
+    "NAME_RESOLVER": "off",
+    "RXNORM_SOURCE": "live",
+    "OPENFDA_SOURCE": "live",
+    "OPENROUTER_API_KEY": "benchmark",
+}
+UNTHROTTLED_ENV = {
+    "DEFAULT_RATE_LIMIT": "1000000",
+    "OPENROUTER_REQUESTS_PER_SECOND": "1000000",
+    "OPENROUTER_BURST": "1000000",
+}
+# Production host whose rate limit applies to each stub with --rate-limited
+STUB_HOSTS = {
+    "openfda": "api.fda.gov",
+    "rxnav": "rxnav.nlm.nih.gov",
+    "drugbank": "go.drugbank.com",
+}
+
+
+async def run_once(medications: List[str], max_workers: int) -> Dict:
+    from Data_Script.firestore_fake import InMemoryFirestore
+    from Data_Script.firestore_writer import ScrapeRunWriter
+    from Data_Script.http_client import close_clients
+    from Data_Script.metrics import RunTimings, track_run_timings
+    from Data_Script.summary_executor import track_summary_usage
+    from Data_Script.working import iter_scrape_medications
+
+    timings = RunTimings()
+    writer = ScrapeRunWriter(
+        InMemoryFirestore(),
+        str(uuid.uuid4()),
+        datetime.utcnow(),
+        medications,
+        timings=timings,
+    )
+    start = time.perf_counter()
+    await writer.start()
+    try:
+        with track_summary_usage() as usage, track_run_timings(timings):
+            async for _, record in iter_scrape_medications(medications, max_workers):
+                writer.add(record)
+        outcome = await writer.finish(usage.as_dict())
+    finally:
+        await close_clients()
+    return {
+        "drugs": len(medications),
+        "wall_seconds": round(time.perf_counter() - start, 3),
+        "stored": outcome["medications_scraped"],
+        "failed": outcome["medications_failed"],
+        "summary_requests": usage.requests,
+        "timings": timings.as_dict(),
+    }
+
+
+def print_result(result: Dict, stubs: Dict, fallbacks: int) -> None:
+    wall = result["wall_seconds"]
+    print(
+        f"\n{result['drugs']} drugs in {wall:.2f}s "
+        f"({result['drugs'] / wall:.1f} drugs/s): {result['stored']} stored, "
+        f"{result['failed']} failed, {fallbacks} browser fallbacks"
+    )
+    print(
+        "  upstream requests: "
+        + ", ".join(
+            f"{name} {stub.requests} ({stub.errors} injected errors)"
+            for name, stub in stubs.items()
+        )
+    )
+    print(f"  {'stage':<18}{'calls':>7}{'mean ms':>10}{'max ms':>10}{'calls/s':>10}")
+    for stage, totals in result["timings"]["stages"].items():
+        count = totals["count"]
+        print(
+            f"  {stage:<18}{count:>7}"
+            f"{1000 * totals['total_seconds'] / count:>10.1f}"
+            f"{1000 * totals['max_seconds']:>10.1f}"
+            f"{count / wall:>10.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="10,100,1000")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--rate-limited", action="store_true")
+    parser.add_argument("--json", metavar="PATH", help="also write results here")
+    parser.add_argument("--verbose", action="store_true", help="show scraper output")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    stubs = start_stubs(
+        per_upstream(args.latency, 0.02),
+        per_upstream(args.error_rate, 0.0),
+        args.captures,
+    )
+    os.environ.update(BENCH_ENV)
+    if not args.rate_limited:
+        os.environ.update(UNTHROTTLED_ENV)
+
+    from Data_Script import working
+    from Data_Script.rate_limit import DEFAULT_HOST_RATES, rate_limiter
+
+    if args.rate_limited:
+        for name, host in STUB_HOSTS.items():
+            rate_limiter.host_rates[stubs[name].host] = DEFAULT_HOST_RATES[host]
+
+    # A failed stub page must not launch Chrome; count the fallback instead
+    fallbacks = []
+
+    def no_browser(medication: str) -> Dict:
+        fallbacks.append(medication)
+        return {"metabolism": "N/A", "route_of_elimination": "N/A"}
+
+    working.get_drugbank_info = no_browser
+
+    with open(args.captures or CAPTURES_PATH) as f:
+        captured = list(json.load(f))
+    workers = args.workers or working.SCRAPE_MAX_WORKERS
+    if not args.verbose:
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        for stub in stubs.values():
+            stub.reset_counts()
+        fallbacks.clear()
+        medications = synthetic_names(captured, size)
+        scraper_output = io.StringIO()
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else scraper_output):
+            result = asyncio.run(run_once(medications, workers))
+        result["upstream_requests"] = {n: s.requests for n, s in stubs.items()}
+        result["injected_errors"] = {n: s.errors for n, s in stubs.items()}
+        result["browser_fallbacks"] = len(fallbacks)
+        print_result(result, stubs, len(fallbacks))
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"workers": workers, "results": results}, f, indent=2)
+    for stub in stubs.values():
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""
+Local stand-in for openFDA, RxNav, DrugBank and OpenRouter.
+
+Responses are generated from captured scraper output (the format of
+Data_Script/medication_data.json): every captured drug becomes a drugsfda
+application, a label, an RxCUI with its classes and a DrugBank page. Any
+number of distinct drugs can be served by suffixing the captured names with
+a number ("Abilify", "Abilify1", "Abilify2", ...).
+
+Each upstream listens on its own loopback address (127.0.0.1-4, as on
+Linux) so the scraper keeps one connection pool and rate limiter per host,
+as in production. Latency and an error rate (503 responses) can be
+injected per upstream.
+
+    cd api
+    python benchmarks/stub_upstream.py --latency 0.05
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CAPTURES_PATH = os.path.join(API_DIR, "Data_Script", "medication_data.json")
+DRUG_PAGE_PATH = os.path.join(
+    API_DIR, "benchmarks", "fixtures", "drugbank", "drug_page.html"
+)
+
+# Scraper environment variable and base URL path of each upstream
+UPSTREAMS = {
+    "openfda": ("OPENFDA_API_URL", ""),
+    "rxnav": ("RXNAV_API_URL", "/REST"),
+    "drugbank": ("DRUGBANK_BASE_URL", "/"),
+    "openrouter": ("OPENROUTER_API_URL", "/api/v1/chat/completions"),
+}
+
+SECTION_HEADER = re.compile(r"^\s*### (\w+)\s*$", re.MULTILINE)
+# Captured class lists, by RxClass class type
+CLASS_FIELDS = (
+    ("VA", "therapeutic_class"),
+    ("ATC1-4", "broad_pharmacological_class"),
+    ("EPC", "narrow_pharmacologic_class"),
+)
+
+
+def synthetic_names(captures: List[str], count: int) -> List[str]:
+    """count distinct medication names, cycling through the captured ones"""
+    names = []
+    for i in range(count):
+        base = captures[i % len(captures)]
+        names.append(base if i < len(captures) else f"{base}{i // len(captures)}")
+    return names
+
+
+def search_terms(search: str, field: str) -> List[str]:
+    """Values searched for in field, quoted (bulk) or bare (single lookups)"""
+    pattern = re.escape(field) + r':(?:"([^"]+)"|(\S+))'
+    return [quoted or bare for quoted, bare in re.findall(pattern, search)]
+
+
+class Fixtures:
+    """Builds upstream responses for captured (and suffixed) drug names"""
+
+    def __init__(self, captures_path: str = CAPTURES_PATH):
+        with open(captures_path) as f:
+            captures = json.load(f)
+        self.names = list(captures)
+        self._by_brand = {name.casefold(): record for name, record in captures.items()}
+        self._by_generic = {
+            record["generic_name"].casefold(): record for record in captures.values()
+        }
+        self._rxcuis: Dict[str, Tuple[Dict, str]] = {}
+        self._lock = threading.Lock()
+        with open(DRUG_PAGE_PATH, "rb") as f:
+            self.drug_page = f.read()
+
+    @staticmethod
+    def _find(name: str, index: Dict[str, Dict]) -> Optional[Tuple[Dict, str]]:
+        """(captured record, numeric suffix) for a possibly suffixed name"""
+        base, suffix = re.fullmatch(r"(.*?)(\d*)", name.strip().casefold()).groups()
+        record = index.get(base)
+        return (record, suffix) if record else None
+
+    def drugsfda(self, brand_name: str) -> Optional[Dict]:
+        found = self._find(brand_name, self._by_brand)
+        if found is None:
+            return None
+        record, suffix = found
+        application = record["application_number"]
+        # Echo the searched brand so every synthetic drug matches exactly
+        return {
+            "application_number": application,
+            "openfda": {
+                "application_number": [application],
+                "brand_name": [brand_name.upper()],
+                "generic_name": [record["generic_name"] + suffix],
+                "manufacturer_name": [record["manufacturer_name"]],
+            },
+            "products": [{"brand_name": brand_name.upper()}],
+        }
+
+    def label(self, generic_name: str) -> Optional[Dict]:
+        found = self._find(generic_name, self._by_generic)
+        if found is None:
+            return None
+        record, suffix = found
+        label = {
+            field: [value]
+            for field, value in record.items()
+            if isinstance(value, str) and value != "N/A"
+        }
+        label["openfda"] = {"generic_name": [record["generic_name"] + suffix]}
+        return label
+
+    def rxcui(self, name: str) -> Optional[str]:
+        found = self._find(name, self._by_brand)
+        if found is None:
+            return None
+        with self._lock:
+            rxcui = str(len(self._rxcuis) + 1)
+            self._rxcuis[rxcui] = found
+        return rxcui
+
+    def classes(self, rxcui: str) -> List[Dict]:
+        found = self._rxcuis.get(rxcui)
+        if found is None:
+            return []
+        record, _ = found
+        return [
+            {
+                "minConcept": {"rxcui": rxcui},
+                "rxclassMinConceptItem": {
+                    "classType": class_type,
+                    "className": class_name,
+                },
+            }
+            for class_type, field in CLASS_FIELDS
+            for class_name in record.get(field) or []
+        ]
+
+    def completion(self, prompt: str) -> Dict:
+        """Chat completion answering a batched (JSON) or single summary prompt"""
+        sections = SECTION_HEADER.findall(prompt)
+        if sections:
+            content = json.dumps({s: f"Summary of {s}." for s in sections})
+        else:
+            content = "Summary."
+        tokens = len(prompt) // 4
+        return {
+            "choices": [{"message": {"role": "assistant", "content": content}}],
+            "usage": {
+                "prompt_tokens": tokens,
+                "completion_tokens": 20,
+                "total_tokens": tokens + 20,
+            },
+        }
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # Clients hang up mid-response when they give up on injected errors
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if status == 503:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, data, status: int = 200) -> None:
+        self._send(status, json.dumps(data).encode("utf-8"), "application/json")
+
+    def _inject(self) -> bool:
+        """Apply latency and maybe answer 503; True if the request was failed"""
+        upstream = self.server.upstream
+        with upstream.lock:
+            upstream.requests += 1
+        latency = upstream.latency
+        if latency:
+            time.sleep(random.uniform(0.5 * latency, 1.5 * latency))
+        if upstream.error_rate and random.random() < upstream.error_rate:
+            with upstream.lock:
+                upstream.errors += 1
+            self._json({"error": "injected"}, 503)
+            return True
+        return False
+
+    def do_GET(self):
+        if self._inject():
+            return
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        fixtures = self.server.upstream.fixtures
+        path = url.path
+
+        if path.endswith("/drugsfda.json") or path.endswith("/label.json"):
+            if path.endswith("/drugsfda.json"):
+                field, lookup = "openfda.brand_name", fixtures.drugsfda
+            else:
+                field, lookup = "openfda.generic_name", fixtures.label
+            terms = search_terms(query.get("search", ""), field)
+            results = [r for r in map(lookup, terms) if r is not None]
+            skip, limit = int(query.get("skip", 0)), int(query.get("limit", 1))
+            if not results[skip : skip + limit]:
+                return self._json({"error": {"code": "NOT_FOUND"}}, 404)
+            return self._json(
+                {
+                    "meta": {"results": {"skip": skip, "total": len(results)}},
+                    "results": results[skip : skip + limit],
+                }
+            )
+        if path.endswith("/rxcui.json"):
+            rxcui = fixtures.rxcui(query.get("name", ""))
+            id_group = {"rxnormId": [rxcui]} if rxcui else {}
+            return self._json({"idGroup": id_group})
+        if path.endswith("/rxclass/class/byRxcui.json"):
+            items = fixtures.classes(query.get("rxcui", ""))
+            return self._json({"rxclassDrugInfoList": {"rxclassDrugInfo": items}})
+        if path.endswith("/unearth/q"):
+            # An exact search match lands on the drug page itself
+            return self._send(200, fixtures.drug_page, "text/html")
+        self._json({"error": f"unknown path {path}"}, 404)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self._inject():
+            return
+        prompt = json.loads(body)["messages"][0]["content"]
+        self._json(self.server.upstream.fixtures.completion(prompt))
+
+
+class StubUpstream:
+    """One upstream served on its own local port from a background thread"""
+
+    def __init__(
+        self,
+        name: str,
+        host: str,
+        fixtures: Fixtures,
+        latency: float,
+        error_rate: float,
+    ):
+        self.name = name
+        self.fixtures = fixtures
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.server = StubServer((host, 0), StubHandler)
+        self.server.upstream = self
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def host(self) -> str:
+        return self.server.server_address[0]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.server.server_address[1]}{UPSTREAMS[self.name][1]}"
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_counts(self) -> None:
+        with self.lock:
+            self.requests = self.errors = 0
+
+
+def start_stubs(
+    latency: Dict[str, float], error_rate: Dict[str, float], captures_path: str
+) -> Dict[str, StubUpstream]:
+    """Start every upstream stub and point the scraper's base URLs at them"""
+    fixtures = Fixtures(captures_path)
+    stubs = {}
+    for number, (name, (env_var, _)) in enumerate(UPSTREAMS.items(), 1):
+        stub = StubUpstream(
+            name,
+            f"127.0.0.{number}",
+            fixtures,
+            latency.get(name, 0.0),
+            error_rate.get(name, 0.0),
+        )
+        stub.start()
+        os.environ[env_var] = stub.base_url
+        stubs[name] = stub
+    return stubs
+
+
+def per_upstream(values: List[str], default: float) -> Dict[str, float]:
+    """Parse ["0.05", "drugbank=0.3"] into a value per upstream"""
+    result = dict.fromkeys(UPSTREAMS, default)
+    for value in values or []:
+        if "=" in value:
+            name, number = value.split("=", 1)
+            if name not in UPSTREAMS:
+                raise SystemExit(f"Unknown upstream {name!r}, use one of {UPSTREAMS}")
+            result[name] = float(number)
+        else:
+            result = dict.fromkeys(UPSTREAMS, float(value))
+    return result
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--latency",
+        action="append",
+        metavar="[UPSTREAM=]SECONDS",
+        help="mean injected latency, for all upstreams or one (repeatable)",
+    )
+    parser.add_argument(
+        "--error-rate",
+        action="append",
+        metavar="[UPSTREAM=]RATE",
+        help="share of requests answered with 503 (repeatable)",
+    )
+    parser.add_argument("--captures", default=CAPTURES_PATH)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    stubs = start_stubs(
+        per_upstream(args.latency, 0.0),
+        per_upstream(args.error_rate, 0.0),
+        args.captures,
+    )
+    for name, stub in stubs.items():
+        print(f"{UPSTREAMS[name][0]}={stub.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for stub in stubs.values():
+            stub.stop()
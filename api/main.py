@@ -1,4 +1,5 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import firebase_admin
@@ -9,81 +10,112 @@ from dotenv import load_dotenv
 import sys
 import os
 from datetime import datetime
+from contextlib import asynccontextmanager
 import uuid
 
 # Add CORS middleware import
 from fastapi.middleware.cors import CORSMiddleware
 
-# Add import for running synchronous code in background thread
+# Add import for running synchronous startup code in a background thread
 from starlette.concurrency import run_in_threadpool
 
 # Add the parent directory to sys.path to import the scraper
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from Data_Script.working import (
-    scrape_medications,
+    iter_scrape_medications,
 )
+from Data_Script.orange_book import preload_orange_book
+from Data_Script.http_client import close_clients
+from Data_Script.drugbank import shutdown_driver_pool, start_driver_pool
+from Data_Script.summary_executor import SummaryUsage, track_summary_usage
+from Data_Script.jobs import JobQueue, ScrapeJob, ScrapeRunError
+from Data_Script.firestore_fake import InMemoryFirestore
+from Data_Script.firestore_writer import ScrapeRunWriter
+from Data_Script.metrics import CacheStatsCollector, RunTimings, track_run_timings
+from Data_Script.negative_cache import negative_cache
+from Data_Script.response_cache import response_cache
+from Data_Script.summarizer import summary_cache
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
 
 # Load environment variables
 load_dotenv()
 
 # Initialize Firebase Admin
-try:
-    # Try to use environment variables first
-    required_env_vars = [
-        "FIREBASE_PROJECT_ID",
-        "FIREBASE_PRIVATE_KEY_ID",
-        "FIREBASE_PRIVATE_KEY",
-        "FIREBASE_CLIENT_EMAIL",
-        "FIREBASE_CLIENT_ID",
-        "FIREBASE_CLIENT_X509_CERT_URL",
-        "FIREBASE_TYPE",
-        "FIREBASE_AUTH_URI",
-        "FIREBASE_TOKEN_URI",
-        "FIREBASE_AUTH_PROVIDER_X509_CERT_URL",
-    ]
-
-    # Check if all required environment variables are present
-    missing_vars = [var for var in required_env_vars if not os.getenv(var)]
-    if missing_vars:
-        print(f"Missing required environment variables: {', '.join(missing_vars)}")
-        print("Please set these variables in your Render environment settings")
-        raise ValueError(
-            f"Missing required environment variables: {', '.join(missing_vars)}"
-        )
+if os.getenv("FIRESTORE_BACKEND") == "memory":
+    # Local development and tests: no credentials, nothing leaves the process
+    print("Using in-memory Firestore (FIRESTORE_BACKEND=memory)")
+    db = InMemoryFirestore()
+else:
+    try:
+        # Try to use environment variables first
+        required_env_vars = [
+            "FIREBASE_PROJECT_ID",
+            "FIREBASE_PRIVATE_KEY_ID",
+            "FIREBASE_PRIVATE_KEY",
+            "FIREBASE_CLIENT_EMAIL",
+            "FIREBASE_CLIENT_ID",
+            "FIREBASE_CLIENT_X509_CERT_URL",
+            "FIREBASE_TYPE",
+            "FIREBASE_AUTH_URI",
+            "FIREBASE_TOKEN_URI",
+            "FIREBASE_AUTH_PROVIDER_X509_CERT_URL",
+        ]
+
+        # Check if all required environment variables are present
+        missing_vars = [var for var in required_env_vars if not os.getenv(var)]
+        if missing_vars:
+            print(f"Missing required environment variables: {', '.join(missing_vars)}")
+            print("Please set these variables in your Render environment settings")
+            raise ValueError(
+                f"Missing required environment variables: {', '.join(missing_vars)}"
+            )
 
-    cred_dict = {
-        "type": os.getenv("FIREBASE_TYPE"),
-        "project_id": os.getenv("FIREBASE_PROJECT_ID"),
-        "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
-        "private_key": os.getenv("FIREBASE_PRIVATE_KEY", "").replace("\\n", "\n"),
-        "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
-        "client_id": os.getenv("FIREBASE_CLIENT_ID"),
-        "auth_uri": os.getenv("FIREBASE_AUTH_URI"),
-        "token_uri": os.getenv("FIREBASE_TOKEN_URI"),
-        "auth_provider_x509_cert_url": os.getenv(
-            "FIREBASE_AUTH_PROVIDER_X509_CERT_URL"
-        ),
-        "client_x509_cert_url": os.getenv("FIREBASE_CLIENT_X509_CERT_URL"),
-    }
+        cred_dict = {
+            "type": os.getenv("FIREBASE_TYPE"),
+            "project_id": os.getenv("FIREBASE_PROJECT_ID"),
+            "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
+            "private_key": os.getenv("FIREBASE_PRIVATE_KEY", "").replace("\\n", "\n"),
+            "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
+            "client_id": os.getenv("FIREBASE_CLIENT_ID"),
+            "auth_uri": os.getenv("FIREBASE_AUTH_URI"),
+            "token_uri": os.getenv("FIREBASE_TOKEN_URI"),
+            "auth_provider_x509_cert_url": os.getenv(
+                "FIREBASE_AUTH_PROVIDER_X509_CERT_URL"
+            ),
+            "client_x509_cert_url": os.getenv("FIREBASE_CLIENT_X509_CERT_URL"),
+        }
 
-    # Add universe_domain if it exists
-    if os.getenv("FIREBASE_UNIVERSE_DOMAIN"):
-        cred_dict["universe_domain"] = os.getenv("FIREBASE_UNIVERSE_DOMAIN")
+        # Add universe_domain if it exists
+        if os.getenv("FIREBASE_UNIVERSE_DOMAIN"):
+            cred_dict["universe_domain"] = os.getenv("FIREBASE_UNIVERSE_DOMAIN")
 
-    print("Initializing Firebase with credentials...")
-    cred = credentials.Certificate(cred_dict)
-    firebase_admin.initialize_app(cred)
-    db = firestore.client()
-    print("Firebase initialized successfully with environment variables")
+        print("Initializing Firebase with credentials...")
+        cred = credentials.Certificate(cred_dict)
+        firebase_admin.initialize_app(cred)
+        db = firestore.client()
+        print("Firebase initialized successfully with environment variables")
+
+    except Exception as e:
+        print(f"Error initializing Firebase: {str(e)}")
+        print(
+            "Please make sure all required environment variables are set in your Render environment settings"
+        )
+        raise
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Parse the Orange Book once so requests don't pay for it
+    await run_in_threadpool(preload_orange_book)
+    # Keep warm browser sessions for DrugBank instead of one Chrome per drug
+    await run_in_threadpool(start_driver_pool)
+    yield
+    await job_queue.shutdown()
+    await close_clients()
+    await run_in_threadpool(shutdown_driver_pool)
 
-except Exception as e:
-    print(f"Error initializing Firebase: {str(e)}")
-    print(
-        "Please make sure all required environment variables are set in your Render environment settings"
-    )
-    raise
 
-app = FastAPI(title="Medication Scraper API")
+app = FastAPI(title="Medication Scraper API", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -101,106 +133,235 @@ app.add_middleware(
 class MedicationRequest(BaseModel):
     medications: List[str]
     run_id: Optional[str] = None  # Optional run ID for tracking multiple scraping runs
+    wait: bool = False  # Block until the run finishes (previous behaviour)
 
 
-# Use api_route to explicitly allow POST and OPTIONS methods
-@app.api_route("/scrape-medications", methods=["POST", "OPTIONS"])
-async def scrape_and_store_medications(request: MedicationRequest):
-    # This check is usually not needed when CORS is properly configured with OPTIONS allowed
-    # but we can keep it for robustness if needed.
-    # if request.method == "OPTIONS":
-    #    return {"message": "OK"}
+async def run_scrape_job(job: ScrapeJob) -> dict:
+    """Scrape a run's medications, writing results to Firestore as they arrive"""
+    print(f"\nStarting scrape run {job.run_id}: {job.medications}")
+    writer = ScrapeRunWriter(
+        db, job.run_id, job.created_at, job.medications, timings=RunTimings()
+    )
+    await writer.start()
+
+    with track_summary_usage() as summary_usage, track_run_timings(writer.timings):
+        try:
+            async for _, record in iter_scrape_medications(
+                job.medications, on_progress=job.update_medication
+            ):
+                writer.add(record)
+        except BaseException as e:
+            # Keep what was scraped so far and mark the run as failed
+            await writer.finish(summary_usage.as_dict(), error=str(e) or repr(e))
+            raise
+    return await finish_scrape_run(writer, summary_usage)
+
+
+async def finish_scrape_run(
+    writer: ScrapeRunWriter, summary_usage: SummaryUsage
+) -> dict:
+    """Flush a run's remaining records and report how it went"""
+    print(f"Summarization usage: {summary_usage.as_dict()}")
+    if writer.timings is not None:
+        print(f"Stage timings: {writer.timings.as_dict()}")
+    outcome = await writer.finish(summary_usage.as_dict())
+    print(
+        f"Scraper completed. Stored {outcome['medications_scraped']} medications, "
+        f"{outcome['medications_failed']} failed."
+    )
 
-    try:
-        print(f"\nReceived request to scrape medications: {request.medications}")
-
-        # Generate a unique run ID if not provided
-        run_id = request.run_id or str(uuid.uuid4())
-        timestamp = datetime.utcnow()
-
-        # Run the synchronous scraper in a background thread
-        print("Starting scraper in background thread...")
-        results = await run_in_threadpool(scrape_medications, request.medications)
-        print(f"Scraper completed. Got {len(results)} results.")
-
-        if not results:
-            raise HTTPException(
-                status_code=500,
-                detail={
-                    "error": "No data was scraped",
-                    "medications": request.medications,
-                },
-            )
+    if not writer.written and not writer.failed_results and not writer.write_errors:
+        raise ScrapeRunError(
+            {
+                "error": "No data was scraped",
+                "medications": writer.medications,
+            }
+        )
+    if outcome["status"] == "failed":
+        raise ScrapeRunError(
+            {
+                "error": outcome["error"] or "All medication scraping attempts failed",
+                "medications": writer.medications,
+                "medications_scraped": outcome["medications_scraped"],
+                "failed_results": writer.failed_results,
+            }
+        )
+
+    return {
+        "message": f"Successfully scraped and stored {len(writer.written)} medications",
+        "medications_scraped": outcome["medications_scraped"],
+        "medications_failed": outcome["medications_failed"],
+        "medications_created": outcome["medications_created"],
+        "medications_updated": outcome["medications_updated"],
+        "medications_unchanged": outcome["medications_unchanged"],
+        "failed_results": writer.failed_results,
+        "medications": writer.written,
+    }
 
-        # Filter out any results that have errors
-        valid_results = [r for r in results if "error" not in r]
-        failed_results = [r for r in results if "error" in r]
 
-        if not valid_results:
-            error_details = {
-                "error": "All medication scraping attempts failed",
-                "medications": request.medications,
-                "failed_results": failed_results,
-            }
-            raise HTTPException(status_code=500, detail=error_details)
+job_queue = JobQueue(run_scrape_job)
 
-        # Store results in Firestore
-        print("Storing results in Firestore...")
-        batch = db.batch()
 
-        # Create a run metadata document
-        run_metadata = {
+# Use api_route to explicitly allow POST and OPTIONS methods
+@app.api_route("/scrape-medications", methods=["POST", "OPTIONS"], status_code=202)
+async def scrape_and_store_medications(request: MedicationRequest, response: Response):
+    """
+    Queue a scrape run and return its run_id right away. Poll
+    /scrape-medications/status/{run_id} for progress, or pass "wait": true
+    to block until the run has finished.
+    """
+    print(f"\nReceived request to scrape medications: {request.medications}")
+
+    # Generate a unique run ID if not provided
+    run_id = request.run_id or str(uuid.uuid4())
+    try:
+        job = job_queue.submit(run_id, request.medications)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail={"error": str(e)})
+
+    if not request.wait:
+        return {
+            "status": "accepted",
             "run_id": run_id,
-            "timestamp": timestamp,
-            "medications_requested": request.medications,
-            "medications_scraped": len(valid_results),
-            "medications_failed": len(results) - len(valid_results),
-            "status": "completed",
+            "timestamp": job.created_at.isoformat(),
+            "status_url": f"/scrape-medications/status/{run_id}",
         }
-        run_doc_ref = db.collection("scraping_runs").document(run_id)
-        batch.set(run_doc_ref, run_metadata)
 
-        for medication_data in valid_results:
-            # Add metadata to each medication record
-            medication_data.update(
-                {"scraped_at": timestamp, "run_id": run_id, "source": "admin_portal"}
-            )
+    await job.done.wait()
+    response.status_code = 200
+    if job.status != "completed":
+        raise HTTPException(
+            status_code=500,
+            detail={
+                **job.error,
+                "medications": request.medications,
+                "timestamp": datetime.utcnow().isoformat(),
+            },
+        )
+    return {
+        "status": "success",
+        "message": job.result["message"],
+        "run_id": run_id,
+        "timestamp": job.created_at.isoformat(),
+        "medications": job.result["medications"],
+    }
+
 
-            # Use an auto-generated document reference for draft_medications
-            doc_ref = db.collection("draft_medications").document()
-            # Ensure name field exists for querying and identification
-            medication_data["name"] = medication_data.get("name", "Unknown Medication")
-            batch.set(doc_ref, medication_data)
-            print(
-                f"Added medication with ID {doc_ref.id} (Name: {medication_data['name']}) to batch"
+def format_stream_event(event: str, data: dict, sse: bool) -> str:
+    """Encode one streamed event as Server-Sent Events or NDJSON"""
+    payload = json.dumps(data, default=str)
+    if sse:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return json.dumps({"event": event, **data}, default=str) + "\n"
+
+
+@app.post("/scrape-medications/stream")
+async def stream_scrape_medications(payload: MedicationRequest, request: Request):
+    """
+    Scrape medications and stream each record as soon as it is ready,
+    followed by a run summary once the results are stored in Firestore.
+    Responds with Server-Sent Events when the client accepts
+    text/event-stream, NDJSON otherwise.
+    """
+    print(f"\nReceived streaming request for medications: {payload.medications}")
+    run_id = payload.run_id or str(uuid.uuid4())
+    timestamp = datetime.utcnow()
+    sse = "text/event-stream" in request.headers.get("accept", "")
+
+    async def events():
+        # Streamed runs count against the same bound as queued ones
+        async with job_queue.run_slot():
+            writer = ScrapeRunWriter(
+                db, run_id, timestamp, payload.medications, timings=RunTimings()
             )
+            await writer.start()
+            with track_summary_usage() as summary_usage, track_run_timings(
+                writer.timings
+            ):
+                try:
+                    async for index, record in iter_scrape_medications(
+                        payload.medications
+                    ):
+                        writer.add(record)
+                        yield format_stream_event(
+                            "medication",
+                            {
+                                "run_id": run_id,
+                                "index": index,
+                                "name": payload.medications[index],
+                                "status": (
+                                    "failed" if "error" in record else "completed"
+                                ),
+                                "record": record,
+                            },
+                            sse,
+                        )
+                except BaseException as e:
+                    # Client went away or the scraper crashed; keep what was written
+                    await writer.finish(
+                        summary_usage.as_dict(), error=str(e) or repr(e)
+                    )
+                    raise
+
+            summary = {"run_id": run_id, "timestamp": timestamp.isoformat()}
+            try:
+                result = await finish_scrape_run(writer, summary_usage)
+                summary.update(
+                    status="completed",
+                    message=result["message"],
+                    medications_scraped=result["medications_scraped"],
+                    medications_failed=result["medications_failed"],
+                )
+            except ScrapeRunError as e:
+                summary.update(status="failed", **e.details)
+            except Exception as e:
+                print(f"Error storing streamed run {run_id}: {e}")
+                summary.update(status="failed", error=str(e))
+            yield format_stream_event("summary", summary, sse)
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type)
+
+
+@app.get("/scrape-medications/status/{run_id}")
+async def scrape_status(run_id: str):
+    """Progress of a scrape run, falling back to Firestore for older runs"""
+    job = job_queue.get(run_id)
+    if job is not None:
+        status = job.to_dict()
+        if status["result"]:
+            # Full records are in Firestore; keep the status payload small
+            status["result"] = {
+                k: v for k, v in status["result"].items() if k != "medications"
+            }
+        return status
 
-        # Commit the batch
-        print("Committing batch to Firestore...")
-        batch.commit()
-        print("Batch committed successfully")
+    run_doc = await run_in_threadpool(
+        db.collection("scraping_runs").document(run_id).get
+    )
+    if not run_doc.exists:
+        raise HTTPException(status_code=404, detail={"error": "Unknown run_id"})
+    return run_doc.to_dict()
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit rates of the upstream response, summary and negative-result caches"""
+    return {
+        "responses": response_cache.stats() if response_cache else None,
+        "summaries": summary_cache.stats() if summary_cache else None,
+        "not_found": negative_cache.stats() if negative_cache else None,
+    }
 
-        # # Save results locally to a JSON file
-        # print("Saving results locally...")
-        # with open("medication_data.json", "w") as f:
-        #     json.dump(results, f, indent=2)
-        # print("Results saved locally")
 
-        return {
-            "status": "success",
-            "message": f"Successfully scraped and stored {len(valid_results)} medications",
-            "run_id": run_id,
-            "timestamp": timestamp.isoformat(),
-            "medications": valid_results,
-        }
-    except Exception as e:
-        print(f"Error in scrape_and_store_medications: {str(e)}")
-        error_details = {
-            "error": str(e),
-            "medications": request.medications,
-            "timestamp": datetime.utcnow().isoformat(),
-        }
-        raise HTTPException(status_code=500, detail=error_details)
+# Cache hit rates are read from the caches whenever /metrics is scraped
+REGISTRY.register(CacheStatsCollector(response_cache, summary_cache, negative_cache))
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage latencies, retries and cache hit rates"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
 @app.get("/")
@@ -208,9 +369,6 @@ async def root():
     return {"message": "Medication Scraper API is running"}
 
 
-# IMPORTANT: You still need to implement the /scrape-medications/status/{run_id} endpoint
-# for your Flutter app to be able to poll for scraping progress.
-
 if __name__ == "__main__":
     import uvicorn
 
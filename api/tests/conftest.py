@@ -0,0 +1,60 @@
+"""
+Shared test setup: openFDA, RxNav, DrugBank and OpenRouter are replaced by
+the local stubs from benchmarks/stub_upstream.py, and Firestore by the
+in-memory fake, so the suite never leaves the machine.
+
+Data_Script reads its configuration at import time, so the environment is
+set here, before any test module imports it.
+"""
+
+import os
+import sys
+
+import pytest
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [API_DIR, os.path.join(API_DIR, "benchmarks")]
+
+from stub_upstream import CAPTURES_PATH, per_upstream, start_stubs  # noqa: E402
+
+TEST_ENV = {
+    "RESPONSE_CACHE_ENABLED": "0",
+    "SUMMARY_CACHE_ENABLED": "0",
+    "NEGATIVE_CACHE_ENABLED": "0",
+    "NAME_RESOLVER": "off",
+    "RXNORM_SOURCE": "live",
+    "OPENFDA_SOURCE": "live",
+    "OPENROUTER_API_KEY": "test",
+    "DEFAULT_RATE_LIMIT": "1000000",
+    "OPENROUTER_REQUESTS_PER_SECOND": "1000000",
+    "OPENROUTER_BURST": "1000000",
+    "SUMMARY_MAX_RETRIES": "0",
+    "UPSTREAM_BACKOFF_BASE": "0",
+    "FIRESTORE_RETRY_BACKOFF": "0",
+}
+os.environ.update(TEST_ENV)
+STUBS = start_stubs(per_upstream(None, 0.0), per_upstream(None, 0.0), CAPTURES_PATH)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    for stub in STUBS.values():
+        stub.stop()
+
+
+@pytest.fixture
+def stubs(monkeypatch):
+    """The running stubs; injected errors, counts and circuits reset afterwards"""
+    from Data_Script import working
+    from Data_Script.resilience import circuit_breakers
+
+    # A failed stub page must never launch Chrome
+    monkeypatch.setattr(
+        working,
+        "get_drugbank_info",
+        lambda medication: {"metabolism": "N/A", "route_of_elimination": "N/A"},
+    )
+    yield STUBS
+    for stub in STUBS.values():
+        stub.error_rate = 0.0
+        stub.reset_counts()
+    circuit_breakers._breakers.clear()
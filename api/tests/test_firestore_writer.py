@@ -0,0 +1,126 @@
+import asyncio
+from datetime import datetime
+
+from Data_Script.firestore_fake import InMemoryFirestore
+from Data_Script.firestore_writer import ScrapeRunWriter, content_hash
+
+
+def record(name, **fields):
+    return {"name": name, "application_number": "NDA000001", **fields}
+
+
+def run(db, records, run_id="run-1", **writer_options):
+    async def write():
+        writer = ScrapeRunWriter(
+            db,
+            run_id,
+            datetime.utcnow(),
+            [r["name"] for r in records],
+            **writer_options,
+        )
+        await writer.start()
+        for r in records:
+            writer.add(dict(r))
+        return await writer.finish()
+
+    return asyncio.run(write())
+
+
+def run_doc(db, run_id="run-1"):
+    return db.collection("scraping_runs").document(run_id).get().to_dict()
+
+
+def test_duplicate_doc_ids_in_a_chunk_count_once():
+    db = InMemoryFirestore()
+    outcome = run(db, [record("Abilify", x=1), record("abilify", x=2)])
+
+    assert outcome["medications_scraped"] == 1
+    assert run_doc(db)["medications_scraped"] == 1
+    (doc,) = [d.to_dict() for d in db.collection("draft_medications").stream()]
+    assert doc["x"] == 2  # the later duplicate wins
+
+
+def stored(db):
+    return {d.id: d.to_dict() for d in db.collection("draft_medications").stream()}
+
+
+def test_records_are_chunked_under_the_batch_limit():
+    db = InMemoryFirestore()
+    records = [record(f"Drug{i}", application_number=f"NDA{i:06d}") for i in range(5)]
+    outcome = run(db, records, batch_size=2, flush_interval=0)
+
+    assert outcome["medications_scraped"] == 5
+    assert run_doc(db)["chunks_committed"] == 3
+    assert len(stored(db)) == 5
+
+
+def test_repeat_runs_only_write_what_changed():
+    db = InMemoryFirestore()
+    first = [record("Abilify", x=1, dropped="old"), record("Ambien", y=1)]
+    run(db, first, run_id="run-1")
+
+    second = [record("Abilify", x=2), record("Ambien", y=1)]
+    outcome = run(db, second, run_id="run-2")
+
+    assert (
+        outcome["medications_created"],
+        outcome["medications_updated"],
+        outcome["medications_unchanged"],
+    ) == (0, 1, 1)
+    docs = stored(db)
+    abilify = docs["abilify__nda000001"]
+    assert abilify["x"] == 2 and "dropped" not in abilify
+    assert abilify["run_id"] == "run-2"
+
+
+def test_content_hash_ignores_run_metadata_and_key_order():
+    a = {"name": "Abilify", "x": 1, "scraped_at": 1, "run_id": "a"}
+    b = {"run_id": "b", "x": 1, "name": "Abilify", "scraped_at": 2}
+    assert content_hash(a) == content_hash(b)
+    assert content_hash(a) != content_hash({**a, "x": 2})
+
+
+def test_transient_commit_errors_are_retried():
+    db = InMemoryFirestore()
+    db.fail_next_commits(2)
+    outcome = run(db, [record("Abilify")], max_retries=3, retry_backoff=0)
+
+    assert outcome["status"] == "completed"
+    assert outcome["medications_scraped"] == 1
+    assert run_doc(db)["medications_scraped"] == 1
+
+
+def test_run_fails_when_a_chunk_cannot_be_written():
+    db = InMemoryFirestore()
+    db.fail_next_commits(10)
+    outcome = run(db, [record("Abilify")], max_retries=1, retry_backoff=0)
+
+    assert outcome["status"] == "failed"
+    assert "failed to commit" in outcome["error"]
+    assert stored(db) == {}
+    assert run_doc(db)["status"] == "failed"
+
+
+def test_failed_records_are_counted_but_not_stored():
+    db = InMemoryFirestore()
+    outcome = run(db, [record("Abilify"), {"name": "Nosuchdrug", "error": "x"}])
+
+    assert (outcome["medications_scraped"], outcome["medications_failed"]) == (1, 1)
+    assert run_doc(db)["medications_failed"] == 1
+    assert list(stored(db)) == ["abilify__nda000001"]
+
+
+def test_partial_chunks_are_flushed_after_the_interval():
+    async def main():
+        db = InMemoryFirestore()
+        writer = ScrapeRunWriter(
+            db, "run-1", datetime.utcnow(), ["Abilify"], flush_interval=0.05
+        )
+        await writer.start()
+        writer.add(record("Abilify"))
+        await asyncio.sleep(0.2)
+        written_before_finish = len(stored(db))
+        await writer.finish()
+        return written_before_finish
+
+    assert asyncio.run(main()) == 1
@@ -0,0 +1,46 @@
+import asyncio
+
+from Data_Script.jobs import JobQueue, ScrapeRunError
+
+
+def test_runs_are_bounded_and_report_their_outcome():
+    active, peak = 0, 0
+
+    async def handler(job):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        if job.run_id == "bad":
+            raise ScrapeRunError({"error": "nothing stored"})
+        return {"message": "ok"}
+
+    async def main():
+        queue = JobQueue(handler, max_concurrent_runs=2)
+        jobs = [queue.submit(run_id, []) for run_id in ("a", "b", "c", "bad")]
+        await asyncio.gather(*(job.done.wait() for job in jobs))
+        return jobs
+
+    jobs = asyncio.run(main())
+    assert peak == 2
+    assert [job.status for job in jobs] == ["completed"] * 3 + ["failed"]
+    assert jobs[-1].error == {"error": "nothing stored"}
+
+
+def test_shutdown_marks_running_and_queued_runs_cancelled():
+    async def handler(job):
+        await asyncio.sleep(60)
+
+    async def main():
+        queue = JobQueue(handler, max_concurrent_runs=1)
+        running, queued = queue.submit("running", []), queue.submit("queued", [])
+        await asyncio.sleep(0)
+        assert (running.status, queued.status) == ("running", "queued")
+        await queue.shutdown()
+        return running, queued
+
+    for job in asyncio.run(main()):
+        assert job.status == "cancelled"
+        assert job.done.is_set()
+        assert job.to_dict()["error"]
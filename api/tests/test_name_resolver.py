@@ -0,0 +1,53 @@
+import pytest
+
+from Data_Script.name_resolver import NameIndex
+
+NAMES = [
+    "ABILIFY",
+    "aripiprazole",
+    "Atorvastatin Calcium",
+    "Ambien",
+    "Ambien CR",
+    "Celexa",
+    "Cerexa",
+]
+
+
+@pytest.fixture
+def index():
+    return NameIndex(NAMES)
+
+
+def test_exact_matches_keep_the_typed_spelling(index):
+    resolution = index.resolve(" abilify ")
+    assert (resolution.name, resolution.match) == ("abilify", "exact")
+
+
+def test_words_of_a_known_name_pass_as_partial(index):
+    resolution = index.resolve("atorvastatin")
+    assert (resolution.name, resolution.match) == ("atorvastatin", "partial")
+
+
+def test_an_unambiguous_typo_gets_a_correction(index):
+    resolution = index.resolve("aripiprazol")
+    assert resolution.match == "unknown"
+    assert resolution.name == "aripiprazol"
+    assert resolution.correction == "Aripiprazole"
+
+
+def test_a_typo_clearly_closest_to_one_name_gets_a_correction(index):
+    resolution = index.resolve("Ambienn")
+    assert resolution.suggestions[:2] == ["Ambien", "Ambien CR"]
+    assert resolution.correction == "Ambien"
+
+
+def test_a_typo_between_close_names_only_gets_suggestions(index):
+    resolution = index.resolve("Cecexa")
+    assert resolution.match == "unknown"
+    assert resolution.correction is None
+    assert sorted(resolution.suggestions[:2]) == ["Celexa", "Cerexa"]
+
+
+def test_blank_names_are_unresolved(index):
+    resolution = index.resolve("  ")
+    assert (resolution.name, resolution.match) == (None, "unresolved")
@@ -0,0 +1,30 @@
+import time
+
+from Data_Script.negative_cache import NegativeCache
+
+
+def test_misses_are_matched_by_normalized_name(tmp_path):
+    cache = NegativeCache(str(tmp_path / "negative.sqlite3"), ttl=60)
+    cache.record("drugsfda", "Nosuchdrug")
+
+    assert cache.is_missing("drugsfda", "  NOSUCHDRUG ")
+    assert not cache.is_missing("rxnav", "Nosuchdrug")
+    assert cache.stats()["drugsfda"] == {"hit": 1, "miss": 0, "stored": 1}
+
+
+def test_misses_persist_across_instances(tmp_path):
+    path = str(tmp_path / "negative.sqlite3")
+    NegativeCache(path, ttl=60).record("drugsfda", "Nosuchdrug")
+
+    assert NegativeCache(path, ttl=60).is_missing("drugsfda", "Nosuchdrug")
+
+
+def test_misses_expire_after_the_ttl(tmp_path, monkeypatch):
+    path = str(tmp_path / "negative.sqlite3")
+    cache = NegativeCache(path, ttl=60)
+    cache.record("drugsfda", "Nosuchdrug")
+
+    later = time.time() + 61
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert not cache.is_missing("drugsfda", "Nosuchdrug")
+    assert not NegativeCache(path, ttl=60).is_missing("drugsfda", "Nosuchdrug")
@@ -0,0 +1,99 @@
+import asyncio
+
+import httpx
+
+from Data_Script import openfda_bulk
+from Data_Script.openfda_bulk import build_or_queries, demux
+
+URL = "https://api.fda.gov/drug/drugsfda.json"
+
+
+def result(*brand_names):
+    return {"openfda": {"brand_name": list(brand_names)}}
+
+
+def test_exact_match_wins_over_an_earlier_partial_one():
+    maintena = result("ABILIFY MAINTENA")
+    abilify = result("ABILIFY")
+    matches = demux([maintena, abilify], "brand_name", ["Abilify", "abilify maintena"])
+
+    assert matches == {"abilify": abilify, "abilify maintena": maintena}
+
+
+def test_partial_match_is_used_when_nothing_matches_exactly():
+    mycite = result("ABILIFY MYCITE")
+    matches = demux([mycite], "brand_name", ["Abilify", "Ambien"])
+
+    assert matches == {"abilify": mycite, "ambien": None}
+
+
+def test_partial_matches_need_whole_words():
+    assert demux([result("AMBIENCE")], "brand_name", ["Ambien"]) == {"ambien": None}
+
+
+def test_or_queries_respect_the_term_and_length_limits():
+    names = [f"Drug{i}" for i in range(7)]
+    assert [len(c) for c in build_or_queries("openfda.brand_name", names, 3)] == [
+        3,
+        3,
+        1,
+    ]
+    chunks = build_or_queries("openfda.brand_name", names, 25, 60)
+    assert [name for chunk in chunks for name in chunk] == names
+    assert all(len(" ".join(f'f:"{n}"' for n in chunk)) <= 60 for chunk in chunks)
+
+
+def fake_openfda(monkeypatch, results, total=None):
+    """Serve results one per page, as openFDA would with limit=1"""
+    requests = []
+
+    async def cached_get(url, params):
+        requests.append(params)
+        skip, limit = params["skip"], params["limit"]
+        page = results[skip : skip + limit]
+        if not page:
+            return httpx.Response(404, request=httpx.Request("GET", url))
+        body = {
+            "meta": {"results": {"total": total or len(results)}},
+            "results": page,
+        }
+        return httpx.Response(200, json=body, request=httpx.Request("GET", url))
+
+    monkeypatch.setattr(openfda_bulk, "cached_get", cached_get)
+    return requests
+
+
+def test_paging_stops_once_every_name_matches_exactly(monkeypatch):
+    requests = fake_openfda(
+        monkeypatch,
+        [result("ABILIFY MAINTENA"), result("ABILIFY"), result("AMBIEN")],
+    )
+    found = asyncio.run(
+        openfda_bulk._query_chunk(URL, "brand_name", ["Abilify", "Abilify Maintena"], 1)
+    )
+
+    assert len(requests) == 2
+    assert found["abilify"] == result("ABILIFY")
+
+
+def test_names_without_an_exact_match_are_dropped_from_cut_off_queries(monkeypatch):
+    monkeypatch.setattr(openfda_bulk, "OPENFDA_BULK_MAX_PAGES", 2)
+    fake_openfda(
+        monkeypatch,
+        [result("ABILIFY MAINTENA"), result("AMBIEN"), result("ABILIFY")],
+    )
+    found = asyncio.run(
+        openfda_bulk._query_chunk(URL, "brand_name", ["Abilify", "Ambien"], 1)
+    )
+
+    # The exact Abilify result was on a page that was never read
+    assert found == {"ambien": result("AMBIEN")}
+
+
+def test_names_missing_from_a_fully_read_query_map_to_none(monkeypatch):
+    fake_openfda(monkeypatch, [result("AMBIEN")])
+    found = asyncio.run(
+        openfda_bulk.bulk_lookup(URL, "brand_name", ["Ambien", "Nosuchdrug", "N/A"], 1)
+    )
+
+    assert found == {"ambien": result("AMBIEN"), "nosuchdrug": None}
@@ -0,0 +1,75 @@
+import json
+import os
+
+import pytest
+
+from Data_Script.openfda_mirror import OpenFDAMirror
+
+
+@pytest.fixture
+def dump_dir(tmp_path):
+    path = tmp_path / "dump"
+    path.mkdir()
+    return path
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    return OpenFDAMirror(str(tmp_path / "mirror.sqlite3"))
+
+
+def write_partition(dump_dir, name, records):
+    with open(dump_dir / name, "w") as f:
+        json.dump({"meta": {}, "results": records}, f)
+
+
+def drugsfda(application_number, brand_name):
+    return {
+        "application_number": application_number,
+        "openfda": {"brand_name": [brand_name]},
+    }
+
+
+def name_rows(mirror, record_id):
+    return mirror._conn.execute(
+        "SELECT kind, name FROM names WHERE record_id = ?", (record_id,)
+    ).fetchall()
+
+
+def test_record_moving_between_partitions_keeps_one_set_of_names(mirror, dump_dir):
+    first, second = "drug-drugsfda-0001-of-0002.json", "drug-drugsfda-0002-of-0002.json"
+    write_partition(dump_dir, first, [drugsfda("NDA1", "Foo")])
+    write_partition(dump_dir, second, [])
+    mirror.refresh(str(dump_dir))
+
+    write_partition(dump_dir, second, [drugsfda("NDA1", "Foo")])
+    os.utime(dump_dir / second, (1, 1))  # changed size/mtime: re-ingested
+    mirror.refresh(str(dump_dir))
+
+    assert sorted(name_rows(mirror, "NDA1")) == [
+        ("application", "nda1"),
+        ("brand", "foo"),
+    ]
+
+
+def test_removed_partitions_are_pruned(mirror, dump_dir):
+    name = "drug-drugsfda-0001-of-0001.json"
+    write_partition(dump_dir, name, [drugsfda("NDA1", "Foo")])
+    mirror.refresh(str(dump_dir))
+    os.remove(dump_dir / name)
+    mirror.refresh(str(dump_dir))
+
+    assert mirror.drugsfda_by_brand("Foo") is None
+    assert mirror.stats() == {}
+
+
+def test_like_wildcards_match_literally(mirror, dump_dir):
+    write_partition(
+        dump_dir,
+        "drug-drugsfda-0001-of-0001.json",
+        [drugsfda("NDA1", "Foo 100% Plus"), drugsfda("NDA2", "FooXBar")],
+    )
+    mirror.refresh(str(dump_dir))
+
+    assert mirror.drugsfda_by_brand("foo_bar") is None
+    assert mirror.drugsfda_by_brand("100%")["application_number"] == "NDA1"
@@ -0,0 +1,68 @@
+import os
+import shutil
+
+import pytest
+
+from Data_Script.orange_book import (
+    EXCLUSIVITY_FILE,
+    ORANGE_BOOK_DIR,
+    PATENT_FILE,
+    OrangeBookIndex,
+    read_columns,
+)
+from Data_Script.orange_book_snapshot import OrangeBookSnapshot, build_snapshot
+
+LOOKUPS = ("patents", "exclusivities", "products", "summary")
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    path = tmp_path / "Orange_Data"
+    path.mkdir()
+    for name in (PATENT_FILE, EXCLUSIVITY_FILE):
+        shutil.copy(os.path.join(ORANGE_BOOK_DIR, name), path / name)
+    return str(path)
+
+
+def application_numbers(data_dir):
+    numbers = set()
+    for name in (PATENT_FILE, EXCLUSIVITY_FILE):
+        numbers.update(
+            app for (app,) in read_columns(os.path.join(data_dir, name), ("Appl_No",))
+        )
+    return sorted(numbers)
+
+
+def test_snapshot_matches_the_text_index(data_dir, tmp_path):
+    snapshot_path = str(tmp_path / "orange_book.snap")
+    build_snapshot(data_dir, snapshot_path)
+    index = OrangeBookIndex(data_dir)
+    snapshot = OrangeBookSnapshot(snapshot_path, data_dir=data_dir)
+
+    apps = application_numbers(data_dir)
+    assert apps
+    for app_no in apps + ["999999", "not-a-number", ""]:
+        for lookup in LOOKUPS:
+            assert getattr(snapshot, lookup)(app_no) == getattr(index, lookup)(
+                app_no
+            ), (lookup, app_no)
+
+
+def test_a_stale_snapshot_is_rebuilt_before_it_is_mapped(data_dir, tmp_path):
+    snapshot_path = str(tmp_path / "orange_book.snap")
+    build_snapshot(data_dir, snapshot_path)
+    patent_path = os.path.join(data_dir, PATENT_FILE)
+    with open(patent_path, "a") as f:
+        f.write("\nN~999998~001~1234567~Jan 01, 2040~~~~~\n")
+    # Backdate the snapshot so the edit is newer even on coarse-grained clocks
+    stat = os.stat(patent_path)
+    os.utime(snapshot_path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10**9))
+
+    snapshot = OrangeBookSnapshot(snapshot_path, data_dir=data_dir)
+    assert snapshot.is_stale()
+    snapshot.load()
+
+    assert not snapshot.is_stale()
+    assert snapshot.patents("999998") == [
+        {"patent_number": "1234567", "expiration_date": "Jan 01, 2040"}
+    ]
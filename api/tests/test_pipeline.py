@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from Data_Script.pipeline import Pipeline, Stage, StageFailed
+
+
+def stage(name, requires=(), delay=0.0, log=None, result=None):
+    async def run(context):
+        if log is not None:
+            log.append(("start", name))
+        await asyncio.sleep(delay)
+        if log is not None:
+            log.append(("end", name))
+        return result if result is not None else name
+
+    return Stage(name, run, requires)
+
+
+def test_stages_start_once_their_requirements_finish():
+    log = []
+    pipeline = Pipeline(
+        [
+            stage("fetch", log=log, delay=0.01),
+            stage("classes", ("fetch",), log=log, delay=0.02),
+            stage("label", ("fetch",), log=log, delay=0.02),
+            stage("summary", ("label",), log=log),
+        ]
+    )
+    results = asyncio.run(pipeline.run({}))
+
+    assert results == {n: n for n in ("fetch", "classes", "label", "summary")}
+    started = [name for event, name in log if event == "start"]
+    assert started[0] == "fetch"
+    # Independent stages overlap instead of running one after the other
+    assert log.index(("start", "label")) < log.index(("end", "classes"))
+    assert log.index(("end", "label")) < log.index(("start", "summary"))
+
+
+def test_stages_see_inputs_and_earlier_results():
+    async def double(context):
+        return context["fetch"] * context["factor"]
+
+    pipeline = Pipeline(
+        [stage("fetch", result=21), Stage("double", double, ("fetch",))]
+    )
+    assert asyncio.run(pipeline.run({"factor": 2}))["double"] == 42
+
+
+def test_a_failed_stage_cancels_siblings_and_skips_dependents():
+    log = []
+    cancelled = []
+
+    async def boom(context):
+        raise RuntimeError("no record")
+
+    async def slow(context):
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append("slow")
+            raise
+
+    pipeline = Pipeline(
+        [
+            Stage("boom", boom),
+            Stage("slow", slow),
+            stage("after", ("boom",), log=log),
+        ]
+    )
+    with pytest.raises(StageFailed) as excinfo:
+        asyncio.run(pipeline.run({}))
+
+    assert excinfo.value.stage == "boom"
+    assert isinstance(excinfo.value.error, RuntimeError)
+    assert cancelled == ["slow"]
+    assert log == []
+
+
+@pytest.mark.parametrize(
+    "stages",
+    [
+        [stage("a"), stage("a")],
+        [stage("a", ("missing",))],
+        [stage("a", ("b",)), stage("b", ("a",))],
+    ],
+)
+def test_invalid_graphs_are_rejected(stages):
+    with pytest.raises(ValueError):
+        Pipeline(stages)
+
+
+def test_inputs_may_not_shadow_stages():
+    with pytest.raises(ValueError):
+        asyncio.run(Pipeline([stage("fetch")]).run({"fetch": 1}))
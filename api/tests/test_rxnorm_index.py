@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from Data_Script import rxnorm_index
+from Data_Script.rxnorm_index import RxNormIndex
+
+
+def write_rrf(directory):
+    def row(values, width):
+        fields = [""] * width
+        for position, value in values.items():
+            fields[position] = value
+        return "|".join(fields) + "|\n"
+
+    with open(os.path.join(directory, "RXNCONSO.RRF"), "w") as f:
+        f.write(row({0: "1", 1: "ENG", 11: "RXNORM", 12: "BN", 14: "Foo", 16: "N"}, 18))
+    open(os.path.join(directory, "RXNREL.RRF"), "w").close()
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    index = RxNormIndex(str(tmp_path / "rxnorm.sqlite3"))
+    monkeypatch.setattr(rxnorm_index, "RXNORM_SOURCE", "auto")
+    monkeypatch.setattr(rxnorm_index, "RXNORM_INDEX_PATH", index.path)
+    monkeypatch.setattr(rxnorm_index, "_index", index)
+    monkeypatch.setattr(rxnorm_index, "_index_complete", False)
+    return index
+
+
+def test_index_is_used_only_once_fully_built(index, tmp_path):
+    assert rxnorm_index.get_rxnorm_index() is None  # empty file
+
+    write_rrf(str(tmp_path))
+    index.build_from_rrf(str(tmp_path))
+    assert rxnorm_index.get_rxnorm_index() is None  # no class dump yet
+
+    dump = tmp_path / "classes.tsv"
+    dump.write_text("1\tVA\tX1\tClass X\n")
+    index.load_class_dump(str(dump))
+    assert rxnorm_index.get_rxnorm_index() is index
+    assert index.lookup_classes("foo")["broad_class"] == ["Class X"]
+
+
+def test_misses_are_not_cached(index, tmp_path):
+    assert index.rxcui("Foo") is None
+    # Rebuilt by another process, which can't clear this one's caches
+    write_rrf(str(tmp_path))
+    RxNormIndex(index.path).build_from_rrf(str(tmp_path))
+    assert index.rxcui("Foo") == "1"
@@ -0,0 +1,59 @@
+import asyncio
+
+from Data_Script.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call_and_get_their_own_copy():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"classes": ["Antipsychotic"]}
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("abilify", fetch) for _ in range(3)))
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert len(calls) == 1
+    assert flight.shared == 2
+    assert not flight.in_flight("abilify")
+    results[0]["classes"].append("mutated")
+    assert results[1] == {"classes": ["Antipsychotic"]}
+
+
+def test_errors_reach_every_caller_and_the_key_is_released():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(
+            flight.do("abilify", fail),
+            flight.do("abilify", fail),
+            return_exceptions=True,
+        )
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert not flight.in_flight("abilify")
+
+
+def test_the_call_is_only_cancelled_when_the_last_caller_leaves():
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        flight = SingleFlight()
+        first = asyncio.create_task(flight.do("abilify", fetch))
+        second = asyncio.create_task(flight.do("abilify", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "done"
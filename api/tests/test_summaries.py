@@ -0,0 +1,58 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+from Data_Script import summarizer
+from Data_Script.firestore_fake import InMemoryFirestore
+from Data_Script.firestore_writer import ScrapeRunWriter
+from Data_Script.http_client import close_clients
+from Data_Script.summary_executor import SummarizerError
+from Data_Script.working import iter_scrape_medications
+
+
+async def scrape_and_store(db, medications):
+    writer = ScrapeRunWriter(db, str(uuid.uuid4()), datetime.utcnow(), medications)
+    await writer.start()
+    try:
+        async for _, record in iter_scrape_medications(medications):
+            writer.add(record)
+        return await writer.finish()
+    finally:
+        await close_clients()
+
+
+def test_openrouter_outage_still_stores_the_record(stubs):
+    stubs["openrouter"].error_rate = 1.0
+    db = InMemoryFirestore()
+
+    outcome = asyncio.run(scrape_and_store(db, ["Abilify"]))
+
+    assert outcome["status"] == "completed"
+    assert outcome["medications_scraped"] == 1
+    assert outcome["medications_failed"] == 0
+    assert stubs["openrouter"].errors == 1  # one batched call, no per-field retries
+    (doc,) = [d.to_dict() for d in db.collection("draft_medications").stream()]
+    assert doc["name"] == "Abilify"
+    assert doc["generic_name"] != "N/A"
+    assert doc["indications_and_usage_summary"] is None
+
+
+def test_batched_failure_leaves_pending_fields_empty(monkeypatch):
+    monkeypatch.setattr(summarizer, "summary_cache", None)
+
+    def fail(prompt, max_tokens):
+        raise SummarizerError("OpenRouter request failed: 503")
+
+    monkeypatch.setattr(summarizer, "_request_completion", fail)
+    summaries = summarizer.generate_summaries({"a": "some text", "b": "N/A"})
+    assert summaries == {"a": None, "b": "N/A"}
+
+
+def test_unreadable_batch_falls_back_per_field(monkeypatch):
+    monkeypatch.setattr(summarizer, "summary_cache", None)
+    replies = iter(["not json", "first", "second"])
+    monkeypatch.setattr(
+        summarizer, "_request_completion", lambda prompt, max_tokens: next(replies)
+    )
+    summaries = summarizer.generate_summaries({"a": "x", "b": "y"})
+    assert sorted(summaries.values()) == ["first", "second"]
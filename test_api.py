@@ -1,8 +1,13 @@
 import requests
 import json
+import sys
+import time
 
 # Base URL
 BASE_URL = "https://rescript-scraper.onrender.com"
+# Give up polling a run after this many seconds
+STATUS_TIMEOUT = 30 * 60
+POLL_INTERVAL = 5
 
 # Test root endpoint
 print("Testing root endpoint...")
@@ -23,11 +28,27 @@ response = requests.post(f"{BASE_URL}/scrape-medications", json=data)
 print(f"Status: {response.status_code}")
 print(f"Response: {json.dumps(response.json(), indent=2)}\n")
 
-# If we got a run_id, test progress endpoint
-if response.status_code == 200:
+# If we got a run_id, poll the status endpoint until the run finishes
+if response.status_code == 202:
     run_id = response.json().get("run_id")
     if run_id:
-        print(f"Testing progress endpoint for run_id: {run_id}")
-        progress_response = requests.get(f"{BASE_URL}/scraping-progress/{run_id}")
-        print(f"Status: {progress_response.status_code}")
-        print(f"Response: {json.dumps(progress_response.json(), indent=2)}")
+        print(f"Testing status endpoint for run_id: {run_id}")
+        deadline = time.monotonic() + STATUS_TIMEOUT
+        while True:
+            progress_response = requests.get(
+                f"{BASE_URL}/scrape-medications/status/{run_id}", timeout=30
+            )
+            if progress_response.status_code != 200:
+                # 404 means the run is unknown (e.g. the server restarted)
+                sys.exit(
+                    f"Status check failed: {progress_response.status_code} "
+                    f"{progress_response.text}"
+                )
+            progress = progress_response.json()
+            print(f"Status: {progress_response.status_code} {progress.get('counts')}")
+            if progress.get("status") in ("completed", "failed"):
+                break
+            if time.monotonic() > deadline:
+                sys.exit(f"Run {run_id} did not finish within {STATUS_TIMEOUT}s")
+            time.sleep(POLL_INTERVAL)
+        print(f"Response: {json.dumps(progress, indent=2)}")